@@ -1,6 +1,11 @@
-from flask import Flask, jsonify
+import time
+# Start of the import-time budget (STARTUP_IMPORT_BUDGET); see utils.startup_utils.
+_IMPORT_STARTED = time.perf_counter()
+
+from flask import Flask, Response, jsonify
 from flask_cors import CORS
 import os
+import threading
 from dotenv import load_dotenv
 from datetime import datetime
 
@@ -12,19 +17,74 @@ from config import AppConfig
 from routes.career_routes import career_bp
 from routes.cv_routes import cv_bp
 from routes.interview_routes import interview_bp
-from services.gemini_service import configure_gemini
+from services.canonicalizer import configure_canonicalizer, get_canonicalizer_stats
+from services.cv_index import configure_cv_index, get_cv_index
+from services.cv_service import configure_cv_renderer, get_cv_render_stats, warm_cv_templates
+from services.cv_storage import configure_cv_store, get_cv_store
+from services.gemini_service import (
+    configure_gemini, configure_rate_limiter, configure_resilience, configure_response_cache, get_gemini_stats,
+    preload_gemini_client,
+)
+from services.query_log import configure_query_log, get_query_log
 from utils.cleanup_utils import start_cleanup_scheduler
+from utils.cv_job_utils import start_cv_job_workers
+from utils.metrics import configure_metrics, instrument_app, render_metrics
+from utils.startup_utils import StartupProfile
+from utils.warmup_utils import start_cache_warmup
+
+# Serializes init_process() between the threads of one process.
+_init_lock = threading.Lock()
 
 def create_app():
     """
     Creates and configures the Flask application instance.
-    ... (rest of your create_app function remains the same)
+
+    Only state that can be shared with forked worker processes is set up here:
+    configuration, routes, call policies and warmed-up CV templates. Anything
+    that opens databases, starts threads or creates network clients is done
+    by init_process(), once in every process that serves requests. That runs
+    at the end of create_app(), unless LAZY_STARTUP is set (gunicorn --preload,
+    see gunicorn.conf.py); then it runs after the fork, or at the latest
+    before the first request a process handles.
     """
     app = Flask(__name__)
     app.config.from_object(AppConfig)
+    profile = StartupProfile(_IMPORT_STARTED, app.config['STARTUP_IMPORT_BUDGET'])
+    profile.record('imports', time.perf_counter() - _IMPORT_STARTED)
+    app.extensions['startup'] = profile
+    started = time.perf_counter()
     CORS(app, resources={r"/*": {"origins": "*"}})
-    configure_gemini(app.config['GOOGLE_API_KEY'])
+    instrument_app(app)
+    # Only stores the settings; each process creates its client on first use.
+    configure_gemini(
+        app.config['GOOGLE_API_KEY'],
+        backend=app.config['GEMINI_BACKEND'],
+        fake_options={
+            'latency': app.config['GEMINI_FAKE_LATENCY'],
+            'jitter': app.config['GEMINI_FAKE_JITTER'],
+            'failure_mode': app.config['GEMINI_FAKE_FAILURE_MODE'],
+            'failure_rate': app.config['GEMINI_FAKE_FAILURE_RATE'],
+            'recordings_path': app.config['GEMINI_FAKE_RECORDINGS'],
+            'seed': app.config['GEMINI_FAKE_SEED'],
+        },
+        record_path=app.config['GEMINI_RECORD_PATH'],
+    )
+    configure_resilience(
+        app.config['GEMINI_DEADLINE'],
+        app.config['GEMINI_MAX_ATTEMPTS'],
+        app.config['GEMINI_RETRY_BASE_DELAY'],
+        app.config['GEMINI_RETRY_MAX_DELAY'],
+        app.config['GEMINI_BREAKER_FAILURE_THRESHOLD'],
+        app.config['GEMINI_BREAKER_RECOVERY_TIME'],
+        hedge_percentile=app.config['GEMINI_HEDGE_PERCENTILE'] if app.config['GEMINI_HEDGE_ENABLED'] else None,
+        hedge_min_delay=app.config['GEMINI_HEDGE_MIN_DELAY'],
+        max_stale=app.config['GEMINI_CACHE_MAX_STALE'],
+    )
+    # The render pool itself is started lazily, in each process that renders.
+    configure_cv_renderer(app.config['CV_RENDER_WORKERS'], app.config['CV_RENDER_MAX_QUEUE'])
     os.makedirs(app.config['CV_FOLDER'], exist_ok=True)
+    # Fonts and layout code are loaded once here and shared by every forked worker.
+    warm_cv_templates()
     app.register_blueprint(career_bp)
     app.register_blueprint(cv_bp)
     app.register_blueprint(interview_bp)
@@ -32,25 +92,107 @@ def create_app():
     @app.route('/health', methods=['GET'])
     def health_check():
         try:
-            cv_files_count = len([f for f in os.listdir(app.config['CV_FOLDER']) if f.endswith('.pdf')])
+            # Constant-time lookup in the CV index instead of listing the folder.
+            cv_files_count = get_cv_index().count()
         except Exception as e:
-            app.logger.error(f"Error accessing CV_FOLDER for health check: {e}")
-            cv_files_count = "Error: Could not read folder"
+            app.logger.error(f"Error reading CV index for health check: {e}")
+            cv_files_count = "Error: Could not read CV index"
         return jsonify({
             "status": "healthy",
             "timestamp": datetime.now().isoformat(),
             "cv_files_count": cv_files_count,
+            "cv_storage": get_cv_store().describe(),
+            "gemini": get_gemini_stats(),
+            "canonicalizer": get_canonicalizer_stats(),
+            "cv_render": get_cv_render_stats(),
+            "cleanup": app.extensions['cleanup_scheduler'].stats(),
+            "cv_jobs": app.extensions['cv_jobs'].stats() if app.extensions['cv_jobs'] else None,
+            "cache_warmup": app.extensions['cache_warmup'].stats() if app.extensions['cache_warmup'] else None,
+            "startup": dict(app.extensions['startup'].stats(), lazy=app.config['LAZY_STARTUP']),
             "message": "Application is running and responsive."
         })
-    start_cleanup_scheduler(app)
+
+    @app.route('/metrics', methods=['GET'])
+    def metrics():
+        # Prometheus text exposition format, summed over all worker processes.
+        return Response(render_metrics(), mimetype='text/plain; version=0.0.4; charset=utf-8')
+
+    @app.before_request
+    def ensure_process_initialized():
+        # A no-op once this process is initialized; covers servers without a post-fork hook.
+        init_process(app)
+
+    profile.record('create_app', time.perf_counter() - started)
+    if not app.config['LAZY_STARTUP']:
+        init_process(app)
     return app
 
+def init_process(app):
+    """
+    Sets up this process's databases, background threads and clients.
+
+    Runs once per process: calling it again in the same process does nothing,
+    while a forked child runs it again for itself. Stored in
+    app.extensions: 'process_pid', 'cleanup_scheduler', 'cv_jobs' and 'cache_warmup'.
+    """
+    if app.extensions.get('process_pid') == os.getpid():
+        return
+    with _init_lock:
+        if app.extensions.get('process_pid') == os.getpid():
+            return
+        with app.extensions['startup'].phase('process_init'):
+            # Before anything that may start render processes, so they inherit the metrics directory.
+            configure_metrics(app.config['METRICS_DIR'], app.config['METRICS_FLUSH_INTERVAL'])
+            configure_rate_limiter(
+                app.config['GEMINI_RPM_LIMIT'],
+                app.config['GEMINI_TPM_LIMIT'],
+                app.config['GEMINI_RATE_LIMIT_DB_PATH'],
+                app.config['GEMINI_EXPECTED_OUTPUT_TOKENS'],
+            )
+            configure_response_cache(
+                app.config['GEMINI_CACHE_MAX_ENTRIES'],
+                app.config['GEMINI_CACHE_TTL'],
+                app.config['GEMINI_CACHE_DB_PATH'],
+            )
+            configure_query_log(app.config['QUERY_LOG_PATH'])
+            if app.config['CANONICALIZE_ENABLED']:
+                configure_canonicalizer(
+                    app.config['CANONICALIZE_THRESHOLD'],
+                    app.config['CANONICALIZE_LEARN_AFTER'],
+                    app.config['CANONICALIZE_ALIASES_PATH'],
+                    query_log=get_query_log(),
+                    seed_top_n=app.config['CANONICALIZE_SEED_TOP_N'],
+                )
+            shared = app.config['CV_STORAGE_BACKEND'] == 'shared'
+            configure_cv_store(
+                app.config['CV_STORAGE_BACKEND'],
+                app.config['CV_SHARED_FOLDER'] if shared else app.config['CV_FOLDER'],
+                s3_options={
+                    'bucket': app.config['CV_S3_BUCKET'],
+                    'prefix': app.config['CV_S3_PREFIX'],
+                    'endpoint_url': app.config['CV_S3_ENDPOINT_URL'],
+                    'region': app.config['CV_S3_REGION'],
+                    'redirect': app.config['CV_DOWNLOAD_REDIRECT'],
+                    'url_expiry': app.config['CV_DOWNLOAD_URL_EXPIRY'],
+                },
+            )
+            configure_cv_index(app.config['CV_INDEX_PATH'], get_cv_store())
+            start_cleanup_scheduler(app)
+            start_cv_job_workers(app)
+            start_cache_warmup(app)
+            if app.config['GEMINI_CLIENT_PRELOAD']:
+                # The process can serve other requests while the client library loads.
+                threading.Thread(target=preload_gemini_client, name="gemini-preload", daemon=True).start()
+        app.extensions['process_pid'] = os.getpid()
+
 # --- MODIFIED PART STARTS HERE ---
 # Create the Flask application instance globally
 app = create_app()
+app.extensions['startup'].finish_import(app.logger)
 
 # Entry point for running the Flask application locally (optional for Heroku)
 if __name__ == '__main__':
+    init_process(app)
     port = int(os.environ.get('PORT', 5000))
     app.run(host='0.0.0.0', port=port)
 # --- MODIFIED PART ENDS HERE ---
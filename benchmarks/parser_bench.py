@@ -0,0 +1,206 @@
+# benchmarks/parser_bench.py
+"""
+Microbenchmarks for the interview parser and the structured-output JSON cleaners.
+
+Runs every case of benchmarks/parser_corpus.py through the same parsing the
+routes use and reports, per kind and variant: extraction success rate,
+median and p99 parse time, and peak allocation per parse. Runs offline:
+
+    python benchmarks/parser_bench.py
+    python benchmarks/parser_bench.py --recordings recordings.jsonl --fuzz 5000
+
+Interview cases are also parsed incrementally, in 64-character chunks, as the
+streaming endpoint does. --fuzz mutates corpus entries and reports any
+exception other than StructuredOutputError. --json and --baseline work as in
+run_benchmarks.py (exit status 1 on a regression beyond --max-regression).
+"""
+import argparse
+import contextlib
+import json
+import os
+import random
+import sys
+import time
+import tracemalloc
+from collections import defaultdict
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from benchmarks.parser_corpus import REPRESENTATIVE_CASES, mutate, recorded_cases, synthetic_cases  # noqa: E402
+from services.structured_output import (  # noqa: E402
+    CAREER_GUIDANCE_SCHEMA, JOBS_SCHEMA, StructuredOutputError, parse_structured,
+)
+from utils.interview_parser import InterviewQuestionParser, parse_interview_questions  # noqa: E402
+
+# Limits used by /interview-questions.
+MAX_QUESTIONS = 10
+MAX_TIPS = 5
+STREAM_CHUNK_SIZE = 64
+
+_SCHEMAS = {"jobs": (JOBS_SCHEMA, "jobs"), "guidance": (CAREER_GUIDANCE_SCHEMA, "keySkills")}
+
+
+def parse_interview_streamed(text):
+    parser = InterviewQuestionParser(max_questions=MAX_QUESTIONS, max_tips=MAX_TIPS)
+    questions = []
+    for start in range(0, len(text), STREAM_CHUNK_SIZE):
+        questions.extend(parser.feed(text[start:start + STREAM_CHUNK_SIZE]))
+    questions.extend(parser.close())
+    return questions
+
+
+def parser_for(case, streamed=False):
+    """Returns a no-argument function parsing the case, and a function judging its result."""
+    text = case["text"]
+    if case["kind"] == "interview":
+        expected = None if case["expected"] is None else min(case["expected"], MAX_QUESTIONS)
+        if streamed:
+            parse = lambda: parse_interview_streamed(text)  # noqa: E731
+        else:
+            parse = lambda: parse_interview_questions(text, max_questions=MAX_QUESTIONS, max_tips=MAX_TIPS)  # noqa: E731
+
+        def judge(questions):
+            if not questions or not all(question["tips"] for question in questions):
+                return False
+            return expected is None or len(questions) == expected
+        return parse, judge
+
+    schema, counted = _SCHEMAS[case["kind"]]
+
+    def parse():
+        try:
+            return parse_structured(text, schema)
+        except StructuredOutputError:
+            return None
+
+    def judge(result):
+        if not case.get("parses", True):
+            return result is None  # Correctly rejected.
+        if result is None or not result[counted]:
+            return False
+        return case["expected"] is None or len(result[counted]) == case["expected"]
+    return parse, judge
+
+
+def measure(parse, repeat):
+    """Returns (median_seconds, peak_bytes, result) for parse()."""
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = parse()
+        timings.append(time.perf_counter() - started)
+    timings.sort()
+    tracemalloc.start()
+    parse()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return timings[len(timings) // 2], peak, result
+
+
+def run(cases, repeat):
+    """Benchmarks every case and returns per-group results keyed by 'kind/variant'."""
+    samples = defaultdict(lambda: {"ok": 0, "times": [], "peaks": []})
+    for case in cases:
+        modes = [(case["kind"], False)]
+        if case["kind"] == "interview":
+            modes.append(("interview_stream", True))
+        for label, streamed in modes:
+            parse, judge = parser_for(case, streamed)
+            seconds, peak, result = measure(parse, repeat)
+            group = samples[f"{label}/{case['variant']}"]
+            group["ok"] += judge(result)
+            group["times"].append(seconds)
+            group["peaks"].append(peak)
+
+    results = {}
+    for name, group in sorted(samples.items()):
+        times = sorted(group["times"])
+        results[name] = {
+            "cases": len(times),
+            "success_rate": round(group["ok"] / len(times), 3),
+            "median_us": round(times[len(times) // 2] * 1e6, 1),
+            "p99_us": round(times[min(len(times) - 1, int(len(times) * 0.99))] * 1e6, 1),
+            "peak_kib": round(sum(group["peaks"]) / len(group["peaks"]) / 1024, 1),
+        }
+    return results
+
+
+def fuzz(cases, iterations, seed):
+    """Parses mutated cases; returns descriptions of unexpected exceptions."""
+    rng = random.Random(seed)
+    crashes = []
+    for i in range(iterations):
+        case = dict(rng.choice(cases))
+        case["text"] = mutate(case["text"], rng)
+        for streamed in ((False, True) if case["kind"] == "interview" else (False,)):
+            parse, _ = parser_for(case, streamed)
+            try:
+                parse()
+            except Exception as e:
+                crashes.append(f"#{i} {case['kind']}/{case['variant']}: {type(e).__name__}: {e} -- input {case['text'][:120]!r}")
+    return crashes
+
+
+def compare(results, baseline, max_regression):
+    """Returns regressions in success rate or median parse time against a baseline run."""
+    regressions = []
+    for name, result in results["groups"].items():
+        previous = baseline.get("groups", {}).get(name)
+        if not previous:
+            continue
+        if result["success_rate"] < previous["success_rate"]:
+            regressions.append(f"{name}: success rate {previous['success_rate']} -> {result['success_rate']}")
+        if previous["median_us"] and result["median_us"] > previous["median_us"] * (1 + max_regression):
+            regressions.append(f"{name}: median {previous['median_us']}us -> {result['median_us']}us")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--seed', type=int, default=0, help='Seed for the synthetic corpus and the fuzzer.')
+    parser.add_argument('--per-variant', type=int, default=20, help='Synthetic cases per variant.')
+    parser.add_argument('--repeat', type=int, default=20, help='Timed parses per case.')
+    parser.add_argument('--recordings', help='JSONL file of recorded Gemini responses to add to the corpus.')
+    parser.add_argument('--fuzz', type=int, default=0, help='Number of mutated inputs to parse.')
+    parser.add_argument('--json', dest='json_path', help='Write the results to this file.')
+    parser.add_argument('--baseline', help='Results file of an earlier run to compare against.')
+    parser.add_argument('--max-regression', type=float, default=0.2, help='Allowed parse time regression (0.2 = 20%%).')
+    args = parser.parse_args(argv)
+
+    cases = REPRESENTATIVE_CASES + synthetic_cases(args.seed, args.per_variant)
+    if args.recordings:
+        cases += recorded_cases(args.recordings)
+
+    # The parsers print warnings for fallbacks and dropped items; keep them out of the report.
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        results = {"groups": run(cases, args.repeat)}
+        crashes = fuzz(cases, args.fuzz, args.seed) if args.fuzz else None
+    print(f"{'group':<36}{'cases':>7}{'success':>9}{'median us':>11}{'p99 us':>10}{'peak KiB':>10}")
+    for name, group in results["groups"].items():
+        print(f"{name:<36}{group['cases']:>7}{group['success_rate']:>9}{group['median_us']:>11}"
+              f"{group['p99_us']:>10}{group['peak_kib']:>10}")
+
+    status = 0
+    if crashes is not None:
+        results["fuzz"] = {"iterations": args.fuzz, "crashes": len(crashes)}
+        print(f"\nFuzzed {args.fuzz} inputs: {len(crashes)} unexpected exceptions.")
+        for crash in crashes[:20]:
+            print(f"  {crash}")
+        status = 1 if crashes else 0
+
+    if args.json_path:
+        with open(args.json_path, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            regressions = compare(results, json.load(f), args.max_regression)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        status = status or (1 if regressions else 0)
+    return status
+
+
+if __name__ == '__main__':
+    sys.exit(main())
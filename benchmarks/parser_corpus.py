@@ -0,0 +1,218 @@
+# benchmarks/parser_corpus.py
+"""
+Corpus of Gemini-style outputs for the interview parser and the JSON cleaners.
+
+Each case is a dict:
+    name      - unique, "<variant>/<n>"
+    kind      - 'interview', 'jobs' or 'guidance'
+    variant   - the family of output it represents, for per-variant reporting
+    text      - the model output
+    expected  - number of questions (interview) or items (jobs: jobs,
+                guidance: keySkills) a correct parse extracts; None when the
+                output is expected to be rejected or the count is unknown
+    parses    - JSON cases only: False when the output should be rejected
+
+Representative outputs are written out below; synthetic_cases() adds
+seeded variations on them and mutate() produces fuzz inputs.
+"""
+import json
+import random
+
+from services.response_cache import normalize_prompt
+
+# --- Representative outputs -------------------------------------------------
+
+_INTERVIEW_TYPICAL = """1. Tell me about yourself.
+   - Tips: Keep it under two minutes, Focus on relevant experience, End with why you want this role
+
+2. Why do you want to work here?
+   - Tips: Research the company, Connect your goals to its mission, Be genuine
+
+3. Describe a challenging project.
+   - Tips: Use the STAR method, Quantify the result, Mention what you learned
+"""
+
+_INTERVIEW_BULLETED = """Here are some common interview questions:
+
+1) What are your strengths?
+- Tips: Pick strengths relevant to the role
+- Give a concrete example
+- Avoid generic answers
+
+2) What is your biggest weakness?
+- Tips: Be honest
+- Show how you are improving
+"""
+
+_INTERVIEW_UNNUMBERED = """Question: How do you handle tight deadlines?
+- Prioritize tasks by impact
+- Communicate early about risks
+- Give an example of a deadline you met
+
+Question: How do you work in a team?
+- Describe your usual role
+- Mention how you resolve conflicts
+"""
+
+_JOBS_TYPICAL = json.dumps({"jobs": [
+    {"title": "Registered Nurse", "description": "Provides patient care.", "skills": ["Patient care", "Triage"],
+     "education": "BSN", "outlook": "Strong growth", "salary": "$60,000 - $90,000"},
+    {"title": "Nurse Educator", "description": "Trains nursing staff.", "skills": ["Teaching"],
+     "education": "MSN", "outlook": "Growing", "salary": "$70,000 - $100,000"},
+]}, indent=2)
+
+_GUIDANCE_TYPICAL = json.dumps({
+    "keySkills": ["Clinical assessment", "Communication", "Critical thinking", "Empathy", "Documentation"],
+    "careerPaths": ["Registered Nurse", "Nurse Practitioner", "Clinical Nurse Specialist"],
+    "certifications": ["BLS", "ACLS"],
+    "industryTrends": ["Telehealth", "Nurse staffing shortages"],
+}, indent=4)
+
+REPRESENTATIVE_CASES = [
+    {"name": "typical/0", "kind": "interview", "variant": "typical", "text": _INTERVIEW_TYPICAL, "expected": 3},
+    {"name": "bulleted/0", "kind": "interview", "variant": "bulleted", "text": _INTERVIEW_BULLETED, "expected": 2},
+    {"name": "unnumbered/0", "kind": "interview", "variant": "unnumbered", "text": _INTERVIEW_UNNUMBERED, "expected": 2},
+    {"name": "plain/0", "kind": "jobs", "variant": "plain", "text": _JOBS_TYPICAL, "expected": 2},
+    {"name": "fenced/0", "kind": "jobs", "variant": "fenced", "text": f"```json\n{_JOBS_TYPICAL}\n```", "expected": 2},
+    {"name": "plain/1", "kind": "guidance", "variant": "plain", "text": _GUIDANCE_TYPICAL, "expected": 5},
+    {"name": "prose/0", "kind": "guidance", "variant": "prose",
+     "text": f"Sure! Here is the guidance you asked for:\n{_GUIDANCE_TYPICAL}\nGood luck!", "expected": 5},
+]
+
+# --- Synthetic variations ----------------------------------------------------
+
+_WORDS = ("project team customer deadline conflict leadership data design system process goal "
+          "feedback failure success priority stakeholder budget risk quality mentor").split()
+
+def _sentence(rng, words, question=False):
+    text = " ".join(rng.choice(_WORDS) for _ in range(words)).capitalize()
+    return text + ("?" if question else ".")
+
+def _interview_text(rng, variant, count, tips_per_question):
+    blocks = []
+    for n in range(1, count + 1):
+        question = _sentence(rng, rng.randint(5, 14), question=True)
+        tips = [_sentence(rng, rng.randint(3, 8))[:-1] for _ in range(tips_per_question)]
+        if variant == "long_tips":
+            tips = [tip + " " + " ".join(_sentence(rng, 12) for _ in range(6)) for tip in tips]
+        if variant == "paren_numbers":
+            blocks.append(f"{n}) {question}\n   - Tips: {', '.join(tips)}")
+        elif variant == "semicolon_tips":
+            blocks.append(f"{n}. {question}\n   - Tips: {'; '.join(tips)}")
+        elif variant == "bullet_tips":
+            blocks.append(f"{n}. {question}\n- Tips: {tips[0]}\n" + "\n".join(f"- {tip}" for tip in tips[1:]))
+        elif variant == "dot_bullets":
+            blocks.append(f"{n}. {question}\n• Tips: {' • '.join(tips)}")
+        elif variant == "markdown_bold":
+            # Bold numbering is not recognised by QUESTION_PATTERN; tracked as a known gap.
+            blocks.append(f"**{n}. {question}**\n   - *Tips:* {', '.join(tips)}")
+        elif variant == "unnumbered":
+            blocks.append(f"Question: {question}\n" + "\n".join(f"- {tip}" for tip in tips))
+        elif variant == "crlf":
+            blocks.append(f"{n}. {question}\r\n   - Tips: {', '.join(tips)}")
+        else:  # typical, long_tips
+            blocks.append(f"{n}. {question}\n   - Tips: {', '.join(tips)}")
+    separator = "\r\n\r\n" if variant == "crlf" else "\n\n"
+    text = separator.join(blocks)
+    if rng.random() < 0.5:
+        text = "Here are the questions you asked for:\n\n" + text + "\n\nGood luck with your interview!"
+    return text
+
+INTERVIEW_VARIANTS = ("typical", "paren_numbers", "semicolon_tips", "bullet_tips", "dot_bullets",
+                      "long_tips", "markdown_bold", "unnumbered", "crlf")
+
+def _jobs_payload(rng, count):
+    return {"jobs": [
+        {"title": _sentence(rng, 2)[:-1], "description": _sentence(rng, 10),
+         "skills": [rng.choice(_WORDS) for _ in range(rng.randint(2, 5))],
+         "education": "Bachelor's degree", "outlook": _sentence(rng, 4), "salary": "$50,000 - $80,000"}
+        for _ in range(count)
+    ]}
+
+def _guidance_payload(rng, count):
+    return {field: [_sentence(rng, rng.randint(4, 12)) for _ in range(count)]
+            for field in ("keySkills", "careerPaths", "certifications", "industryTrends")}
+
+def _json_text(rng, variant, payload):
+    """Renders payload as a model might. Returns (text, parse_expected_to_succeed)."""
+    text = json.dumps(payload, indent=rng.choice((None, 2, 4)), ensure_ascii=rng.random() < 0.5)
+    if variant == "fenced":
+        return f"```json\n{text}\n```", True
+    if variant == "nested_fences":
+        return f"```\n```json\n{text}\n```\n```", True
+    if variant == "prose":
+        return f"Of course! Here is the JSON:\n\n{text}\n\nLet me know if you need more.", True
+    if variant == "trailing_commas":
+        return text.replace("]", ",]").replace("}", ",}"), True
+    if variant == "truncated":
+        # Cut inside the last array; the repaired value keeps the complete items.
+        return text[:int(len(text) * rng.uniform(0.6, 0.95))], True
+    if variant == "single_quotes":
+        return text.replace('"', "'"), False
+    if variant == "bare_list":
+        return json.dumps(next(iter(payload.values()))), True
+    return text, True
+
+JSON_VARIANTS = ("plain", "fenced", "nested_fences", "prose", "trailing_commas", "truncated", "single_quotes", "bare_list")
+
+def synthetic_cases(seed=0, per_variant=20):
+    """Returns seeded synthetic cases covering every interview and JSON variant."""
+    rng = random.Random(seed)
+    cases = []
+    for variant in INTERVIEW_VARIANTS:
+        for i in range(per_variant):
+            count = rng.randint(1, 12)
+            text = _interview_text(rng, variant, count, rng.randint(1, 6))
+            cases.append({"name": f"{variant}/{i}", "kind": "interview", "variant": variant,
+                          "text": text, "expected": count})
+    for kind, build, counted in (("jobs", _jobs_payload, "jobs"), ("guidance", _guidance_payload, "keySkills")):
+        for variant in JSON_VARIANTS:
+            if kind == "guidance" and variant == "bare_list":
+                continue  # Only single-array schemas accept a bare list.
+            for i in range(per_variant):
+                payload = build(rng, rng.randint(1, 10))
+                text, parses = _json_text(rng, variant, payload)
+                # Truncated output loses an unknown number of trailing items.
+                expected = None if variant == "truncated" or not parses else len(payload[counted])
+                cases.append({"name": f"{variant}/{i}", "kind": kind, "variant": variant,
+                              "text": text, "expected": expected, "parses": parses})
+    return cases
+
+def recorded_cases(path):
+    """
+    Returns cases from a JSONL file of recorded Gemini responses (see GEMINI_RECORD_PATH).
+
+    The kind is inferred from the prompt; expected counts are unknown.
+    """
+    phrases = (("career opportunities", "jobs"), ("career advisor", "guidance"), ("interview questions", "interview"))
+    cases = []
+    with open(path, encoding="utf-8") as f:
+        for n, line in enumerate(f):
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            prompt = normalize_prompt(record["prompt"]).lower()
+            kind = next((kind for phrase, kind in phrases if phrase in prompt), None)
+            if kind:
+                cases.append({"name": f"recorded/{n}", "kind": kind, "variant": "recorded",
+                              "text": record["text"], "expected": None})
+    return cases
+
+# --- Fuzzing ------------------------------------------------------------------
+
+_FRAGMENTS = ("```", "```json", "\n", "\r\n", "- Tips:", "1.", "•", "{", "}", "[", "]", '"', ",", ":", "\\", "\t", "é", "🙂")
+
+def mutate(text, rng):
+    """Returns text with one to three random edits: cuts, insertions, deletions or duplications."""
+    for _ in range(rng.randint(1, 3)):
+        position = rng.randint(0, len(text))
+        operation = rng.random()
+        if operation < 0.25:
+            text = text[:position]
+        elif operation < 0.6:
+            text = text[:position] + rng.choice(_FRAGMENTS) + text[position:]
+        elif operation < 0.8:
+            text = text[:position] + text[position + rng.randint(1, 20):]
+        else:
+            text = text[:position] + text[position:position + rng.randint(1, 40)] * 2 + text[position:]
+    return text
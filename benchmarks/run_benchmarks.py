@@ -0,0 +1,243 @@
+# benchmarks/run_benchmarks.py
+"""
+Benchmarks every endpoint and reports p50/p99 latency, throughput and memory.
+
+By default the app runs in this process against the fake Gemini backend
+(GEMINI_BACKEND=fake), so no API quota is spent and no server is needed:
+
+    python benchmarks/run_benchmarks.py --requests 200 --concurrency 16
+
+Point --url at a running server (started with GEMINI_BACKEND=fake) to
+benchmark the real gunicorn setup; pass --server-pid to report its memory.
+
+Save a run with --json and compare later runs against it with --baseline;
+the exit status is 1 if any endpoint's p99 latency or throughput regressed
+by more than --max-regression.
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_PAYLOADS = os.path.join(REPO_ROOT, 'benchmarks', 'payloads.jsonl')
+
+# Endpoints in the order they are benchmarked. /download-cv needs files made by /generate-cv.
+ENDPOINTS = ['/get_recommendations', '/career_guidance', '/interview-questions', '/generate-cv', '/download-cv']
+
+
+class InProcessClient:
+    """Drives the Flask app in this process through its test client."""
+
+    def __init__(self, no_cache, latency, failure_mode, failure_rate):
+        # Must be set before the app (and config.py) is imported.
+        os.environ.setdefault('GEMINI_BACKEND', 'fake')
+        os.environ.setdefault('GEMINI_FAKE_LATENCY', str(latency))
+        os.environ.setdefault('GEMINI_FAKE_SEED', '0')
+        os.environ.setdefault('CACHE_WARMUP_ENABLED', 'false')
+        if failure_mode:
+            os.environ.setdefault('GEMINI_FAKE_FAILURE_MODE', failure_mode)
+            os.environ.setdefault('GEMINI_FAKE_FAILURE_RATE', str(failure_rate))
+        if no_cache:
+            os.environ['GEMINI_CACHE_MAX_ENTRIES'] = '0'
+        # Keep generated CVs, indexes and caches out of the working tree.
+        os.chdir(tempfile.mkdtemp(prefix='jobpal-bench-'))
+        sys.path.insert(0, REPO_ROOT)
+        from app import app
+        self.app = app
+        self._local = threading.local()
+
+    def _client(self):
+        # One test client per thread; clients keep per-instance state such as cookies.
+        client = getattr(self._local, 'client', None)
+        if client is None:
+            client = self._local.client = self.app.test_client()
+        return client
+
+    def request(self, method, path, body=None):
+        response = self._client().open(path, method=method, json=body)
+        return response.status_code, response.get_data()
+
+
+class HTTPClient:
+    """Drives a running server over HTTP."""
+
+    def __init__(self, base_url):
+        self.base_url = base_url.rstrip('/')
+
+    def request(self, method, path, body=None):
+        data = json.dumps(body).encode('utf-8') if body is not None else None
+        req = urllib.request.Request(
+            self.base_url + path, data=data, method=method, headers={'Content-Type': 'application/json'}
+        )
+        try:
+            with urllib.request.urlopen(req, timeout=120) as response:
+                return response.status, response.read()
+        except urllib.error.HTTPError as e:
+            return e.code, e.read()
+
+
+def load_payloads(path):
+    """Returns {endpoint: [body, ...]} from a JSONL file of {"endpoint", "body"} records."""
+    payloads = defaultdict(list)
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                record = json.loads(line)
+                payloads[record['endpoint']].append(record.get('body'))
+    return payloads
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, round(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def memory_mb(server_pid=None):
+    """Returns the resident memory in MB of server_pid, or of this process and its children."""
+    pids = [server_pid] if server_pid else [os.getpid()]
+    if not server_pid:
+        # Include CV render processes started by the in-process app.
+        try:
+            with open(f'/proc/{os.getpid()}/task/{os.getpid()}/children') as f:
+                pids += [int(pid) for pid in f.read().split()]
+        except OSError:
+            pass
+    total_kb = 0
+    for pid in pids:
+        try:
+            with open(f'/proc/{pid}/status') as f:
+                total_kb += next(int(line.split()[1]) for line in f if line.startswith('VmRSS:'))
+        except (OSError, StopIteration):
+            if pid == pids[0]:
+                return None  # /proc is not available (e.g. macOS).
+    return round(total_kb / 1024, 1)
+
+
+def run_endpoint(client, endpoint, bodies, total, concurrency):
+    """Sends `total` requests cycling through bodies, `concurrency` at a time."""
+    method = 'GET' if endpoint == '/download-cv' else 'POST'
+    latencies = []
+    errors = 0
+    lock = threading.Lock()
+
+    def one(i):
+        nonlocal errors
+        body = bodies[i % len(bodies)]
+        path = f"/download-cv/{body}" if endpoint == '/download-cv' else endpoint
+        started = time.perf_counter()
+        try:
+            status, _ = client.request(method, path, None if method == 'GET' else body)
+        except Exception:
+            status = None
+        elapsed = time.perf_counter() - started
+        with lock:
+            latencies.append(elapsed)
+            if status is None or status >= 400:
+                errors += 1
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(one, range(total)))
+    wall = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        'requests': total,
+        'errors': errors,
+        'p50_ms': round(percentile(latencies, 0.50) * 1000, 2),
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 2),
+        'rps': round(total / wall, 1) if wall else None,
+    }
+
+
+def generated_filenames(client, cv_bodies):
+    """Generates each CV once and returns the stored filenames, for /download-cv."""
+    filenames = []
+    for body in cv_bodies:
+        status, content = client.request('POST', '/generate-cv', body)
+        if status in (200, 201):
+            filenames.append(json.loads(content)['filename'])
+    return filenames
+
+
+def compare(results, baseline, max_regression):
+    """Returns human-readable regressions of results against a baseline run."""
+    regressions = []
+    for endpoint, result in results['endpoints'].items():
+        previous = baseline.get('endpoints', {}).get(endpoint)
+        if not previous:
+            continue
+        if previous['p99_ms'] and result['p99_ms'] > previous['p99_ms'] * (1 + max_regression):
+            regressions.append(f"{endpoint}: p99 {previous['p99_ms']}ms -> {result['p99_ms']}ms")
+        if previous['rps'] and result['rps'] < previous['rps'] * (1 - max_regression):
+            regressions.append(f"{endpoint}: rps {previous['rps']} -> {result['rps']}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', help='Benchmark a running server instead of the app in this process.')
+    parser.add_argument('--server-pid', type=int, help='PID of the server, to report its memory (with --url).')
+    parser.add_argument('--requests', type=int, default=100, help='Requests per endpoint.')
+    parser.add_argument('--concurrency', type=int, default=8, help='Concurrent requests.')
+    parser.add_argument('--endpoints', nargs='+', default=ENDPOINTS, help='Endpoints to benchmark.')
+    parser.add_argument('--payloads', default=DEFAULT_PAYLOADS, help='JSONL file of request payloads.')
+    parser.add_argument('--no-cache', action='store_true', help='Disable the Gemini response cache (in-process only).')
+    parser.add_argument('--latency', type=float, default=0.2, help='Fake Gemini latency in seconds (in-process only).')
+    parser.add_argument('--failure-mode', choices=['malformed', 'truncated', 'unavailable'], help='Fake Gemini failure mode.')
+    parser.add_argument('--failure-rate', type=float, default=0.1, help='Fraction of fake responses corrupted.')
+    parser.add_argument('--json', dest='json_path', help='Write the results to this file.')
+    parser.add_argument('--baseline', help='Results file of an earlier run to compare against.')
+    parser.add_argument('--max-regression', type=float, default=0.2, help='Allowed p99/RPS regression (0.2 = 20%%).')
+    args = parser.parse_args(argv)
+
+    # The in-process client changes directory; resolve user paths first.
+    json_path = os.path.abspath(args.json_path) if args.json_path else None
+    baseline_path = os.path.abspath(args.baseline) if args.baseline else None
+    payloads = load_payloads(args.payloads)
+    if args.url:
+        client = HTTPClient(args.url)
+    else:
+        client = InProcessClient(args.no_cache, args.latency, args.failure_mode, args.failure_rate)
+
+    if '/download-cv' in args.endpoints:
+        payloads['/download-cv'] = generated_filenames(client, payloads['/generate-cv'])
+
+    results = {'mode': 'http' if args.url else 'in-process', 'endpoints': {}}
+    print(f"{'endpoint':<24}{'requests':>9}{'errors':>8}{'p50 ms':>10}{'p99 ms':>10}{'rps':>9}{'rss MB':>9}")
+    for endpoint in args.endpoints:
+        if not payloads.get(endpoint):
+            print(f"{endpoint:<24} skipped: no payloads")
+            continue
+        result = run_endpoint(client, endpoint, payloads[endpoint], args.requests, args.concurrency)
+        result['rss_mb'] = memory_mb(args.server_pid if args.url else None)
+        results['endpoints'][endpoint] = result
+        print(f"{endpoint:<24}{result['requests']:>9}{result['errors']:>8}{result['p50_ms']:>10}"
+              f"{result['p99_ms']:>10}{result['rps']:>9}{str(result['rss_mb']):>9}")
+
+    if json_path:
+        with open(json_path, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+
+    if baseline_path:
+        with open(baseline_path, encoding='utf-8') as f:
+            regressions = compare(results, json.load(f), args.max_regression)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,143 @@
+# benchmarks/startup_bench.py
+"""
+Measures cold-start time: importing the app, initializing a worker process
+and creating the Gemini client, each in a fresh interpreter.
+
+    python benchmarks/startup_bench.py --runs 5
+    python benchmarks/startup_bench.py --eager --with-client --budget 1.5
+
+By default the app is imported as the gunicorn master does (LAZY_STARTUP=true),
+then init_process() runs as in a freshly forked worker. --eager imports it
+as `python app.py` does, with the process initialized during the import.
+--with-client also times creating the Gemini client (no request is sent;
+a placeholder API key is used if GOOGLE_API_KEY is not set).
+
+The slowest top-level imports, from `python -X importtime`, show what to make
+lazy next. The exit status is 1 if the median import time exceeds --budget
+(STARTUP_IMPORT_BUDGET by default); --json writes the results to a file.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Runs in the child interpreter and prints one JSON line with its timings.
+CHILD_SCRIPT = """
+import json, sys, time
+started = time.perf_counter()
+import app
+imported = time.perf_counter()
+app.init_process(app.app)
+initialized = time.perf_counter()
+client_seconds = None
+if {with_client}:
+    from services.gemini_service import _get_model
+    _get_model()
+    client_seconds = time.perf_counter() - initialized
+print(json.dumps({{
+    "import_s": imported - started,
+    "init_s": initialized - imported,
+    "client_s": client_seconds,
+    "google_imported": "google.generativeai" in sys.modules,
+}}))
+"""
+
+
+def run_once(eager, with_client):
+    """Starts a fresh interpreter and returns its timings and `-X importtime` entries."""
+    env = dict(os.environ)
+    env['PYTHONPATH'] = REPO_ROOT + os.pathsep + env.get('PYTHONPATH', '')
+    env['LAZY_STARTUP'] = 'false' if eager else 'true'
+    env.setdefault('GOOGLE_API_KEY', 'startup-bench')
+    # Keep background work from touching Gemini while the process is timed.
+    env['CACHE_WARMUP_ENABLED'] = 'false'
+    env['GEMINI_CLIENT_PRELOAD'] = 'false'
+    started = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', CHILD_SCRIPT.format(with_client=with_client)],
+        cwd=tempfile.mkdtemp(prefix='jobpal-startup-'), env=env, capture_output=True, text=True,
+    )
+    wall = time.perf_counter() - started
+    if result.returncode != 0:
+        raise RuntimeError(f"App failed to start:\n{result.stderr[-2000:]}")
+    timings = json.loads(result.stdout.strip().splitlines()[-1])
+    timings['wall_s'] = wall
+    return timings, parse_importtime(result.stderr)
+
+
+def parse_importtime(stderr):
+    """Returns (cumulative_us, module) for every top-level import in `-X importtime` output."""
+    entries = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        # Nested imports are indented by two spaces per level.
+        if name.startswith(' ') and not name.startswith('   '):
+            entries.append((int(cumulative), name.strip()))
+    return entries
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=5, help='Cold starts to measure.')
+    parser.add_argument('--eager', action='store_true',
+                        help='Initialize the process during the import (LAZY_STARTUP=false).')
+    parser.add_argument('--with-client', action='store_true', help='Also time creating the Gemini client.')
+    parser.add_argument('--top', type=int, default=10, help='Number of slowest top-level imports to list.')
+    parser.add_argument('--budget', type=float, default=float(os.getenv('STARTUP_IMPORT_BUDGET', 2.0)),
+                        help='Allowed median import time in seconds (0 disables the check).')
+    parser.add_argument('--json', dest='json_path', help='Write the results to this file.')
+    args = parser.parse_args(argv)
+
+    runs = []
+    imports = {}
+    for _ in range(args.runs):
+        timings, entries = run_once(args.eager, args.with_client)
+        runs.append(timings)
+        for cumulative, name in entries:
+            imports.setdefault(name, []).append(cumulative)
+
+    def median(key):
+        values = [run[key] for run in runs if run[key] is not None]
+        return round(statistics.median(values), 3) if values else None
+
+    results = {
+        'mode': 'eager' if args.eager else 'lazy',
+        'runs': args.runs,
+        'median_s': {key: median(key) for key in ('wall_s', 'import_s', 'init_s', 'client_s')},
+        'google_imported_at_startup': any(run['google_imported'] for run in runs) and not args.with_client,
+        'slowest_imports_ms': {
+            name: round(statistics.median(values) / 1000, 1)
+            for name, values in sorted(imports.items(), key=lambda item: -statistics.median(item[1]))[:args.top]
+        },
+    }
+    print(f"mode: {results['mode']}, {args.runs} cold starts (median seconds)")
+    for key, label in (('wall_s', 'interpreter + app'), ('import_s', 'import app'),
+                       ('init_s', 'init_process'), ('client_s', 'Gemini client')):
+        if results['median_s'][key] is not None:
+            print(f"  {label:<20}{results['median_s'][key]:>8}")
+    if results['google_imported_at_startup']:
+        print("  WARNING google.generativeai was imported during startup")
+    print("slowest top-level imports (ms):")
+    for name, ms in results['slowest_imports_ms'].items():
+        print(f"  {name:<40}{ms:>8}")
+
+    if args.json_path:
+        with open(args.json_path, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+
+    if args.budget and results['median_s']['import_s'] > args.budget:
+        print(f"OVER BUDGET import {results['median_s']['import_s']}s > {args.budget}s")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
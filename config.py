@@ -12,18 +12,191 @@ class AppConfig:
     # Google Gemini API Key. Loaded from environment variables for security.
     GOOGLE_API_KEY = os.getenv('GOOGLE_API_KEY')
 
+    # Model backend: 'google' (the Gemini API) or 'fake' (a local stub for benchmarks and
+    # offline development that needs no API key).
+    GEMINI_BACKEND = os.getenv('GEMINI_BACKEND', 'google')
+
+    # Fake backend behaviour: mean latency and jitter in seconds, an optional failure mode
+    # ('malformed', 'truncated' or 'unavailable') applied to FAILURE_RATE of responses, a JSONL file of
+    # recorded responses to replay, and a random seed for reproducible runs.
+    GEMINI_FAKE_LATENCY = float(os.getenv('GEMINI_FAKE_LATENCY', 0.5))
+    GEMINI_FAKE_JITTER = float(os.getenv('GEMINI_FAKE_JITTER', 0.1))
+    GEMINI_FAKE_FAILURE_MODE = os.getenv('GEMINI_FAKE_FAILURE_MODE') or None
+    GEMINI_FAKE_FAILURE_RATE = float(os.getenv('GEMINI_FAKE_FAILURE_RATE', 0.0))
+    GEMINI_FAKE_RECORDINGS = os.getenv('GEMINI_FAKE_RECORDINGS')
+    GEMINI_FAKE_SEED = int(os.environ['GEMINI_FAKE_SEED']) if os.getenv('GEMINI_FAKE_SEED') else None
+
+    # With the 'google' backend, append every Gemini response to this JSONL file so it can
+    # be replayed by the fake backend (GEMINI_FAKE_RECORDINGS).
+    GEMINI_RECORD_PATH = os.getenv('GEMINI_RECORD_PATH')
+
+    # Gemini call policy. Each call must finish within DEADLINE seconds, including up to
+    # MAX_ATTEMPTS attempts for transient errors (timeouts, 429, 5xx), with exponential
+    # backoff and jitter between RETRY_BASE_DELAY and RETRY_MAX_DELAY seconds.
+    GEMINI_DEADLINE = float(os.getenv('GEMINI_DEADLINE', 20))
+    GEMINI_MAX_ATTEMPTS = int(os.getenv('GEMINI_MAX_ATTEMPTS', 3))
+    GEMINI_RETRY_BASE_DELAY = float(os.getenv('GEMINI_RETRY_BASE_DELAY', 0.5))
+    GEMINI_RETRY_MAX_DELAY = float(os.getenv('GEMINI_RETRY_MAX_DELAY', 4))
+
+    # Hedged requests: when a call is slower than HEDGE_PERCENTILE of recent calls (but at
+    # least HEDGE_MIN_DELAY seconds), send a second identical request and use whichever
+    # answers first. Costs extra quota, so off by default.
+    GEMINI_HEDGE_ENABLED = os.getenv('GEMINI_HEDGE_ENABLED', 'false').lower() in ('1', 'true', 'yes')
+    GEMINI_HEDGE_PERCENTILE = float(os.getenv('GEMINI_HEDGE_PERCENTILE', 0.95))
+    GEMINI_HEDGE_MIN_DELAY = float(os.getenv('GEMINI_HEDGE_MIN_DELAY', 1.0))
+
+    # Circuit breaker (per worker): after FAILURE_THRESHOLD consecutive transient failures,
+    # stop calling Gemini for RECOVERY_TIME seconds and fail fast with a 503, or serve
+    # cached answers that expired up to CACHE_MAX_STALE seconds ago.
+    GEMINI_BREAKER_FAILURE_THRESHOLD = int(os.getenv('GEMINI_BREAKER_FAILURE_THRESHOLD', 5))
+    GEMINI_BREAKER_RECOVERY_TIME = float(os.getenv('GEMINI_BREAKER_RECOVERY_TIME', 30))
+    GEMINI_CACHE_MAX_STALE = int(os.getenv('GEMINI_CACHE_MAX_STALE', 7 * 86400))
+
+    # Client-side quota limits, so peaks queue briefly instead of failing with 429s. Set to
+    # the project's Gemini requests and tokens per minute (0 disables a limit). The buckets
+    # live in RATE_LIMIT_DB_PATH so all workers on the host share one quota. Token use is
+    # estimated from the prompt plus EXPECTED_OUTPUT_TOKENS and corrected from actual usage.
+    GEMINI_RPM_LIMIT = int(os.getenv('GEMINI_RPM_LIMIT', 0))
+    GEMINI_TPM_LIMIT = int(os.getenv('GEMINI_TPM_LIMIT', 0))
+    GEMINI_RATE_LIMIT_DB_PATH = os.getenv('GEMINI_RATE_LIMIT_DB_PATH', os.path.join('cache', 'rate_limit.db'))
+    GEMINI_EXPECTED_OUTPUT_TOKENS = int(os.getenv('GEMINI_EXPECTED_OUTPUT_TOKENS', 800))
+
     # Folder to store generated CVs temporarily.
     CV_FOLDER = 'temp_cvs'
 
+    # Where generated CVs are stored so any worker or node can serve the download:
+    # 'local' (CV_FOLDER on this host), 'shared' (CV_SHARED_FOLDER, a directory mounted on
+    # every node, e.g. NFS/EFS) or 's3' (an S3-compatible bucket; requires boto3).
+    CV_STORAGE_BACKEND = os.getenv('CV_STORAGE_BACKEND', 'local')
+    CV_SHARED_FOLDER = os.getenv('CV_SHARED_FOLDER', '/mnt/shared/cvs')
+
+    # S3 backend: bucket, key prefix, and an endpoint URL for non-AWS servers (MinIO, Ceph,
+    # R2, or a local stand-in for testing). Credentials come from the standard AWS variables.
+    CV_S3_BUCKET = os.getenv('CV_S3_BUCKET')
+    CV_S3_PREFIX = os.getenv('CV_S3_PREFIX', 'cvs/')
+    CV_S3_ENDPOINT_URL = os.getenv('CV_S3_ENDPOINT_URL')
+    CV_S3_REGION = os.getenv('CV_S3_REGION')
+
+    # With object storage, redirect downloads to pre-signed URLs valid for URL_EXPIRY seconds
+    # instead of streaming them through the app.
+    CV_DOWNLOAD_REDIRECT = os.getenv('CV_DOWNLOAD_REDIRECT', 'true').lower() in ('1', 'true', 'yes')
+    CV_DOWNLOAD_URL_EXPIRY = int(os.getenv('CV_DOWNLOAD_URL_EXPIRY', 300))
+
+    # SQLite index of stored CV files (filename, size, creation time, hash), shared by all
+    # workers. Lets cleanup and /health avoid scanning CV_FOLDER.
+    CV_INDEX_PATH = os.getenv('CV_INDEX_PATH', os.path.join(CV_FOLDER, 'cv_index.db'))
+
     # Maximum age for CV files in hours before they are considered for cleanup.
     MAX_CV_AGE_HOURS = 24
 
     # Interval in seconds for the cleanup task to run. (e.g., 3600 seconds = 1 hour)
     CLEANUP_INTERVAL = 3600
 
+    # Lock file used to elect the single worker that runs cleanup, and the fraction
+    # by which each cleanup interval is randomly varied.
+    CLEANUP_LOCK_PATH = os.getenv('CLEANUP_LOCK_PATH', os.path.join(CV_FOLDER, '.cleanup.lock'))
+    CLEANUP_JITTER = 0.1
+
     # Maximum number of CV files to keep in the temporary folder.
     # Oldest files are removed first if this limit is exceeded.
     MAX_CVS_STORED = 100
 
+    # Maximum total size of stored CV files, in bytes (0 disables the byte quota).
+    CV_MAX_STORAGE_BYTES = int(os.getenv('CV_MAX_STORAGE_BYTES', 200 * 1024 * 1024))
+
+    # Which files the quotas evict first: 'lru' (least recently downloaded) or 'fifo' (oldest).
+    CV_EVICTION_ORDER = os.getenv('CV_EVICTION_ORDER', 'lru')
+
+    # When a new CV pushes storage above HIGH_WATER of a quota, evict right away
+    # down to LOW_WATER of it instead of waiting for the next cleanup run.
+    CV_EVICTION_HIGH_WATER = 0.9
+    CV_EVICTION_LOW_WATER = 0.8
+
+    # Gemini response cache. Maximum entries held in each worker's in-process LRU tier
+    # (0 disables caching) and how long a cached answer stays valid, in seconds.
+    GEMINI_CACHE_MAX_ENTRIES = int(os.getenv('GEMINI_CACHE_MAX_ENTRIES', 512))
+    GEMINI_CACHE_TTL = int(os.getenv('GEMINI_CACHE_TTL', 86400))
+
+    # Optional SQLite file shared by all workers on the host. Leave unset to disable the shared tier.
+    GEMINI_CACHE_DB_PATH = os.getenv('GEMINI_CACHE_DB_PATH')
+
+    # Canonicalization of program and role inputs (services.canonicalizer), so that "CS",
+    # "B.Sc Computer Sci" and "computer science " share one prompt and cache entry. Inputs
+    # map to a known name when their trigram similarity reaches THRESHOLD; unknown inputs
+    # seen LEARN_AFTER times join the vocabulary (0 disables learning), as do yesterday's
+    # SEED_TOP_N most frequent values at startup. ALIASES_PATH optionally names a JSON file
+    # of extra aliases: {"program": {"Canonical Name": ["alias", ...]}, "role": {...}}.
+    CANONICALIZE_ENABLED = os.getenv('CANONICALIZE_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+    CANONICALIZE_THRESHOLD = float(os.getenv('CANONICALIZE_THRESHOLD', 0.8))
+    CANONICALIZE_LEARN_AFTER = int(os.getenv('CANONICALIZE_LEARN_AFTER', 3))
+    CANONICALIZE_SEED_TOP_N = int(os.getenv('CANONICALIZE_SEED_TOP_N', 200))
+    CANONICALIZE_ALIASES_PATH = os.getenv('CANONICALIZE_ALIASES_PATH')
+
+    # Multi-program requests to /get_recommendations and /career_guidance: maximum programs per
+    # request, and how many uncached programs are asked about in one Gemini call.
+    CAREER_BATCH_MAX_PROGRAMS = int(os.getenv('CAREER_BATCH_MAX_PROGRAMS', 10))
+    GEMINI_BATCH_SIZE = int(os.getenv('GEMINI_BATCH_SIZE', 5))
+
+    # Cache warmup. Programs and roles (comma-separated) whose answers are kept in the
+    # response cache ahead of traffic, plus the top-N programs and roles asked about yesterday.
+    CACHE_WARMUP_ENABLED = os.getenv('CACHE_WARMUP_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+    CACHE_WARMUP_PROGRAMS = [p.strip() for p in os.getenv('CACHE_WARMUP_PROGRAMS', '').split(',') if p.strip()]
+    CACHE_WARMUP_ROLES = [r.strip() for r in os.getenv('CACHE_WARMUP_ROLES', '').split(',') if r.strip()]
+    CACHE_WARMUP_TOP_N = int(os.getenv('CACHE_WARMUP_TOP_N', 20))
+
+    # Maximum concurrent Gemini calls while warming, seconds between warmup runs, and how
+    # close to expiry (in seconds) a warm answer is regenerated. Keep REFRESH_AHEAD above
+    # INTERVAL so answers are refreshed before they expire.
+    CACHE_WARMUP_CONCURRENCY = int(os.getenv('CACHE_WARMUP_CONCURRENCY', 4))
+    CACHE_WARMUP_INTERVAL = int(os.getenv('CACHE_WARMUP_INTERVAL', 900))
+    CACHE_WARMUP_REFRESH_AHEAD = int(os.getenv('CACHE_WARMUP_REFRESH_AHEAD', 3600))
+
+    # Snapshot of the warm answers loaded at startup. Point it at storage that outlives
+    # the dyno for new dynos to start warm. The lock file elects the worker that warms.
+    CACHE_WARMUP_SNAPSHOT_PATH = os.getenv('CACHE_WARMUP_SNAPSHOT_PATH', os.path.join('cache', 'warm_cache.json'))
+    CACHE_WARMUP_LOCK_PATH = os.getenv('CACHE_WARMUP_LOCK_PATH', os.path.join('cache', '.warmup.lock'))
+
+    # SQLite file with daily counts of requested programs and roles, shared by all workers.
+    QUERY_LOG_PATH = os.getenv('QUERY_LOG_PATH', os.path.join('cache', 'query_log.db'))
+
+    # CV rendering. Number of render processes per web worker (0 renders on the request
+    # thread) and how many renders may queue for a free process before requests get a 429.
+    CV_RENDER_WORKERS = int(os.getenv('CV_RENDER_WORKERS', 2))
+    CV_RENDER_MAX_QUEUE = int(os.getenv('CV_RENDER_MAX_QUEUE', 16))
+
+    # Batch CV generation: maximum CVs per /generate-cv/batch request and how many of
+    # them are rendered at the same time.
+    CV_BATCH_MAX_ITEMS = int(os.getenv('CV_BATCH_MAX_ITEMS', 500))
+    CV_BATCH_CONCURRENCY = int(os.getenv('CV_BATCH_CONCURRENCY', 4))
+
+    # Asynchronous CV rendering (/generate-cv?async=1). Jobs are kept in a SQLite queue shared
+    # by all workers; each worker runs JOB_WORKERS threads draining it (0 disables async mode).
+    # A failed render is retried up to MAX_ATTEMPTS times with backoff from RETRY_DELAY seconds,
+    # and a job whose worker died is picked up again after LEASE_SECONDS (running jobs renew
+    # their lease every third of it).
+    CV_JOBS_DB_PATH = os.getenv('CV_JOBS_DB_PATH', os.path.join(CV_FOLDER, 'cv_jobs.db'))
+    CV_JOB_WORKERS = int(os.getenv('CV_JOB_WORKERS', 2))
+    CV_JOB_MAX_ATTEMPTS = int(os.getenv('CV_JOB_MAX_ATTEMPTS', 3))
+    CV_JOB_RETRY_DELAY = float(os.getenv('CV_JOB_RETRY_DELAY', 2))
+    CV_JOB_LEASE_SECONDS = int(os.getenv('CV_JOB_LEASE_SECONDS', 120))
+    CV_JOB_POLL_INTERVAL = float(os.getenv('CV_JOB_POLL_INTERVAL', 0.5))
+
+    # Metrics. Each process writes its totals to METRICS_DIR every METRICS_FLUSH_INTERVAL
+    # seconds and /metrics sums them across workers. The directory should not outlive a
+    # deploy (dyno filesystems do not); leave METRICS_DIR empty to report per-process metrics.
+    METRICS_DIR = os.getenv('METRICS_DIR', os.path.join('cache', 'metrics'))
+    METRICS_FLUSH_INTERVAL = int(os.getenv('METRICS_FLUSH_INTERVAL', 10))
+
+    # Startup. With LAZY_STARTUP, create_app() only sets up state that is safe to share across
+    # a fork (config, routes, warmed CV templates); databases, background threads and the
+    # Gemini client are set up in each worker after the fork, or on its first request.
+    # gunicorn.conf.py enables it together with --preload. GEMINI_CLIENT_PRELOAD creates the
+    # Gemini client on a background thread as soon as a process starts serving, instead of
+    # on the first Gemini call. A warning is logged when importing the app takes longer than
+    # STARTUP_IMPORT_BUDGET seconds (0 disables the check).
+    LAZY_STARTUP = os.getenv('LAZY_STARTUP', 'false').lower() in ('1', 'true', 'yes')
+    GEMINI_CLIENT_PRELOAD = os.getenv('GEMINI_CLIENT_PRELOAD', 'true').lower() in ('1', 'true', 'yes')
+    STARTUP_IMPORT_BUDGET = float(os.getenv('STARTUP_IMPORT_BUDGET', 2.0))
+
     # Default application name for PDF headers, etc.
     APP_NAME = os.getenv('APP_NAME', 'Professional CV Generator')
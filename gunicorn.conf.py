@@ -0,0 +1,23 @@
+# gunicorn.conf.py
+"""
+Gunicorn settings, read automatically by `gunicorn app:app` (see Procfile).
+
+The app is preloaded: the master imports it once, with the configuration,
+routes and warmed-up CV templates, and forks workers that share those pages
+and start in milliseconds. Databases, background threads and the Gemini
+client are set up in each worker after the fork (app.init_process()), so no
+SQLite connection or grpc state crosses a fork. Set GUNICORN_PRELOAD=false
+to import the app in every worker instead.
+"""
+import os
+
+preload_app = os.getenv('GUNICORN_PRELOAD', 'true').lower() in ('1', 'true', 'yes')
+
+if preload_app:
+    # Must be set before the master imports the app (and config.py).
+    os.environ.setdefault('LAZY_STARTUP', 'true')
+
+def post_worker_init(worker):
+    """Initializes the worker process once it has loaded the app, before it accepts requests."""
+    from app import init_process
+    init_process(worker.wsgi)
@@ -1,72 +1,91 @@
 # routes/career_routes.py
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, current_app, request, jsonify
 import json
-from services.gemini_service import get_gemini_response
+import re
+from services.canonicalizer import canonicalize
+from services.gemini_service import get_structured_batch_async, get_structured_response_async, stream_gemini_response
+from services.prompts import (
+    build_career_guidance_batch_prompt, build_career_guidance_prompt, build_recommendations_batch_prompt,
+    build_recommendations_prompt,
+)
+from services.query_log import record_query
+from services.resilience import UpstreamUnavailableError
+from services.structured_output import CAREER_GUIDANCE_SCHEMA, JOBS_SCHEMA, EmptyOutputError, StructuredOutputError
+from utils import metrics
+from utils.streaming import requested_stream_format, streaming_response
 
 # Create a Blueprint for career-related routes.
 # This helps in organizing routes and applying specific prefixes or middleware.
 career_bp = Blueprint('career', __name__)
 
+# Categories returned by /career_guidance, in the order the prompt asks for them.
+GUIDANCE_FIELDS = ['keySkills', 'careerPaths', 'certifications', 'industryTrends']
+
+# Locates the start of each category's value in a (possibly partial) JSON response.
+_GUIDANCE_FIELD_PATTERNS = {field: re.compile(rf'"{field}"\s*:\s*') for field in GUIDANCE_FIELDS}
+_JSON_DECODER = json.JSONDecoder()
+
+# Requests whose model output could not be parsed; divide by the route's request count for a rate.
+_JSON_PARSE_FAILURES = metrics.counter(
+    "route_json_parse_failures_total", "Requests whose Gemini JSON response could not be parsed.", ("route",)
+)
+
 @career_bp.route('/get_recommendations', methods=['POST'])
-def get_recommendations():
+async def get_recommendations():
     """
     Endpoint to retrieve career opportunities based on a specified program.
 
     Expects a JSON payload with a 'program' field.
     Leverages the Gemini API to fetch structured job recommendations.
+
+    With a list of programs in 'programs' (or 'program'), returns a list of
+    {"program", "jobs"} entries in request order; uncached programs are asked
+    about in one batched Gemini call, and each gets the same answer it would
+    get on its own.
     """
     data = request.json
-    program = data.get("program", "Unknown Program")
-
-    # Construct a detailed prompt for the Gemini API to ensure structured JSON output.
-    prompt = f"""
-        Provide a structured JSON response with career opportunities for a degree in {program}.
-        The JSON must have this format:
-        {{
-        "jobs": [
-            {{
-            "title": "Job Title",
-            "description": "Brief job description.",
-            "skills": ["Skill1", "Skill2"],
-            "education": "Required education level",
-            "outlook": "Job market outlook",
-            "salary": "Average salary range"
-            }}
-        ]
-        }}
-        """
-    gemini_response = get_gemini_response(prompt)
-
-    # Clean the Gemini response by removing markdown code block delimiters.
-    cleaned_response = gemini_response.strip('```json \n').strip('```')
-
+    programs = data.get("programs", data.get("program"))
+    if isinstance(programs, list):
+        return await _batch_recommendations(programs)
     try:
-        # Attempt to parse the cleaned response as JSON.
-        structured_output = json.loads(cleaned_response)
-        recommendations = structured_output.get("jobs", [])
-
-        # Ensure that the 'jobs' field is indeed a list.
-        if not isinstance(recommendations, list):
-            print(f"Warning: 'jobs' field in Gemini response was not a list: {type(recommendations)}")
-            recommendations = [] # Default to an empty list to prevent errors
+        # "CS", "B.Sc Computer Sci" and "computer science" share one prompt and cache entry.
+        program = canonicalize('program', data.get("program", "Unknown Program"))
 
-        return jsonify(recommendations)
-    except json.JSONDecodeError as e:
+        # Counted for the cache warmup's top-N list.
+        if data.get("program"):
+            record_query('program', program)
+        prompt = build_recommendations_prompt(program)
+        # JSON mode plus schema coercion replaces manual fence stripping and type checks.
+        structured_output = await get_structured_response_async(prompt, JOBS_SCHEMA)
+        return jsonify(structured_output["jobs"])
+    except EmptyOutputError as e:
+        # Valid JSON without any jobs, even after re-querying; answered with no jobs, as before (not cached).
+        print(f"No recommendations in Gemini response for /get_recommendations: {e}")
+        return jsonify([])
+    except StructuredOutputError as e:
+        _JSON_PARSE_FAILURES.inc("/get_recommendations")
         # Log parsing errors for debugging purposes.
-        print(f"JSON parsing error in /get_recommendations: {e}. Raw response: {cleaned_response}")
+        print(f"JSON parsing error in /get_recommendations: {e}")
         return jsonify({"error": "Failed to parse recommendations from AI.", "details": str(e)}), 500
+    except UpstreamUnavailableError as e:
+        return _upstream_unavailable(e)
     except Exception as e:
         # Catch any other unexpected errors during processing.
         print(f"An unexpected error occurred in /get_recommendations: {e}")
         return jsonify({"error": "An unexpected error occurred.", "details": str(e)}), 500
 
 @career_bp.route('/career_guidance', methods=['POST'])
-def career_guidance():
+async def career_guidance():
     """
     Endpoint to provide career guidance based on a specified program.
     
     Expects a JSON payload with a 'program' field.
     Returns structured career guidance with key skills, career paths, certifications, and industry trends.
+
+    With a list of programs in 'programs' (or 'program'), returns a list of
+    {"program", "guidance"} entries in request order (or {"program", "error"}
+    for a program without usable guidance); uncached programs are asked about
+    in one batched Gemini call. Streaming is only supported for one program.
     """
     try:
         # Validate request data
@@ -74,118 +93,41 @@ def career_guidance():
             return jsonify({"error": "Request must contain JSON data"}), 400
         
         data = request.json
+        programs = data.get("programs", data.get("program"))
+        if isinstance(programs, list):
+            if requested_stream_format(request):
+                return jsonify({"error": "Streaming is only supported for a single program"}), 400
+            return await _batch_career_guidance(programs)
+
         program = data.get("program", "").strip()
-        
-        if not program:
-            return jsonify({"error": "Program field is required and cannot be empty"}), 400
-        
-        if len(program) < 2:
-            return jsonify({"error": "Program field must be at least 2 characters long"}), 400
-        
-        if len(program) > 100:
-            return jsonify({"error": "Program field must be less than 100 characters"}), 400
+        error = _program_error(program)
+        if error:
+            return jsonify({"error": error}), 400
 
-        # Craft a detailed prompt for Gemini to generate career guidance in the expected format
-        prompt = f"""
-        You are a professional career advisor. Provide comprehensive career guidance for someone studying {program}.
-        
-        Return the response as valid JSON with this EXACT structure:
-        {{
-            "keySkills": [
-                "Skill 1",
-                "Skill 2",
-                "Skill 3",
-                "Skill 4",
-                "Skill 5"
-            ],
-            "careerPaths": [
-                "Career Path 1",
-                "Career Path 2", 
-                "Career Path 3",
-                "Career Path 4",
-                "Career Path 5"
-            ],
-            "certifications": [
-                "Certification 1",
-                "Certification 2",
-                "Certification 3",
-                "Certification 4"
-            ],
-            "industryTrends": [
-                "Industry Trend 1",
-                "Industry Trend 2",
-                "Industry Trend 3",
-                "Industry Trend 4"
-            ]
-        }}
-        
-        Requirements:
-        - Provide 5-8 key skills that are essential for this field
-        - List 5-7 realistic career paths/job titles
-        - Include 4-6 relevant certifications or qualifications
-        - Describe 4-5 current industry trends affecting this field
-        - All entries should be concise but informative (1-2 sentences max)
-        - Return ONLY valid JSON, no additional text or markdown
-        """
-        
-        gemini_response = get_gemini_response(prompt)
+        program = canonicalize('program', program)
+        record_query('program', program)
+        prompt = build_career_guidance_prompt(program)
 
-        # Clean the response more thoroughly
-        cleaned_response = gemini_response.strip()
-        
-        # Remove common markdown formatting
-        if cleaned_response.startswith('```json'):
-            cleaned_response = cleaned_response[7:]
-        elif cleaned_response.startswith('```'):
-            cleaned_response = cleaned_response[3:]
-            
-        if cleaned_response.endswith('```'):
-            cleaned_response = cleaned_response[:-3]
-            
-        cleaned_response = cleaned_response.strip()
-
-        # Parse the JSON response
+        stream_format = requested_stream_format(request)
+        if stream_format:
+            return streaming_response(_stream_career_guidance(prompt, program), stream_format)
+
+        # Request, decode and validate the JSON response in one step.
         try:
-            structured_output = json.loads(cleaned_response)
-        except json.JSONDecodeError as parse_error:
+            structured_output = await get_structured_response_async(prompt, CAREER_GUIDANCE_SCHEMA)
+        except EmptyOutputError as e:
+            print(f"No career guidance in Gemini response for /career_guidance: {e}")
+            structured_output = {}
+        except StructuredOutputError as parse_error:
+            _JSON_PARSE_FAILURES.inc("/career_guidance")
             print(f"JSON parsing error in /career_guidance: {parse_error}")
-            print(f"Raw Gemini response: {gemini_response}")
-            print(f"Cleaned response: {cleaned_response}")
             return jsonify({
                 "error": "Failed to parse career guidance from AI service",
                 "message": "The AI service returned an invalid response format"
             }), 500
 
-        # Validate the response structure
-        required_fields = ['keySkills', 'careerPaths', 'certifications', 'industryTrends']
-        response_data = {}
-        
-        for field in required_fields:
-            field_data = structured_output.get(field, [])
-            
-            # Ensure it's a list
-            if not isinstance(field_data, list):
-                print(f"Warning: '{field}' field was not a list: {type(field_data)}")
-                field_data = []
-            
-            # Ensure it's not empty
-            if len(field_data) == 0:
-                print(f"Warning: '{field}' field was empty")
-                # Provide fallback data based on field type
-                if field == 'keySkills':
-                    field_data = [f"Core skills relevant to {program}"]
-                elif field == 'careerPaths':
-                    field_data = [f"Entry-level positions in {program}"]
-                elif field == 'certifications':
-                    field_data = [f"Industry certifications for {program}"]
-                elif field == 'industryTrends':
-                    field_data = [f"Current trends in {program} industry"]
-            
-            response_data[field] = field_data
-
-        # Validate that we have some meaningful data
-        total_items = sum(len(response_data[field]) for field in required_fields)
-        if total_items < 4:  # At least one item per category
+        response_data = _guidance_response(structured_output, program)
+        if response_data is None:
             return jsonify({
                 "error": "Insufficient career guidance data generated",
                 "message": "Please try again or contact support if the issue persists"
@@ -193,9 +135,199 @@ def career_guidance():
 
         return jsonify(response_data)
 
+    except UpstreamUnavailableError as e:
+        return _upstream_unavailable(e)
     except Exception as e:
         print(f"Unexpected error in /career_guidance: {e}")
         return jsonify({
             "error": "An unexpected error occurred while processing your request",
             "message": "Please try again later or contact support if the issue persists"
-        }), 500
\ No newline at end of file
+        }), 500
+
+async def _batch_recommendations(programs):
+    """Answers /get_recommendations for a list of programs."""
+    programs, error = _validate_programs(programs)
+    if error:
+        return jsonify({"error": error}), 400
+    try:
+        results = await _get_program_batch(programs, build_recommendations_prompt, build_recommendations_batch_prompt,
+                                           JOBS_SCHEMA)
+    except StructuredOutputError as e:
+        _JSON_PARSE_FAILURES.inc("/get_recommendations")
+        print(f"JSON parsing error in /get_recommendations: {e}")
+        return jsonify({"error": "Failed to parse recommendations from AI.", "details": str(e)}), 500
+    except UpstreamUnavailableError as e:
+        return _upstream_unavailable(e)
+    except Exception as e:
+        print(f"An unexpected error occurred in /get_recommendations: {e}")
+        return jsonify({"error": "An unexpected error occurred.", "details": str(e)}), 500
+    return jsonify([{"program": program, "jobs": results[program]["jobs"]} for program in programs])
+
+async def _batch_career_guidance(programs):
+    """Answers /career_guidance for a list of programs."""
+    programs, error = _validate_programs(programs)
+    if error:
+        return jsonify({"error": error}), 400
+    try:
+        results = await _get_program_batch(programs, build_career_guidance_prompt, build_career_guidance_batch_prompt,
+                                           CAREER_GUIDANCE_SCHEMA)
+    except StructuredOutputError as parse_error:
+        _JSON_PARSE_FAILURES.inc("/career_guidance")
+        print(f"JSON parsing error in /career_guidance: {parse_error}")
+        return jsonify({
+            "error": "Failed to parse career guidance from AI service",
+            "message": "The AI service returned an invalid response format"
+        }), 500
+    entries = []
+    for program in programs:
+        guidance = _guidance_response(results[program], program)
+        if guidance is None:
+            entries.append({"program": program, "error": "Insufficient career guidance data generated"})
+        else:
+            entries.append({"program": program, "guidance": guidance})
+    return jsonify(entries)
+
+async def _get_program_batch(programs, build_prompt, build_batch_prompt, schema):
+    """
+    Canonicalizes the programs, records them for the cache warmup and fetches their
+    structured answers in batches.
+
+    Returns:
+        dict: Each requested program to its answer; programs with the same canonical name share one.
+    """
+    canonical = {program: canonicalize('program', program) for program in programs}
+    unique = list(dict.fromkeys(canonical.values()))
+    for program in unique:
+        record_query('program', program)
+    results = await get_structured_batch_async(
+        unique, build_prompt, build_batch_prompt, schema, batch_size=current_app.config['GEMINI_BATCH_SIZE']
+    )
+    return {program: results[canonical[program]] for program in programs}
+
+def _validate_programs(programs):
+    """
+    Checks a list of programs from a multi-program request.
+
+    Returns:
+        tuple: (programs, error) where programs are stripped and deduplicated in
+            request order, and error is a message for a 400 response, or None.
+    """
+    max_programs = current_app.config['CAREER_BATCH_MAX_PROGRAMS']
+    if not programs:
+        return None, "Programs list is required and cannot be empty"
+    if not all(isinstance(program, str) for program in programs):
+        return None, "Programs must be strings"
+    programs = list(dict.fromkeys(program.strip() for program in programs))
+    if len(programs) > max_programs:
+        return None, f"At most {max_programs} programs can be requested at once"
+    for program in programs:
+        error = _program_error(program)
+        if error:
+            return None, f"{error} ('{program[:100]}')"
+    return programs, None
+
+def _program_error(program):
+    """Returns why a program name is invalid, or None if it is acceptable."""
+    if not program:
+        return "Program field is required and cannot be empty"
+    if len(program) < 2:
+        return "Program field must be at least 2 characters long"
+    if len(program) > 100:
+        return "Program field must be less than 100 characters"
+    return None
+
+def _guidance_response(structured_output, program):
+    """
+    Normalizes a career guidance answer for the response.
+
+    Returns:
+        dict or None: The categories, or None if there is too little data to return.
+    """
+    # Validate the response structure
+    response_data = {}
+
+    for field in GUIDANCE_FIELDS:
+        response_data[field] = _normalize_guidance_field(field, structured_output.get(field, []), program)
+
+    # Validate that we have some meaningful data
+    total_items = sum(len(response_data[field]) for field in GUIDANCE_FIELDS)
+    if total_items < 4:  # At least one item per category
+        return None
+    return response_data
+
+def _upstream_unavailable(error):
+    """Builds the 503 response sent while Gemini is unavailable and nothing is cached."""
+    print(f"Gemini unavailable: {error}")
+    response = jsonify({
+        "error": "The AI service is temporarily unavailable",
+        "message": "Please try again shortly."
+    })
+    response.headers['Retry-After'] = str(max(1, round(error.retry_after or 5)))
+    return response, 503
+
+def _normalize_guidance_field(field, field_data, program):
+    """
+    Validates one career guidance category, substituting a generic entry if it is unusable.
+
+    Args:
+        field (str): One of GUIDANCE_FIELDS.
+        field_data: The value the model returned for the field.
+        program (str): The program the guidance is for, used in fallback text.
+
+    Returns:
+        list: A non-empty list of entries.
+    """
+    # Ensure it's a list
+    if not isinstance(field_data, list):
+        print(f"Warning: '{field}' field was not a list: {type(field_data)}")
+        field_data = []
+
+    # Ensure it's not empty
+    if len(field_data) == 0:
+        print(f"Warning: '{field}' field was empty")
+        # Provide fallback data based on field type
+        if field == 'keySkills':
+            field_data = [f"Core skills relevant to {program}"]
+        elif field == 'careerPaths':
+            field_data = [f"Entry-level positions in {program}"]
+        elif field == 'certifications':
+            field_data = [f"Industry certifications for {program}"]
+        elif field == 'industryTrends':
+            field_data = [f"Current trends in {program} industry"]
+
+    return field_data
+
+def _extract_guidance_field(text, field):
+    """
+    Returns the value of field from a partial JSON response, or None if it is not complete yet.
+    """
+    match = _GUIDANCE_FIELD_PATTERNS[field].search(text)
+    if not match:
+        return None
+    try:
+        value, _ = _JSON_DECODER.raw_decode(text, match.end())
+    except json.JSONDecodeError:
+        return None
+    return value
+
+def _stream_career_guidance(prompt, program):
+    """
+    Yields ('category', {'field', 'items'}) events as each guidance category completes in the Gemini stream.
+
+    Categories the model never produced are emitted with fallback entries at the end.
+    """
+    buffer = ""
+    pending = list(GUIDANCE_FIELDS)
+    for chunk in stream_gemini_response(prompt):
+        buffer += chunk
+        for field in list(pending):
+            value = _extract_guidance_field(buffer, field)
+            if value is not None:
+                pending.remove(field)
+                yield "category", {"field": field, "items": _normalize_guidance_field(field, value, program)}
+
+    if pending:
+        _JSON_PARSE_FAILURES.inc("/career_guidance")
+    for field in pending:
+        print(f"Warning: '{field}' field missing from streamed guidance. Raw response: {buffer}")
+        yield "category", {"field": field, "items": _normalize_guidance_field(field, [], program)}
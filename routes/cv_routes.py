@@ -1,9 +1,14 @@
 # routes/cv_routes.py
-from flask import Blueprint, request, jsonify, send_from_directory, current_app
+from flask import Blueprint, Response, request, jsonify, redirect, send_from_directory, current_app, stream_with_context
+import json
 import os
-import uuid
+import re
 from datetime import datetime
-from services.cv_service import generate_cv_pdf
+from services.cv_index import get_cv_index
+from services.cv_jobs import DONE, FAILED, get_cv_job_queue, store_rendered_cv
+from services.cv_storage import get_cv_store
+from services.cv_service import RenderQueueFullError, available_templates, render_cv_batch, render_cv_pdf
+from utils.zip_stream import stream_zip
 
 # Create a Blueprint for CV-related routes.
 cv_bp = Blueprint('cv', __name__)
@@ -13,8 +18,19 @@ def generate_cv():
     """
     Endpoint to generate a CV PDF from provided JSON data.
 
-    Expects a JSON payload containing CV details (e.g., name, education, experience).
-    A unique filename is generated, and the PDF is stored temporarily.
+    Expects a JSON payload containing CV details (e.g., name, education, experience),
+    optionally with a 'template' naming one of the registered CV templates.
+    The PDF is kept in the CV store (see services.cv_storage) under a filename
+    derived from a hash of the input, so an identical request reuses the
+    existing file instead of re-rendering, whichever node rendered it.
+
+    With '?inline=1', the PDF is rendered in memory and returned directly in the
+    response body, skipping the filesystem and the separate download request.
+
+    With '?async=1', the render is queued instead and the response is a 202
+    with a job id; poll /cv-jobs/<id> for progress and the downloadUrl.
+    Identical payloads share one job. Without job workers configured, the
+    request is handled synchronously.
     """
     try:
         data = request.get_json()
@@ -22,22 +38,51 @@ def generate_cv():
         # Basic validation: ensure 'name' is provided.
         if not data or not data.get('name'):
             return jsonify({"error": "Invalid data", "details": "Name is required for CV generation."}), 400
+        if not _is_known_template(data):
+            return jsonify({"error": "Invalid data", "details": f"Unknown template. Available templates: {', '.join(available_templates())}."}), 400
 
-        # Generate a unique filename to avoid collisions and enable easy cleanup.
-        filename = f"cv_{uuid.uuid4().hex}.pdf"
-        filepath = os.path.join(current_app.config['CV_FOLDER'], filename)
+        if request.args.get('inline', '').lower() in ('1', 'true', 'yes'):
+            pdf_bytes = render_cv_pdf(data)
+            return Response(
+                pdf_bytes,
+                mimetype='application/pdf',
+                headers={
+                    'Content-Disposition': f'attachment; filename="{_download_name()}"',
+                    'Content-Length': str(len(pdf_bytes)),
+                    'Cache-Control': 'no-store',
+                },
+            )
 
-        # Call the service layer to handle the PDF generation logic.
-        generate_cv_pdf(data, filepath)
+        job_queue = get_cv_job_queue()
+        if job_queue is not None and request.args.get('async', '').lower() in ('1', 'true', 'yes'):
+            # Decouple the response from render time: queue the job and let the client poll.
+            job, created = job_queue.enqueue(data)
+            # reused: an identical payload was already queued, running or done.
+            response = jsonify({**_job_response(job), "reused": not created})
+            response.headers['Location'] = f"/cv-jobs/{job['id']}"
+            return response, 202
+
+        # Call the service layer to render (or reuse) the PDF and store it.
+        filename, reused = store_rendered_cv(data, current_app.config, current_app.logger)
 
         # Return details for downloading the generated CV.
         return jsonify({
             "success": True,
             "filename": filename,
             "downloadUrl": f"/download-cv/{filename}",
+            "reused": reused,
             "message": "CV generated successfully. Use the downloadUrl to retrieve it."
-        }), 201 # HTTP 201 Created
+        }), 200 if reused else 201 # HTTP 201 Created for a new file
 
+    except RenderQueueFullError:
+        # Backpressure: every render slot is busy, so ask the client to retry shortly.
+        current_app.logger.warning("CV render queue full; rejecting request.")
+        response = jsonify({
+            "error": "Server is busy",
+            "details": "Too many CVs are being generated right now. Please try again shortly."
+        })
+        response.headers['Retry-After'] = '1'
+        return response, 429
     except Exception as e:
         # Log the error and return a generic error message to the client.
         current_app.logger.error(f"Error generating CV: {str(e)}", exc_info=True)
@@ -46,12 +91,45 @@ def generate_cv():
             "details": "An internal server error occurred."
         }), 500
 
+@cv_bp.route('/generate-cv/batch', methods=['POST'])
+def generate_cv_batch():
+    """
+    Endpoint to generate many CVs in one request, returned as a streamed ZIP archive.
+
+    Accepts either a JSON array of CV payloads or an NDJSON body
+    (Content-Type: application/x-ndjson) with one payload per line. CVs are
+    rendered in parallel and each PDF is added to the archive as soon as it is
+    ready. A final 'manifest.json' entry lists the outcome of every item,
+    including validation and rendering errors.
+    """
+    max_items = current_app.config['CV_BATCH_MAX_ITEMS']
+    if request.mimetype == 'application/x-ndjson':
+        items = _iter_ndjson(request.stream)
+    else:
+        data = request.get_json(silent=True)
+        if not isinstance(data, list):
+            return jsonify({"error": "Invalid data", "details": "Expected a JSON array of CV payloads."}), 400
+        if len(data) > max_items:
+            return jsonify({"error": "Invalid data", "details": f"At most {max_items} CVs can be generated per batch."}), 400
+        items = iter(data)
+
+    entries = _batch_zip_entries(items, max_items, current_app.config['CV_BATCH_CONCURRENCY'])
+    archive_name = f"cv_batch_{datetime.now().strftime('%Y%m%d')}.zip"
+    return Response(
+        stream_with_context(stream_zip(entries)),
+        mimetype='application/zip',
+        headers={'Content-Disposition': f'attachment; filename="{archive_name}"'},
+    )
+
 @cv_bp.route('/download-cv/<filename>', methods=['GET'])
 def download_cv(filename):
     """
     Endpoint to download a previously generated CV PDF.
 
     Includes security checks to prevent directory traversal attacks.
+    Responses carry a strong ETag, and a matching If-None-Match gets a 304.
+    Depending on the CV store, the file is sent from local disk, streamed
+    from shared storage, or the client is redirected to a pre-signed URL.
     """
     try:
         # Basic security check: ensure filename is safe and ends with .pdf.
@@ -60,14 +138,45 @@ def download_cv(filename):
             current_app.logger.warning(f"Attempted download with invalid filename: {filename}")
             return jsonify({"error": "Invalid filename provided."}), 400
 
-        # Serve the file from the configured CV folder.
-        return send_from_directory(
-            directory=current_app.config['CV_FOLDER'],
-            path=filename,
-            as_attachment=True, # Forces download rather than display in browser
-            download_name=f"cv_{datetime.now().strftime('%Y%m%d')}.pdf", # Suggests a friendly download name
-            mimetype='application/pdf' # Specifies content type
+        store = get_cv_store()
+        stored = store.stat(filename)
+        etag = _cv_etag(filename, stored)
+        # Downloads drive least-recently-used eviction.
+        get_cv_index().mark_used(filename)
+        if request.if_none_match.contains(etag):
+            # The client already has this exact file; skip the transfer.
+            response = Response(status=304)
+            response.set_etag(etag)
+            return response
+
+        # Object storage: let the client fetch the file directly.
+        url = store.download_url(filename, _download_name())
+        if url:
+            return redirect(url, code=302)
+
+        filepath = store.local_path(filename)
+        if filepath:
+            # Serve the file from local disk.
+            return send_from_directory(
+                directory=os.path.dirname(filepath),
+                path=filename,
+                as_attachment=True, # Forces download rather than display in browser
+                download_name=_download_name(), # Suggests a friendly download name
+                mimetype='application/pdf', # Specifies content type
+                etag=etag
+            )
+
+        # Stream the file from the store.
+        response = Response(
+            stream_with_context(store.iter_chunks(filename)),
+            mimetype='application/pdf',
+            headers={
+                'Content-Disposition': f'attachment; filename="{_download_name()}"',
+                'Content-Length': str(stored.size),
+            },
         )
+        response.set_etag(etag)
+        return response
 
     except FileNotFoundError:
         # Handle cases where the requested CV file does not exist.
@@ -78,3 +187,101 @@ def download_cv(filename):
         current_app.logger.error(f"Error downloading CV {filename}: {str(e)}", exc_info=True)
         return jsonify({"error": "Failed to download CV."}), 500
 
+@cv_bp.route('/cv-jobs/<job_id>', methods=['GET'])
+def cv_job_status(job_id):
+    """
+    Endpoint reporting the progress of a CV job queued with /generate-cv?async=1.
+
+    While the job is pending the response carries a Retry-After hint for polling;
+    once it is done it includes the downloadUrl.
+    """
+    job_queue = get_cv_job_queue()
+    job = job_queue.get(job_id) if job_queue is not None and re.fullmatch(r'[0-9a-f]{32}', job_id) else None
+    if job is None:
+        return jsonify({"error": "CV job not found."}), 404
+    response = jsonify(_job_response(job))
+    if job['status'] not in (DONE, FAILED):
+        response.headers['Retry-After'] = '1'
+    return response
+
+def _job_response(job):
+    """Builds the public JSON description of a CV job."""
+    body = {
+        "jobId": job['id'],
+        "status": job['status'],
+        "stage": job['stage'],
+        "attempts": job['attempts'],
+        "statusUrl": f"/cv-jobs/{job['id']}",
+    }
+    if 'queue_position' in job:
+        body["queuePosition"] = job['queue_position']
+    if job['status'] == DONE:
+        body["filename"] = job['filename']
+        body["downloadUrl"] = f"/download-cv/{job['filename']}"
+    elif job['status'] == FAILED:
+        body["error"] = "Failed to generate CV."
+    return body
+
+def _download_name():
+    """Returns the friendly filename suggested to clients for a downloaded CV."""
+    return f"cv_{datetime.now().strftime('%Y%m%d')}.pdf"
+
+def _cv_etag(filename, stored):
+    """Builds a strong ETag from the CV's content-hash filename and its stored version."""
+    return f"{filename[:-len('.pdf')]}-{stored.version}"
+
+def _is_known_template(data):
+    """Checks that the CV payload's optional 'template' names a registered template."""
+    return not data.get('template') or data['template'] in available_templates()
+
+def _iter_ndjson(stream):
+    """Yields one decoded payload per non-empty NDJSON line, or the JSONDecodeError for a bad line."""
+    for line in stream:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield json.loads(line)
+        except json.JSONDecodeError as e:
+            yield e
+
+def _batch_zip_entries(items, max_items, concurrency):
+    """
+    Renders batch items and yields (archive_name, bytes) pairs for stream_zip().
+
+    Invalid items are recorded in the manifest without being rendered.
+    """
+    manifest = []
+
+    def valid_items():
+        for index, data in enumerate(items):
+            if index >= max_items:
+                manifest.append({"index": index, "status": "error", "error": f"Batch limit of {max_items} CVs exceeded."})
+                break
+            if isinstance(data, Exception):
+                manifest.append({"index": index, "status": "error", "error": f"Invalid JSON: {data}"})
+            elif not isinstance(data, dict) or not data.get('name'):
+                manifest.append({"index": index, "status": "error", "error": "Name is required for CV generation."})
+            elif not _is_known_template(data):
+                manifest.append({"index": index, "status": "error", "error": "Unknown template."})
+            else:
+                yield (index, data.get('name')), data
+
+    for (index, name), pdf_bytes, error in render_cv_batch(valid_items(), concurrency):
+        if error is not None:
+            current_app.logger.error(f"Error generating CV {index} in batch: {error}")
+            manifest.append({"index": index, "name": name, "status": "error", "error": "Failed to generate CV."})
+            continue
+        safe_name = re.sub(r'[^A-Za-z0-9_-]+', '_', str(name)).strip('_')[:40] or 'cv'
+        archive_name = f"{index:04d}_{safe_name}.pdf"
+        manifest.append({"index": index, "name": name, "status": "ok", "file": archive_name})
+        yield archive_name, pdf_bytes
+
+    manifest.sort(key=lambda item: item["index"])
+    succeeded = sum(1 for item in manifest if item["status"] == "ok")
+    yield "manifest.json", json.dumps({
+        "total": len(manifest),
+        "succeeded": succeeded,
+        "failed": len(manifest) - succeeded,
+        "items": manifest,
+    }, indent=2).encode('utf-8')
@@ -1,13 +1,19 @@
 # routes/interview_routes.py
 from flask import Blueprint, request, jsonify
-import re
-from services.gemini_service import get_gemini_response
+from services.canonicalizer import canonicalize
+from services.gemini_service import get_gemini_response_async, stream_gemini_response
+from services.prompts import build_interview_prompt
+from services.query_log import record_query
+from services.rate_limiter import PRIORITY_INTERACTIVE
+from services.resilience import UpstreamUnavailableError
+from utils.interview_parser import InterviewQuestionParser, parse_interview_questions
+from utils.streaming import requested_stream_format, streaming_response
 
 # Create a Blueprint for interview-related routes.
 interview_bp = Blueprint('interview', __name__)
 
 @interview_bp.route('/interview-questions', methods=['POST', 'OPTIONS'])
-def get_interview_questions():
+async def get_interview_questions():
     """
     Endpoint to generate interview questions and answer tips for a given role.
 
@@ -32,122 +38,34 @@ def get_interview_questions():
         return jsonify({"error": "Role is required to generate interview questions."}), 400
 
     try:
-        # Construct a precise prompt for Gemini to guide its response format.
-        prompt = f"""
-        Generate a list of 10 common interview questions for the role of {role}.
-        For each question, provide 3-5 tips on how to answer it effectively.
-        Format the response as follows:
+        # "swe", "Software Developer" and "software engineer" share one prompt and cache entry.
+        role = canonicalize('role', role)
+        # Counted for the cache warmup's top-N list.
+        record_query('role', role)
+        prompt = build_interview_prompt(role)
 
-        1. [Question text]
-           - Tips: [Tip 1], [Tip 2], [Tip 3], etc.
+        stream_format = requested_stream_format(request)
+        if stream_format:
+            return streaming_response(_stream_interview_questions(prompt), stream_format)
 
-        2. [Question text]
-           - Tips: [Tip 1], [Tip 2], [Tip 3], etc.
-
-        ...and so on.
-
-        Make sure each question is clearly numbered and each set of tips is on a separate line starting with "- Tips:".
-        """
-
-        gemini_response = get_gemini_response(prompt)
-
-        # Robust parsing logic to extract questions and tips from Gemini's free-form text.
-        questions_with_tips = []
-        lines = gemini_response.strip().split("\n")
-        current_question = None
-        question_pattern = re.compile(r"^\s*(\d+)[\.\)]?\s*(.+)") # Matches numbered questions
-        tips_pattern = re.compile(r"^\s*[-•*]?\s*(?:Tips|tips|TIPS)?:?\s*(.+)") # Matches tip lines
-
-        i = 0
-        while i < len(lines):
-            line = lines[i].strip()
-            if not line:
-                i += 1
-                continue
-
-            question_match = question_pattern.match(line)
-            if question_match:
-                # If a new question is found, store the previous one if it's complete.
-                if current_question and current_question.get("question") and current_question.get("tips") is not None:
-                    questions_with_tips.append(current_question)
-
-                question_text = question_match.group(2).strip()
-                current_question = {"question": question_text, "tips": []}
-                i += 1
-                continue
-
-            tips_match = tips_pattern.match(line)
-            if tips_match and current_question:
-                tips_text = tips_match.group(1).strip()
-                # Try splitting tips by common delimiters.
-                parsed_tips = []
-                for delimiter in [", ", "; ", "\n- ", " • "]:
-                    if delimiter in tips_text:
-                        parsed_tips = [tip.strip() for tip in tips_text.split(delimiter) if tip.strip()]
-                        if parsed_tips:
-                            break
-                if not parsed_tips and tips_text:
-                    parsed_tips = [tips_text] # Fallback to single tip if no delimiter found
-
-                current_question["tips"].extend(parsed_tips)
-
-                # Continue consuming lines that look like additional tips for the current question.
-                j = i + 1
-                while j < len(lines) and not question_pattern.match(lines[j].strip()):
-                    next_line = lines[j].strip()
-                    if next_line and (next_line.startswith("-") or next_line.startswith("•")):
-                        tip = next_line.lstrip("-•").strip()
-                        if tip:
-                            current_question["tips"].append(tip)
-                    j += 1
-                i = j
-                continue
-
-            # Handle cases where tips might be on new lines without a "Tips:" prefix but start with a bullet.
-            if current_question and (line.startswith("-") or line.startswith("•")):
-                tip = line.lstrip("-•").strip()
-                if tip:
-                    current_question["tips"].append(tip)
-            i += 1
-
-        # Append the last processed question if it exists and is valid.
-        if current_question and current_question.get("question") and current_question.get("tips") is not None:
-            questions_with_tips.append(current_question)
-
-        # Fallback parsing if initial structured parsing fails (e.g., Gemini returns less structured text).
-        if not questions_with_tips:
-            print("Warning: Initial parsing failed. Attempting fallback parsing for interview questions.")
-            paragraphs = gemini_response.split("\n\n")
-            for paragraph in paragraphs:
-                lines = paragraph.strip().split("\n")
-                if not lines:
-                    continue
-                potential_question = lines[0].strip()
-                if re.search(r"^\d+[\.\)]|question|interview", potential_question.lower()):
-                    question_text = re.sub(r"^\d+[\.\)]?\s*", "", potential_question).strip()
-                    tips = []
-                    for line in lines[1:]:
-                        line = line.strip()
-                        if line and not line.lower().startswith(("question", "interview")):
-                            tip = re.sub(r"^[-•*]?\s*", "", line).strip()
-                            if tip:
-                                tips.append(tip)
-                    if question_text and tips:
-                        questions_with_tips.append({"question": question_text, "tips": tips})
+        # A user is waiting on this page; it gets quota ahead of other Gemini calls.
+        gemini_response = await get_gemini_response_async(prompt, priority=PRIORITY_INTERACTIVE)
 
         # Ensure a maximum of 10 questions and 5 tips per question for consistency.
-        questions_with_tips = questions_with_tips[:10]
-        for q in questions_with_tips:
-            if not q["tips"]:
-                q["tips"] = [
-                    "Prepare specific examples from your experience.",
-                    "Be concise and clear in your response.",
-                    "Highlight relevant skills and accomplishments."
-                ]
-            q["tips"] = q["tips"][:5] # Limit tips to 5
+        questions = parse_interview_questions(gemini_response, max_questions=10, max_tips=5)
+        questions_with_tips = [_finalize_question(q) for q in questions]
 
         print(f"Successfully parsed {len(questions_with_tips)} interview questions.")
         return jsonify({"questions": questions_with_tips})
+    except UpstreamUnavailableError as e:
+        # Gemini is down (or the circuit breaker is open) and nothing is cached: ask the client to back off.
+        print(f"Gemini unavailable in /interview-questions: {e}")
+        response = jsonify({
+            "error": "Interview questions are temporarily unavailable. Please try again shortly.",
+            "questions": []
+        })
+        response.headers['Retry-After'] = str(max(1, round(e.retry_after or 5)))
+        return response, 503
     except Exception as e:
         # Log and return a user-friendly error message in case of an exception.
         print(f"Error in /interview-questions: {str(e)}")
@@ -156,3 +74,31 @@ def get_interview_questions():
             "questions": [] # Ensure an empty list is returned for frontend safety
         }), 500
 
+def _finalize_question(question):
+    """Ensures a question has between one and five tips, substituting generic tips if none were parsed."""
+    if not question["tips"]:
+        question["tips"] = [
+            "Prepare specific examples from your experience.",
+            "Be concise and clear in your response.",
+            "Highlight relevant skills and accomplishments."
+        ]
+    question["tips"] = question["tips"][:5] # Limit tips to 5
+    return question
+
+def _stream_interview_questions(prompt):
+    """
+    Yields ('question', dict) events as soon as each question is complete in the Gemini stream.
+
+    A question is complete once the next numbered question starts; the last one
+    is emitted when the stream ends.
+    """
+    parser = InterviewQuestionParser(max_questions=10, max_tips=5)
+    emitted = 0
+    for chunk in stream_gemini_response(prompt, priority=PRIORITY_INTERACTIVE):
+        for question in parser.feed(chunk):
+            yield "question", _finalize_question(question)
+            emitted += 1
+    for question in parser.close():
+        yield "question", _finalize_question(question)
+        emitted += 1
+    print(f"Successfully streamed {emitted} interview questions.")
@@ -0,0 +1,198 @@
+# services/cache_warmup.py
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from services.canonicalizer import canonicalize
+from services.gemini_service import get_gemini_response, get_structured_response, response_cache_key
+from services.rate_limiter import PRIORITY_BACKGROUND
+from services.prompts import build_career_guidance_prompt, build_interview_prompt, build_recommendations_prompt
+from services.structured_output import CAREER_GUIDANCE_SCHEMA, JOBS_SCHEMA
+
+# Answers warmed for each kind of query, as (prompt builder, schema) pairs.
+# A schema of None means a plain text answer.
+WARMUP_PROMPTS = {
+    'program': [
+        (build_recommendations_prompt, JOBS_SCHEMA),
+        (build_career_guidance_prompt, CAREER_GUIDANCE_SCHEMA),
+    ],
+    'role': [
+        (build_interview_prompt, None),
+    ],
+}
+
+
+class CacheWarmer:
+    """
+    Fills the Gemini response cache with answers for popular programs and roles.
+
+    The warm set is a configured list plus yesterday's top-N queries from the
+    query log. Each run regenerates only answers that are missing or due to
+    expire within refresh_ahead seconds; until a refreshed answer lands, users
+    keep being served the cached one (stale-while-revalidate). After each run
+    the warm answers are written to a JSON snapshot, which is loaded at startup
+    so a fresh process begins warm without calling Gemini.
+    """
+
+    def __init__(self, cache, programs=(), roles=(), top_n=0, concurrency=4,
+                 refresh_ahead=3600, snapshot_path=None, query_log=None):
+        """
+        Args:
+            cache (ResponseCache): The Gemini response cache to fill.
+            programs (list): Programs that are always warmed.
+            roles (list): Roles that are always warmed.
+            top_n (int): Number of yesterday's most frequent programs and roles to add.
+            concurrency (int): Maximum number of Gemini calls made at the same time.
+            refresh_ahead (float): Answers expiring within this many seconds are regenerated.
+            snapshot_path (str, optional): JSON file the warm answers are saved to and loaded from.
+            query_log (QueryLog, optional): Source of yesterday's top queries.
+        """
+        self.cache = cache
+        self.programs = list(programs)
+        self.roles = list(roles)
+        self.top_n = top_n
+        self.concurrency = max(1, concurrency)
+        self.refresh_ahead = refresh_ahead
+        self.snapshot_path = snapshot_path
+        self.query_log = query_log
+        self._snapshot_mtime = None
+        self.runs = 0
+        self.last_run_at = None
+        self.last_duration = None
+        self.last_result = None
+        self.snapshot_loaded = 0
+
+    def targets(self):
+        """Returns the (kind, value) pairs to keep warm, canonicalized as the routes do, without duplicates."""
+        candidates = [('program', program) for program in self.programs]
+        candidates += [('role', role) for role in self.roles]
+        if self.query_log is not None and self.top_n:
+            candidates += [('program', program) for program in self.query_log.top('program', self.top_n)]
+            candidates += [('role', role) for role in self.query_log.top('role', self.top_n)]
+        seen = set()
+        targets = []
+        for kind, value in candidates:
+            # Not counted as traffic for the canonicalizer's learning.
+            value = canonicalize(kind, value.strip(), observe=False)
+            if value and (kind, value.lower()) not in seen:
+                seen.add((kind, value.lower()))
+                targets.append((kind, value))
+        return targets
+
+    def _jobs(self):
+        """Returns a (cache_key, prompt, schema) triple for every answer in the warm set."""
+        jobs = []
+        for kind, value in self.targets():
+            for build_prompt, schema in WARMUP_PROMPTS[kind]:
+                prompt = build_prompt(value)
+                jobs.append((response_cache_key(prompt, structured=schema is not None), prompt, schema))
+        return jobs
+
+    def run(self):
+        """
+        Warms or refreshes every answer in the warm set, then saves the snapshot.
+
+        Returns:
+            dict: Counts of answers 'warmed', already 'fresh' and 'failed'.
+        """
+        started = time.monotonic()
+        self.last_run_at = time.time()
+        jobs = self._jobs()
+        refresh_before = time.time() + self.refresh_ahead
+        due = []
+        for job in jobs:
+            entry = self.cache.get_entry(job[0])
+            if entry is None or entry[1] <= refresh_before:
+                due.append(job)
+
+        warmed = 0
+        if due:
+            with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="cache-warmup") as pool:
+                warmed = sum(pool.map(self._warm_one, due))
+        self.save_snapshot([job[0] for job in jobs])
+
+        self.runs += 1
+        self.last_duration = time.monotonic() - started
+        self.last_result = {"warmed": warmed, "fresh": len(jobs) - len(due), "failed": len(due) - warmed}
+        print(f"Cache warmup complete: {self.last_result}")
+        return self.last_result
+
+    def _warm_one(self, job):
+        """Regenerates one answer, replacing the cached one. Returns True on success."""
+        _, prompt, schema = job
+        try:
+            if schema is None:
+                get_gemini_response(prompt, refresh=True, priority=PRIORITY_BACKGROUND)
+            else:
+                get_structured_response(prompt, schema, refresh=True, priority=PRIORITY_BACKGROUND)
+            return True
+        except Exception as e:
+            # One failed answer must not stop the rest of the warmup.
+            print(f"Warning: cache warmup failed for prompt '{' '.join(prompt.split())[:80]}...': {e}")
+            return False
+
+    def save_snapshot(self, keys):
+        """Writes the live cache entries for keys to the snapshot file. Returns the number saved."""
+        if not self.snapshot_path:
+            return 0
+        entries = {}
+        for key in keys:
+            entry = self.cache.get_entry(key)
+            if entry is not None:
+                entries[key] = list(entry)
+        directory = os.path.dirname(self.snapshot_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # Write to a temporary file first so readers never see a partial snapshot.
+        temp_path = f"{self.snapshot_path}.{os.getpid()}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump({"version": 1, "entries": entries}, f)
+        os.replace(temp_path, self.snapshot_path)
+        self._snapshot_mtime = os.stat(self.snapshot_path).st_mtime
+        return len(entries)
+
+    def load_snapshot(self, only_if_changed=False):
+        """
+        Loads unexpired snapshot entries into the cache, keeping their original expiry.
+
+        Args:
+            only_if_changed (bool): Skip loading if the file has not changed since it
+                was last loaded or saved by this process.
+
+        Returns:
+            int: The number of entries loaded.
+        """
+        if not self.snapshot_path:
+            return 0
+        try:
+            mtime = os.stat(self.snapshot_path).st_mtime
+            if only_if_changed and mtime == self._snapshot_mtime:
+                return 0
+            with open(self.snapshot_path, encoding='utf-8') as f:
+                snapshot = json.load(f)
+        except FileNotFoundError:
+            return 0
+        except (OSError, ValueError) as e:
+            print(f"Warning: could not read cache warmup snapshot {self.snapshot_path}: {e}")
+            return 0
+        self._snapshot_mtime = mtime
+
+        loaded = 0
+        now = time.time()
+        for key, (value, expires_at) in snapshot.get("entries", {}).items():
+            if expires_at > now:
+                self.cache.set(key, value, ttl=expires_at - now)
+                loaded += 1
+        self.snapshot_loaded += loaded
+        return loaded
+
+    def stats(self):
+        """Returns the warm set size and last-run statistics."""
+        return {
+            "runs": self.runs,
+            "last_run_at": self.last_run_at,
+            "last_duration_seconds": self.last_duration,
+            "last_result": self.last_result,
+            "snapshot_entries_loaded": self.snapshot_loaded,
+        }
@@ -0,0 +1,362 @@
+# services/canonicalizer.py
+import json
+import re
+import threading
+import unicodedata
+from collections import Counter, OrderedDict, defaultdict, namedtuple
+
+from utils import metrics
+
+# Kinds of user input that are canonicalized; the same kinds as the query log.
+KINDS = ('program', 'role')
+
+# Curated canonical names with their aliases. Aliases only need to differ from the
+# canonical name by more than case, spacing, punctuation, degree prefixes ("BSc in")
+# and the abbreviations in _ABBREVIATIONS, which normalize() already handles.
+# Keep them unambiguous: an alias is always mapped, whatever the threshold.
+PROGRAM_ALIASES = {
+    "Computer Science": ["CS", "CompSci", "CSE"],
+    "Information Technology": ["IT"],
+    "Software Engineering": ["SE"],
+    "Data Science": [],
+    "Artificial Intelligence": ["AI"],
+    "Cybersecurity": ["Cyber Security", "Information Security"],
+    "Electrical Engineering": ["EE"],
+    "Electrical and Electronic Engineering": ["EEE"],
+    "Mechanical Engineering": ["MechE"],
+    "Civil Engineering": [],
+    "Chemical Engineering": ["ChemE"],
+    "Business Administration": ["MBA", "BBA"],
+    "Economics": ["Econ"],
+    "English Literature": ["Eng Lit", "English Lit"],
+    "Accounting": ["Accountancy"],
+    "Finance": [],
+    "Marketing": [],
+    "Psychology": ["Psych"],
+    "Political Science": ["PoliSci"],
+    "Mathematics": ["Math", "Maths"],
+    "Physics": [],
+    "Chemistry": ["Chem"],
+    "Biology": ["Bio"],
+    "Nursing": ["BSN"],
+    "Medicine": ["MBBS"],
+    "Law": ["LLB"],
+    "Architecture": [],
+    "Graphic Design": [],
+    "Education": [],
+    "Environmental Science": [],
+}
+
+ROLE_ALIASES = {
+    "Software Engineer": ["SWE", "SDE", "Software Developer", "Programmer"],
+    "Frontend Developer": ["Front End Developer", "Frontend Engineer", "Front End Engineer"],
+    "Backend Developer": ["Back End Developer", "Backend Engineer", "Back End Engineer"],
+    "Full Stack Developer": ["Fullstack Developer", "Full Stack Engineer", "Fullstack Engineer"],
+    "Data Scientist": [],
+    "Data Analyst": [],
+    "Data Engineer": [],
+    "Machine Learning Engineer": ["ML Engineer", "MLE"],
+    "DevOps Engineer": ["DevOps", "Dev Ops Engineer"],
+    "Site Reliability Engineer": ["SRE"],
+    "Product Manager": [],
+    "Project Manager": [],
+    "UX Designer": ["UI UX Designer", "UX UI Designer", "User Experience Designer"],
+    "QA Engineer": ["Quality Assurance Engineer", "Software Tester", "Test Engineer"],
+    "Business Analyst": [],
+    "Cybersecurity Analyst": ["Cyber Security Analyst", "Security Analyst"],
+    "Registered Nurse": ["RN"],
+    "Accountant": [],
+    "Teacher": [],
+    "Marketing Manager": [],
+    "Sales Representative": [],
+}
+
+# Word-level abbreviations expanded by normalize(), per kind.
+_ABBREVIATIONS = {
+    'program': {
+        "sci": "science", "eng": "engineering", "engg": "engineering", "mgmt": "management",
+        "admin": "administration", "comp": "computer", "tech": "technology", "info": "information",
+        "intl": "international", "env": "environmental", "mech": "mechanical", "elec": "electrical",
+    },
+    'role': {
+        "sr": "senior", "jr": "junior", "eng": "engineer", "engr": "engineer", "dev": "developer",
+        "mgr": "manager", "admin": "administrator", "rep": "representative",
+    },
+}
+
+# Degree prefixes stripped from programs: "bsc hons in", "bachelor of science in", "masters degree in", ...
+_DEGREE_PREFIX = re.compile(
+    r"^(?:(?:bachelor|master|doctor|associate)s?(?: degree)?"
+    r"(?: of (?:arts|science|engineering|fine arts|technology|business administration))?"
+    r"|ba|bs|bsc|ma|ms|msc|beng|meng|btech|mtech|phd|mphil|diploma|degree)"
+    r"(?: (?:hons|honours|honors))?(?: (?:in|of))? (?=\S)"
+)
+_NON_WORD = re.compile(r"[^a-z0-9+#]+")
+
+# Inputs shorter than this (after normalization) are only matched exactly; trigrams
+# say little about a few letters.
+_MIN_FUZZY_LENGTH = 4
+
+# A fuzzy match is rejected when another canonical name scores within this margin of it.
+_AMBIGUITY_MARGIN = 0.05
+
+_LOOKUPS = metrics.counter(
+    "canonicalizer_lookups_total", "Program and role inputs by how they were canonicalized.", ("kind", "source")
+)
+
+# canonical: the value to use in prompts and cache keys; score: similarity in [0, 1];
+# source: 'exact' (a known name or alias after normalization), 'fuzzy' (trigram match
+# above the threshold) or 'unknown' (passed through as typed, with whitespace collapsed).
+CanonicalMatch = namedtuple('CanonicalMatch', ['canonical', 'score', 'source'])
+
+
+def normalize(kind, value):
+    """
+    Reduces a program or role to a comparison key.
+
+    Case, accents, punctuation and spacing are dropped, common abbreviations are
+    expanded, and for programs a leading degree ("B.Sc. (Hons) in") is removed.
+    "B.Sc Computer Sci" and "computer science " both become "computer science".
+    The key is only used for matching; it is never shown or sent to the model.
+    """
+    text = unicodedata.normalize('NFKD', value)
+    text = ''.join(c for c in text if not unicodedata.combining(c)).casefold()
+    # "B.Sc" -> "bsc", "bachelor's" -> "bachelors", before other punctuation becomes a space.
+    text = text.replace('.', '').replace("'", '').replace('&', ' and ')
+    text = _NON_WORD.sub(' ', text).strip()
+    if kind == 'program':
+        text = _DEGREE_PREFIX.sub('', text) or text
+    abbreviations = _ABBREVIATIONS.get(kind, {})
+    return ' '.join(abbreviations.get(word, word) for word in text.split())
+
+def _trigrams(key):
+    padded = f"  {key} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class CanonicalIndex:
+    """
+    Maps free-text inputs of one kind to canonical names.
+
+    Lookups try, in order: a memo of recent inputs, an exact match of the
+    normalized input against every canonical name and alias, and a trigram
+    (Dice) similarity search over the same names through an inverted index.
+    A fuzzy match must reach threshold, have as many words as the input (so
+    "Senior Data Scientist" is not folded into "Data Scientist"), and beat any
+    other canonical name by a clear margin. Anything else passes through as
+    typed, with whitespace collapsed ("iOS Developer" stays as is), and is
+    learned as a new canonical name, in the spelling of its latest sighting,
+    once it has been seen learn_after times, so variants and typos of it
+    match from then on.
+
+    Safe to share between request threads.
+    """
+
+    def __init__(self, kind, threshold=0.8, learn_after=3, max_learned=1000, memo_size=4096, max_observed=4096):
+        """
+        Args:
+            kind (str): One of KINDS.
+            threshold (float): Minimum trigram similarity for a fuzzy match.
+            learn_after (int): Sightings of an unknown input before it is added to the vocabulary.
+                0 disables learning.
+            max_learned (int): Maximum number of names learned from traffic.
+            memo_size (int): Number of recent inputs whose result is remembered.
+            max_observed (int): Number of recent unknown inputs whose sightings are counted
+                towards learning them.
+        """
+        self.kind = kind
+        self.threshold = threshold
+        self.learn_after = learn_after
+        self.max_learned = max_learned
+        self.memo_size = memo_size
+        self.max_observed = max_observed
+        self._exact = {}  # normalized name or alias -> canonical name
+        self._entries = []  # (canonical name, trigram count, word count), by entry id
+        self._postings = defaultdict(list)  # trigram -> entry ids
+        self._memo = OrderedDict()  # raw input -> (normalized key, CanonicalMatch)
+        self._observed = OrderedDict()  # normalized key of unknown inputs -> sightings, least recent first
+        self._lock = threading.Lock()
+        self.curated = 0
+        self.learned = 0
+        self.lookups = Counter()  # source -> count
+        self.memo_hits = 0
+
+    def add(self, canonical, aliases=(), learned=False):
+        """
+        Adds a canonical name and its aliases. Names already known keep their existing mapping.
+
+        Returns:
+            bool: True if anything was added.
+        """
+        added = False
+        with self._lock:
+            for name in (canonical, *aliases):
+                key = normalize(self.kind, name)
+                if not key or key in self._exact:
+                    continue
+                self._exact[key] = canonical
+                entry_id = len(self._entries)
+                trigrams = _trigrams(key)
+                self._entries.append((canonical, len(trigrams), key.count(' ') + 1))
+                for trigram in trigrams:
+                    self._postings[trigram].append(entry_id)
+                added = True
+            if added:
+                if learned:
+                    self.learned += 1
+                else:
+                    self.curated += 1
+                # Earlier results may map differently now.
+                self._memo.clear()
+        return added
+
+    def lookup(self, value, observe=True):
+        """
+        Canonicalizes one input.
+
+        Args:
+            value (str): The raw input, e.g. a request's 'program' field.
+            observe (bool): Count the lookup in the statistics and, for an unknown input,
+                towards learning it. False for internal callers such as the cache warmup.
+
+        Returns:
+            CanonicalMatch
+        """
+        with self._lock:
+            memoized = self._memo.get(value)
+            if memoized is not None:
+                self._memo.move_to_end(value)
+                if observe:
+                    self.memo_hits += 1
+        if memoized is not None:
+            key, match = memoized
+        else:
+            key = normalize(self.kind, value)
+            match = self._match(key, value)
+            with self._lock:
+                self._memo[value] = (key, match)
+                if len(self._memo) > self.memo_size:
+                    self._memo.popitem(last=False)
+        if observe:
+            with self._lock:
+                self.lookups[match.source] += 1
+            _LOOKUPS.inc(self.kind, match.source)
+            if match.source == 'unknown' and key:
+                self._observe(key, match.canonical)
+        return match
+
+    def _match(self, key, value):
+        canonical = self._exact.get(key) if key else None
+        if canonical is not None:
+            return CanonicalMatch(canonical, 1.0, 'exact')
+        if len(key) >= _MIN_FUZZY_LENGTH:
+            best, score, runner_up = self._nearest(key)
+            if best is not None and score >= self.threshold and score - runner_up >= _AMBIGUITY_MARGIN:
+                return CanonicalMatch(best, round(score, 3), 'fuzzy')
+        # Unknown: keep the user's spelling ("iOS", "HR"); the key is only for matching.
+        return CanonicalMatch(' '.join(value.split()), 0.0, 'unknown')
+
+    def _nearest(self, key):
+        """Returns (best canonical name, its similarity, best similarity of any other canonical name)."""
+        trigrams = _trigrams(key)
+        words = key.count(' ') + 1
+        shared = Counter()
+        for trigram in trigrams:
+            shared.update(self._postings.get(trigram, ()))
+        scores = {}
+        for entry_id, count in shared.items():
+            canonical, size, entry_words = self._entries[entry_id]
+            if entry_words != words:
+                continue
+            score = 2 * count / (len(trigrams) + size)
+            if score > scores.get(canonical, 0.0):
+                scores[canonical] = score
+        if not scores:
+            return None, 0.0, 0.0
+        ranked = sorted(scores.items(), key=lambda item: -item[1])
+        return ranked[0][0], ranked[0][1], ranked[1][1] if len(ranked) > 1 else 0.0
+
+    def _observe(self, key, spelling):
+        if not self.learn_after:
+            return
+        with self._lock:
+            if self.learned >= self.max_learned:
+                self._observed.clear()
+                return
+            sightings = self._observed.pop(key, 0) + 1
+            ready = sightings >= self.learn_after
+            if not ready:
+                # Re-inserted as the most recent; the least recently seen key is forgotten first.
+                self._observed[key] = sightings
+                if len(self._observed) > self.max_observed:
+                    self._observed.popitem(last=False)
+        if ready:
+            self.add(spelling, learned=True)
+
+    def stats(self):
+        """Returns lookup counts by source, the hit rate and the vocabulary size."""
+        with self._lock:
+            lookups = dict(self.lookups)
+            total = sum(lookups.values())
+            matched = lookups.get('exact', 0) + lookups.get('fuzzy', 0)
+            return {
+                "lookups": total,
+                "by_source": lookups,
+                "hit_rate": round(matched / total, 3) if total else None,
+                "memo_hits": self.memo_hits,
+                "vocabulary": {"curated": self.curated, "learned": self.learned, "names": len(self._exact)},
+                "threshold": self.threshold,
+            }
+
+
+# Module-level indexes by kind, set up by configure_canonicalizer(). Empty disables canonicalization.
+_indexes = {}
+
+def configure_canonicalizer(threshold=0.8, learn_after=3, aliases_path=None, query_log=None, seed_top_n=0):
+    """
+    Builds the program and role indexes.
+
+    Args:
+        threshold (float): Minimum trigram similarity for a fuzzy match.
+        learn_after (int): Sightings of an unknown input before it is learned. 0 disables learning.
+        aliases_path (str, optional): JSON file of extra aliases, shaped like
+            {"program": {"Canonical Name": ["alias", ...]}, "role": {...}}.
+        query_log (QueryLog, optional): Yesterday's most frequent (already canonical)
+            values are added to the vocabulary, so names learned from traffic
+            survive restarts and are shared by every worker.
+        seed_top_n (int): Number of values per kind taken from the query log.
+    """
+    global _indexes
+    extra = {}
+    if aliases_path:
+        with open(aliases_path, encoding='utf-8') as f:
+            extra = json.load(f)
+    indexes = {}
+    for kind, curated in (('program', PROGRAM_ALIASES), ('role', ROLE_ALIASES)):
+        index = CanonicalIndex(kind, threshold, learn_after)
+        for canonical, aliases in {**curated, **extra.get(kind, {})}.items():
+            index.add(canonical, aliases)
+        if query_log is not None and seed_top_n:
+            for value in query_log.top(kind, seed_top_n):
+                index.add(value, learned=True)
+        indexes[kind] = index
+    _indexes = indexes
+    sizes = ', '.join(f"{kind}: {index.stats()['vocabulary']['names']} names" for kind, index in indexes.items())
+    print(f"Canonicalizer configured ({sizes}).")
+
+def canonicalize(kind, value, observe=True):
+    """
+    Returns the canonical form of a program or role, to use in prompts, cache keys and the query log.
+
+    Values that are not strings, and all values when no canonicalizer is configured, are returned unchanged.
+    """
+    index = _indexes.get(kind)
+    if index is None or not isinstance(value, str):
+        return value
+    return index.lookup(value, observe).canonical
+
+def get_canonicalizer_stats():
+    """Returns per-kind lookup statistics, or None if canonicalization is disabled."""
+    if not _indexes:
+        return None
+    return {kind: index.stats() for kind, index in _indexes.items()}
@@ -0,0 +1,128 @@
+# services/cv_eviction.py
+import time
+
+
+class EvictionPolicy:
+    """
+    Decides which stored CVs to remove.
+
+    Policies only select filenames from the CV index; evict() deletes them.
+    Each selection walks the index in age or recency order and stops as soon
+    as enough files are chosen, so the cost is proportional to what is evicted.
+    """
+
+    def select(self, index):
+        """Returns the filenames to evict, in eviction order."""
+        raise NotImplementedError
+
+
+class MaxAgePolicy(EvictionPolicy):
+    """Evicts files created more than max_age_seconds ago."""
+
+    def __init__(self, max_age_seconds):
+        self.max_age_seconds = max_age_seconds
+
+    def select(self, index):
+        return index.created_before(time.time() - self.max_age_seconds)
+
+
+class CountQuotaPolicy(EvictionPolicy):
+    """Keeps at most max_files files, evicting in 'lru' (last download) or 'fifo' (creation) order."""
+
+    def __init__(self, max_files, order='lru'):
+        self.max_files = max_files
+        self.order = order
+
+    def select(self, index):
+        excess = index.count() - self.max_files
+        return index.oldest(excess, self.order) if excess > 0 else []
+
+
+class ByteQuotaPolicy(EvictionPolicy):
+    """Keeps the total size of stored files at or below max_bytes, evicting in 'lru' or 'fifo' order."""
+
+    def __init__(self, max_bytes, order='lru'):
+        self.max_bytes = max_bytes
+        self.order = order
+
+    def select(self, index):
+        excess = index.totals()[1] - self.max_bytes
+        selected = []
+        freed = 0
+        if excess <= 0:
+            return selected
+        for filename, size in index.iter_oldest(self.order):
+            selected.append(filename)
+            freed += size
+            if freed >= excess:
+                break
+        return selected
+
+
+def quota_policies(config, fraction=1.0):
+    """
+    Builds the count and byte quota policies from app config.
+
+    Args:
+        config: The Flask app config.
+        fraction (float): Scales both quotas, e.g. to evict down to a low-water mark.
+    """
+    order = config['CV_EVICTION_ORDER']
+    policies = [CountQuotaPolicy(int(config['MAX_CVS_STORED'] * fraction), order)]
+    if config['CV_MAX_STORAGE_BYTES']:
+        policies.append(ByteQuotaPolicy(int(config['CV_MAX_STORAGE_BYTES'] * fraction), order))
+    return policies
+
+
+def cleanup_policies(config):
+    """Policies applied by the periodic cleanup: the age limit, then the quotas."""
+    return [MaxAgePolicy(config['MAX_CV_AGE_HOURS'] * 3600)] + quota_policies(config)
+
+
+def evict(index, store, policies, logger):
+    """
+    Applies policies in order, deleting each selected file from the CV store and its index entry.
+
+    Each policy sees the index as left by the previous one.
+
+    Returns:
+        int: The number of files deleted.
+    """
+    deleted_count = 0
+    for policy in policies:
+        for filename in policy.select(index):
+            try:
+                store.delete(filename)
+                deleted_count += 1
+                logger.info(f"Deleted old/excess CV file: {filename}")
+            except FileNotFoundError:
+                # Already gone (removed by hand or by another worker); just drop the index entry.
+                pass
+            except Exception as e:
+                # Log deletion errors (e.g. file in use, permissions, storage unreachable) and keep the entry.
+                logger.error(f"Error deleting file {filename}: {str(e)}")
+                continue
+            index.remove(filename)
+    return deleted_count
+
+
+def evict_over_high_water(index, store, config, logger):
+    """
+    Evicts inline when storage crosses its high-water mark.
+
+    Called after each new CV is written. If either quota is above
+    CV_EVICTION_HIGH_WATER of its limit, files are evicted until both are at
+    CV_EVICTION_LOW_WATER of their limits, so the periodic cleanup never has to
+    catch up with a full disk.
+
+    Returns:
+        int: The number of files deleted.
+    """
+    file_count, total_bytes = index.totals()
+    high_water = config['CV_EVICTION_HIGH_WATER']
+    over_count = file_count > config['MAX_CVS_STORED'] * high_water
+    max_bytes = config['CV_MAX_STORAGE_BYTES']
+    over_bytes = bool(max_bytes) and total_bytes > max_bytes * high_water
+    if not (over_count or over_bytes):
+        return 0
+    return evict(index, store, quota_policies(config, config['CV_EVICTION_LOW_WATER']), logger)
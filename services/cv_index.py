@@ -0,0 +1,183 @@
+# services/cv_index.py
+import os
+import sqlite3
+import threading
+import time
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS cv_files (
+    filename TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    content_hash TEXT,
+    last_used_at REAL
+);
+CREATE INDEX IF NOT EXISTS cv_files_created_at ON cv_files (created_at);
+
+-- Running totals kept by triggers, so counting files never scans the table.
+CREATE TABLE IF NOT EXISTS cv_totals (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    file_count INTEGER NOT NULL,
+    total_bytes INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO cv_totals (id, file_count, total_bytes) VALUES (1, 0, 0);
+
+CREATE TRIGGER IF NOT EXISTS cv_files_insert AFTER INSERT ON cv_files BEGIN
+    UPDATE cv_totals SET file_count = file_count + 1, total_bytes = total_bytes + NEW.size WHERE id = 1;
+END;
+CREATE TRIGGER IF NOT EXISTS cv_files_delete AFTER DELETE ON cv_files BEGIN
+    UPDATE cv_totals SET file_count = file_count - 1, total_bytes = total_bytes - OLD.size WHERE id = 1;
+END;
+CREATE TRIGGER IF NOT EXISTS cv_files_update AFTER UPDATE OF size ON cv_files BEGIN
+    UPDATE cv_totals SET total_bytes = total_bytes - OLD.size + NEW.size WHERE id = 1;
+END;
+"""
+
+# Orderings available to eviction: oldest-created first, or least-recently-used first.
+ORDER_COLUMNS = {
+    'fifo': 'created_at',
+    'lru': 'last_used_at',
+}
+
+
+class CVIndex:
+    """
+    SQLite metadata index of the stored CV files (see services.cv_storage).
+
+    generate_cv records each file it writes, so cleanup and /health can query
+    the index instead of listing and stat-ing the folder: totals are O(1) and
+    age-based eviction is a range scan over the created_at index. The file is
+    shared by every worker on the host.
+    """
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # Connections are opened per thread; sqlite3 objects must not cross threads.
+        self._local = threading.local()
+        conn = self._connect()
+        with conn:
+            conn.executescript(_SCHEMA)
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(cv_files)")}
+            if 'last_used_at' not in columns:
+                # Indexes created before LRU eviction existed lack the column.
+                conn.execute("ALTER TABLE cv_files ADD COLUMN last_used_at REAL")
+                conn.execute("UPDATE cv_files SET last_used_at = created_at")
+            conn.execute("CREATE INDEX IF NOT EXISTS cv_files_last_used_at ON cv_files (last_used_at)")
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=5)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def record(self, filename, size, content_hash=None, created_at=None):
+        """Adds or replaces the entry for a newly written (or reused) file. It counts as just used."""
+        created_at = time.time() if created_at is None else created_at
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO cv_files (filename, size, created_at, content_hash, last_used_at) VALUES (?, ?, ?, ?, ?)"
+                " ON CONFLICT(filename) DO UPDATE SET size = excluded.size, created_at = excluded.created_at,"
+                " content_hash = excluded.content_hash, last_used_at = excluded.last_used_at",
+                (filename, size, created_at, content_hash, created_at),
+            )
+
+    def touch(self, filename, created_at=None):
+        """Resets a reused file's age. Returns False if the file is not indexed."""
+        created_at = time.time() if created_at is None else created_at
+        with self._connect() as conn:
+            cursor = conn.execute(
+                "UPDATE cv_files SET created_at = ?, last_used_at = ? WHERE filename = ?",
+                (created_at, created_at, filename),
+            )
+            return cursor.rowcount > 0
+
+    def mark_used(self, filename, used_at=None):
+        """Records a download of the file, for least-recently-used eviction."""
+        used_at = time.time() if used_at is None else used_at
+        with self._connect() as conn:
+            conn.execute("UPDATE cv_files SET last_used_at = ? WHERE filename = ?", (used_at, filename))
+
+    def remove(self, filename):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM cv_files WHERE filename = ?", (filename,))
+
+    def totals(self):
+        """Returns (file_count, total_bytes) in constant time."""
+        return self._connect().execute("SELECT file_count, total_bytes FROM cv_totals WHERE id = 1").fetchone()
+
+    def count(self):
+        return self.totals()[0]
+
+    def created_before(self, cutoff):
+        """Returns filenames created before the cutoff timestamp, oldest first."""
+        rows = self._connect().execute(
+            "SELECT filename FROM cv_files WHERE created_at < ? ORDER BY created_at", (cutoff,)
+        ).fetchall()
+        return [row[0] for row in rows]
+
+    def oldest(self, limit, order='fifo'):
+        """Returns up to limit filenames, first in eviction order ('fifo' or 'lru')."""
+        rows = self._connect().execute(
+            f"SELECT filename FROM cv_files ORDER BY {ORDER_COLUMNS[order]} LIMIT ?", (limit,)
+        ).fetchall()
+        return [row[0] for row in rows]
+
+    def iter_oldest(self, order='fifo'):
+        """Lazily yields (filename, size) in eviction order; stop iterating to stop reading."""
+        cursor = self._connect().execute(f"SELECT filename, size FROM cv_files ORDER BY {ORDER_COLUMNS[order]}")
+        try:
+            for row in cursor:
+                yield row
+        finally:
+            cursor.close()
+
+    def reconcile(self, store):
+        """
+        Brings the index in line with the CV store's contents with a single listing.
+
+        Meant for startup: indexes PDFs written before the index existed (using
+        their creation time as reported by the store) and drops entries whose
+        file is gone.
+
+        Returns:
+            tuple: (files_added, entries_removed)
+        """
+        on_disk = {name: (size, created_at) for name, size, created_at in store.list()}
+        conn = self._connect()
+        indexed = {row[0] for row in conn.execute("SELECT filename FROM cv_files")}
+        missing = [(name, size, ctime) for name, (size, ctime) in on_disk.items() if name not in indexed]
+        stale = [(name,) for name in indexed if name not in on_disk]
+        with conn:
+            conn.executemany(
+                "INSERT INTO cv_files (filename, size, created_at, last_used_at) VALUES (?, ?, ?, ?)",
+                [(name, size, ctime, ctime) for name, size, ctime in missing],
+            )
+            conn.executemany("DELETE FROM cv_files WHERE filename = ?", stale)
+        return len(missing), len(stale)
+
+
+# Module-level index instance, set up by configure_cv_index().
+_cv_index = None
+
+def configure_cv_index(db_path, store=None):
+    """
+    Opens the CV index at db_path and, if a CV store is given, reconciles it with the store.
+
+    Stores that opt out (CVStore.reconcile_on_start) are not listed.
+    """
+    global _cv_index
+    _cv_index = CVIndex(db_path)
+    if store is not None and store.reconcile_on_start:
+        added, removed = _cv_index.reconcile(store)
+        if added or removed:
+            print(f"CV index reconciled: {added} files added, {removed} stale entries removed.")
+    return _cv_index
+
+def get_cv_index():
+    """Returns the configured CV index, or None if it has not been configured."""
+    return _cv_index
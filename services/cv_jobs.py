@@ -0,0 +1,344 @@
+# services/cv_jobs.py
+import json
+import os
+import random
+import sqlite3
+import threading
+import time
+import uuid
+
+from services.cv_eviction import evict_over_high_water
+from services.cv_index import get_cv_index
+from services.cv_service import cv_content_hash, render_cv_pdf
+from services.cv_storage import get_cv_store
+
+# Job states. 'queued' jobs wait for a worker (possibly until a retry is due),
+# 'running' jobs hold a lease, and 'done'/'failed' are final.
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS cv_jobs (
+    id TEXT PRIMARY KEY,
+    content_hash TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    status TEXT NOT NULL,
+    stage TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    filename TEXT,
+    error TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    run_after REAL NOT NULL,
+    lease_expires_at REAL,
+    lease_token TEXT
+);
+CREATE INDEX IF NOT EXISTS cv_jobs_claim ON cv_jobs (status, run_after);
+CREATE INDEX IF NOT EXISTS cv_jobs_content_hash ON cv_jobs (content_hash);
+"""
+
+
+def store_rendered_cv(data, config, logger, content_hash=None, on_stage=None):
+    """
+    Renders a CV into the CV store, unless an identical one is already stored.
+
+    Shared by the synchronous /generate-cv path and the job workers.
+
+    Args:
+        data (dict): The CV payload.
+        config: The Flask app config (for the eviction quotas).
+        logger: Logger for eviction messages.
+        content_hash (str, optional): cv_content_hash(data), if already computed.
+        on_stage (callable, optional): Called with 'rendering' and 'storing' as work progresses.
+
+    Returns:
+        tuple: (filename, reused)
+
+    Raises:
+        RenderQueueFullError: If the render queue is at capacity.
+    """
+    content_hash = content_hash or cv_content_hash(data)
+    # Name the file after the content hash so identical requests map to the same PDF.
+    filename = f"cv_{content_hash[:32]}.pdf"
+    store = get_cv_store()
+
+    stored = store.refresh(filename)
+    reused = stored is not None
+    if not reused:
+        if on_stage:
+            on_stage('rendering')
+        # Render to a staging file first so a concurrent download never sees a partial file.
+        with store.staged(filename) as temp_path:
+            render_cv_pdf(data, temp_path)
+            if on_stage:
+                on_stage('storing')
+        stored = store.stat(filename)
+
+    # Record (or re-date, when reused) the file so cleanup and /health never scan the store.
+    get_cv_index().record(filename, stored.size, content_hash)
+    if not reused:
+        evict_over_high_water(get_cv_index(), store, config, logger)
+    return filename, reused
+
+
+class CVJobQueue:
+    """
+    Durable queue of CV render jobs in a SQLite file shared by all workers on the host.
+
+    Identical payloads are deduplicated: enqueueing a CV that is already
+    queued, running or done (and still stored) returns the existing job.
+    Workers claim a job with a lease; if a worker dies, the job becomes
+    claimable again when the lease expires. Failed attempts are retried with
+    exponential backoff up to max_attempts.
+
+    Each claim gets a new lease token. A worker renews its lease while the
+    job runs (renew(), set_stage()), and its updates only apply while it
+    still holds the lease, so a worker whose job was reclaimed cannot
+    requeue or overwrite it.
+    """
+
+    def __init__(self, db_path, max_attempts=3, retry_delay=2.0, lease_seconds=120):
+        """
+        Args:
+            db_path (str): Path of the SQLite file.
+            max_attempts (int): Attempts before a job is marked failed.
+            retry_delay (float): Delay before the first retry, in seconds; doubles per attempt.
+            lease_seconds (float): How long a claimed job may run before it is reclaimed.
+        """
+        self.db_path = db_path
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.lease_seconds = lease_seconds
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # Connections are opened per thread; sqlite3 objects must not cross threads.
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.executescript(_SCHEMA)
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(cv_jobs)")}
+            if 'lease_token' not in columns:
+                # Queues created before leases were fenced lack the column.
+                conn.execute("ALTER TABLE cv_jobs ADD COLUMN lease_token TEXT")
+        # Wakes idle workers in this process as soon as a job is enqueued here.
+        self.wakeup = threading.Event()
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=5)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def enqueue(self, data, content_hash=None):
+        """
+        Adds a render job for data, or returns the existing job for an identical payload.
+
+        Returns:
+            tuple: (job, created) where job is a dict as returned by get().
+        """
+        content_hash = content_hash or cv_content_hash(data)
+        conn = self._connect()
+        latest = conn.execute(
+            "SELECT * FROM cv_jobs WHERE content_hash = ? AND status != ? ORDER BY created_at DESC LIMIT 1",
+            (content_hash, FAILED),
+        ).fetchone()
+        # A finished job is reused while its PDF is still stored (checked outside the write lock).
+        if latest is not None and latest['status'] == DONE and self._still_stored(latest['filename']):
+            return self._to_dict(latest), False
+        with conn:
+            # An exclusive transaction, so two workers cannot both insert the same payload.
+            conn.execute("BEGIN IMMEDIATE")
+            active = conn.execute(
+                "SELECT * FROM cv_jobs WHERE content_hash = ? AND status IN (?, ?) LIMIT 1",
+                (content_hash, QUEUED, RUNNING),
+            ).fetchone()
+            if active is not None:
+                return self._to_dict(active), False
+            now = time.time()
+            job_id = uuid.uuid4().hex
+            conn.execute(
+                "INSERT INTO cv_jobs (id, content_hash, payload, status, stage, created_at, updated_at, run_after)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (job_id, content_hash, json.dumps(data), QUEUED, QUEUED, now, now, now),
+            )
+        self.wakeup.set()
+        return self.get(job_id), True
+
+    @staticmethod
+    def _still_stored(filename):
+        """Checks the job's PDF is still stored and, if so, re-dates it as just reused."""
+        store = get_cv_store()
+        if store is None or store.refresh(filename) is None:
+            return False
+        get_cv_index().touch(filename)
+        return True
+
+    def claim(self):
+        """
+        Takes the oldest job that is due (or whose lease expired) and leases it.
+
+        Returns:
+            tuple or None: (job_id, lease_token, payload, content_hash), or None if nothing is due.
+        """
+        conn = self._connect()
+        now = time.time()
+        lease_token = uuid.uuid4().hex
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute(
+                "SELECT id, payload, content_hash FROM cv_jobs"
+                " WHERE (status = ? AND run_after <= ?) OR (status = ? AND lease_expires_at < ?)"
+                " ORDER BY run_after LIMIT 1",
+                (QUEUED, now, RUNNING, now),
+            ).fetchone()
+            if row is None:
+                return None
+            conn.execute(
+                "UPDATE cv_jobs SET status = ?, stage = ?, attempts = attempts + 1, updated_at = ?,"
+                " lease_expires_at = ?, lease_token = ? WHERE id = ?",
+                (RUNNING, 'starting', now, now + self.lease_seconds, lease_token, row['id']),
+            )
+        return row['id'], lease_token, json.loads(row['payload']), row['content_hash']
+
+    # Matches a job only while the caller's lease on it is current.
+    _LEASED = f"id = ? AND status = '{RUNNING}' AND lease_token = ?"
+
+    def renew(self, job_id, lease_token):
+        """
+        Extends the lease of a running job by lease_seconds.
+
+        Returns:
+            bool: False if the lease was lost (the job was reclaimed or finished elsewhere).
+        """
+        with self._connect() as conn:
+            cursor = conn.execute(
+                f"UPDATE cv_jobs SET lease_expires_at = ? WHERE {self._LEASED}",
+                (time.time() + self.lease_seconds, job_id, lease_token),
+            )
+        return cursor.rowcount > 0
+
+    def set_stage(self, job_id, lease_token, stage):
+        """Records progress of a running job and renews its lease. Returns False if the lease was lost."""
+        now = time.time()
+        with self._connect() as conn:
+            cursor = conn.execute(
+                f"UPDATE cv_jobs SET stage = ?, updated_at = ?, lease_expires_at = ? WHERE {self._LEASED}",
+                (stage, now, now + self.lease_seconds, job_id, lease_token),
+            )
+        return cursor.rowcount > 0
+
+    def complete(self, job_id, lease_token, filename):
+        """Marks a running job done. Returns False if the lease was lost."""
+        with self._connect() as conn:
+            cursor = conn.execute(
+                "UPDATE cv_jobs SET status = ?, stage = ?, filename = ?, error = NULL, updated_at = ?,"
+                f" lease_expires_at = NULL, lease_token = NULL WHERE {self._LEASED}",
+                (DONE, DONE, filename, time.time(), job_id, lease_token),
+            )
+        return cursor.rowcount > 0
+
+    def fail(self, job_id, lease_token, error, retry=True):
+        """
+        Records a failed attempt: requeues the job with backoff, or marks it failed
+        once it has used max_attempts (or retry is False).
+
+        Returns:
+            bool or None: True if the job will be retried, False if it is marked failed,
+                None if the lease was lost (the job is left to whoever holds it now).
+        """
+        conn = self._connect()
+        now = time.time()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute(f"SELECT attempts FROM cv_jobs WHERE {self._LEASED}", (job_id, lease_token)).fetchone()
+            if row is None:
+                return None
+            if retry and row['attempts'] < self.max_attempts:
+                delay = self.retry_delay * 2 ** (row['attempts'] - 1) * random.uniform(0.5, 1.0)
+                conn.execute(
+                    "UPDATE cv_jobs SET status = ?, stage = ?, error = ?, updated_at = ?, run_after = ?,"
+                    " lease_expires_at = NULL, lease_token = NULL WHERE id = ?",
+                    (QUEUED, 'retrying', error, now, now + delay, job_id),
+                )
+                return True
+            conn.execute(
+                "UPDATE cv_jobs SET status = ?, stage = ?, error = ?, updated_at = ?, lease_expires_at = NULL,"
+                " lease_token = NULL WHERE id = ?",
+                (FAILED, FAILED, error, now, job_id),
+            )
+            return False
+
+    def release(self, job_id, lease_token, delay):
+        """
+        Puts a claimed job back without counting the attempt, e.g. when the render queue is full.
+
+        Returns:
+            bool: False if the lease was lost.
+        """
+        now = time.time()
+        with self._connect() as conn:
+            cursor = conn.execute(
+                "UPDATE cv_jobs SET status = ?, stage = ?, attempts = attempts - 1, updated_at = ?, run_after = ?,"
+                f" lease_expires_at = NULL, lease_token = NULL WHERE {self._LEASED}",
+                (QUEUED, QUEUED, now, now + delay, job_id, lease_token),
+            )
+        return cursor.rowcount > 0
+
+    def get(self, job_id):
+        """Returns the job as a dict, with its position in the queue while queued, or None."""
+        conn = self._connect()
+        row = conn.execute("SELECT * FROM cv_jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        job = self._to_dict(row)
+        if row['status'] == QUEUED:
+            job['queue_position'] = conn.execute(
+                "SELECT COUNT(*) FROM cv_jobs WHERE status = ? AND run_after < ?", (QUEUED, row['run_after'])
+            ).fetchone()[0] + 1
+        return job
+
+    @staticmethod
+    def _to_dict(row):
+        return {
+            "id": row['id'],
+            "status": row['status'],
+            "stage": row['stage'],
+            "attempts": row['attempts'],
+            "filename": row['filename'],
+            "error": row['error'],
+            "created_at": row['created_at'],
+            "updated_at": row['updated_at'],
+        }
+
+    def purge_finished(self, older_than):
+        """Deletes done and failed jobs last updated more than older_than seconds ago. Returns the count."""
+        with self._connect() as conn:
+            cursor = conn.execute(
+                "DELETE FROM cv_jobs WHERE status IN (?, ?) AND updated_at < ?",
+                (DONE, FAILED, time.time() - older_than),
+            )
+            return cursor.rowcount
+
+    def counts(self):
+        """Returns the number of jobs in each state."""
+        rows = self._connect().execute("SELECT status, COUNT(*) FROM cv_jobs GROUP BY status").fetchall()
+        return {status: count for status, count in rows}
+
+
+# Module-level queue, set up by configure_cv_job_queue().
+_cv_job_queue = None
+
+def configure_cv_job_queue(db_path, max_attempts=3, retry_delay=2.0, lease_seconds=120):
+    """Opens the CV job queue at db_path. See CVJobQueue for the arguments."""
+    global _cv_job_queue
+    _cv_job_queue = CVJobQueue(db_path, max_attempts, retry_delay, lease_seconds)
+    return _cv_job_queue
+
+def get_cv_job_queue():
+    """Returns the configured CV job queue, or None if asynchronous rendering is disabled."""
+    return _cv_job_queue
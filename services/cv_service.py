@@ -1,145 +1,304 @@
 # services/cv_service.py
-from fpdf import FPDF
 from datetime import datetime
+import hashlib
+import json
+import multiprocessing
 import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
 from io import BytesIO
+from services.cv_templates import DEFAULT_THEME, ModernCV, available_templates, get_render_plan
+from utils import metrics
 
-class ModernCV(FPDF):
+# Bump whenever the CV layout changes, so content hashes of old renders stop matching.
+CV_LAYOUT_VERSION = '2'
+
+# Render metrics, recorded in whichever process renders (render pool processes included).
+_RENDER_SECONDS = metrics.histogram("cv_render_duration_seconds", "Time to lay out and write a CV PDF.", ("template",))
+_PDF_BYTES = metrics.histogram(
+    "cv_pdf_size_bytes", "Size of generated CV PDFs.", ("template",), buckets=metrics.BYTE_BUCKETS
+)
+
+def cv_content_hash(data):
+    """
+    Returns a hex digest identifying the PDF that generate_cv_pdf() would produce for data.
+
+    The input JSON is canonicalized (sorted keys, compact separators) so that
+    requests differing only in key order or formatting share a hash. The layout
+    version and the render date (shown in the footer) are part of the hash.
     """
-    Custom PDF class extending FPDF for generating modern-styled CVs.
+    canonical = json.dumps(data, sort_keys=True, separators=(',', ':'), ensure_ascii=False)
+    digest = hashlib.sha256()
+    digest.update(f"{CV_LAYOUT_VERSION}|{datetime.now().strftime('%Y-%m-%d')}|".encode('utf-8'))
+    digest.update(canonical.encode('utf-8'))
+    return digest.hexdigest()
 
-    Encapsulates styling and common PDF elements (header, footer).
+def generate_cv_pdf(data, filepath=None):
     """
+    Generates a professional CV PDF based on the provided data.
+
+    Args:
+        data (dict): A dictionary containing CV details (name, email, summary, education, experience, skills)
+            and optionally the 'template' to render with.
+        filepath (str, optional): The full path including filename where the PDF should be saved.
+            When omitted, the PDF is rendered in memory and returned instead.
 
-    def __init__(self):
-        """Initializes the PDF document with custom colors and auto page break."""
-        super().__init__()
-        self.primary_color = (70, 130, 180)  # SteelBlue for headings
-        self.secondary_color = (100, 100, 100)  # DarkGray for subtext/footer
-        self.set_auto_page_break(auto=True, margin=15) # Automatically create new pages
+    Returns:
+        bytes or None: The PDF contents if no filepath was given, otherwise None.
+    """
+    template = data.get('template') or DEFAULT_THEME
+    started = time.perf_counter()
+    pdf = _build_cv(data)
 
-    def header(self):
-        """Defines the header for each page (except the first)."""
-        # A common practice is to skip the header on the very first page of a CV.
-        if self.page_no() == 1:
-            return
+    if filepath is None:
+        # Render into memory so the caller can stream the bytes without touching disk.
+        buffer = BytesIO()
+        pdf.output(buffer)
+        pdf_bytes = buffer.getvalue()
+        _RENDER_SECONDS.observe(time.perf_counter() - started, template)
+        _PDF_BYTES.observe(len(pdf_bytes), template)
+        return pdf_bytes
 
-        self.set_font('Arial', 'B', 10)
-        self.set_text_color(*self.secondary_color)
-        # Using a placeholder for APP_NAME, assuming it's passed or loaded in the main app
-        # For this standalone service, we'll make it generic or load from config if needed.
-        self.cell(0, 10, f"Professional CV - Page {self.page_no()}", 0, 0, 'C')
+    # Save the generated PDF to the specified filepath.
+    pdf.output(filepath)
+    _RENDER_SECONDS.observe(time.perf_counter() - started, template)
+    _PDF_BYTES.observe(os.path.getsize(filepath), template)
+    return None
 
-    def footer(self):
-        """Defines the footer for each page."""
-        self.set_y(-15) # Position 15mm from bottom
-        self.set_font('Arial', 'I', 8)
-        self.set_text_color(*self.secondary_color)
-        self.cell(0, 10, f"Generated on {datetime.now().strftime('%Y-%m-%d')}", 0, 0, 'C')
+def _build_cv(data):
+    """
+    Lays out every CV section for data and returns the populated ModernCV document.
 
-def generate_cv_pdf(data, filepath):
+    The layout comes from the precompiled render plan of the template named by
+    data['template'] (the default template when absent).
     """
-    Generates a professional CV PDF based on the provided data.
+    return get_render_plan(data.get('template')).render(data)
+
+# Sample CV rendered once in each pool worker so font metrics and fpdf internals are loaded up front.
+_WARMUP_DATA = {
+    'name': 'Warmup', 'email': 'warmup@example.com', 'phone': '000', 'summary': 'Warmup render.',
+    'education': [{'institution': 'Institution', 'degree': 'Degree', 'year': '2000', 'description': 'Description.'}],
+    'experience': [{'company': 'Company', 'position': 'Position', 'startDate': '2000', 'description': 'Description.'}],
+    'skills': ['Skill'],
+}
+
+class RenderQueueFullError(RuntimeError):
+    """Raised when the CV render queue is at capacity and the request should be retried later."""
+
+def warm_cv_templates():
+    """
+    Renders a sample CV with every template to preload fonts and layout code.
+
+    Called in the gunicorn master before it forks, so workers that render on
+    their own threads start warm, and by every render process.
+    """
+    for template in available_templates():
+        _build_cv(dict(_WARMUP_DATA, template=template)).output(BytesIO())
+
+def _warm_render_worker(metrics_dir=None):
+    """
+    Process pool initializer: warms the templates (see warm_cv_templates()), then
+    enables metrics aggregation, so renders in this process show up in /metrics.
+    """
+    warm_cv_templates()
+    metrics.configure_metrics(metrics_dir)
+
+class CVRenderExecutor:
+    """
+    Renders CVs on a bounded pool of warm worker processes.
+
+    fpdf2 layout is CPU-bound and holds the GIL, so rendering on request threads
+    serializes within a web worker. This executor moves it to separate processes
+    and limits the number of renders running or queued; beyond that limit,
+    submissions fail fast with RenderQueueFullError instead of piling up.
+    """
+
+    def __init__(self, max_workers, max_queue):
+        """
+        Args:
+            max_workers (int): Number of render processes.
+            max_queue (int): Number of renders allowed to wait for a free process.
+        """
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self._slots = threading.BoundedSemaphore(max_workers + max_queue)
+        self._lock = threading.Lock()
+        self._pool = None
+        self._pool_pid = None
+        self.pending = 0
+        self.completed = 0
+        self.rejected = 0
+
+    def _get_pool(self):
+        # Created lazily, and again after a fork, so each web worker owns its pool.
+        with self._lock:
+            if self._pool is None or self._pool_pid != os.getpid():
+                # 'spawn' avoids forking a multi-threaded web worker.
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    mp_context=multiprocessing.get_context('spawn'),
+                    initializer=_warm_render_worker,
+                    initargs=(metrics.get_metrics_dir(),),
+                )
+                self._pool_pid = os.getpid()
+            return self._pool
+
+    def submit(self, data, filepath=None):
+        """
+        Queues a render of data. See generate_cv_pdf() for the arguments.
+
+        Returns:
+            concurrent.futures.Future: Resolves to the generate_cv_pdf() result.
+
+        Raises:
+            RenderQueueFullError: If max_workers + max_queue renders are already in progress.
+        """
+        if not self._slots.acquire(blocking=False):
+            self.rejected += 1
+            raise RenderQueueFullError("CV render queue is full.")
+        with self._lock:
+            self.pending += 1
+        try:
+            pool = self._get_pool()
+            try:
+                future = pool.submit(generate_cv_pdf, data, filepath)
+            except BrokenProcessPool:
+                # A render process died since the last render; retry once on a fresh pool.
+                self._reset_pool(pool)
+                pool = self._get_pool()
+                future = pool.submit(generate_cv_pdf, data, filepath)
+        except BaseException:
+            self._release(None)
+            raise
+        future.add_done_callback(lambda done: self._release(done, pool))
+        return future
+
+    def render(self, data, filepath=None, timeout=None):
+        """Renders data on the pool and waits for the result. See submit()."""
+        return self.submit(data, filepath).result(timeout=timeout)
+
+    def _release(self, future, pool=None):
+        with self._lock:
+            self.pending -= 1
+            if future is not None:
+                self.completed += 1
+        self._slots.release()
+        if future is not None and not future.cancelled() and isinstance(future.exception(), BrokenProcessPool):
+            # A worker died (e.g. killed for memory); start a fresh pool for later renders.
+            self._reset_pool(pool)
+
+    def _reset_pool(self, broken=None):
+        """Shuts down the pool so the next render starts a new one; only if it is still `broken`, when given."""
+        with self._lock:
+            if broken is not None and self._pool is not broken:
+                return  # Already replaced.
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    def shutdown(self, wait=True):
+        """Stops the worker processes."""
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=wait, cancel_futures=True)
+
+    def stats(self):
+        """Returns queue depth and throughput counters."""
+        return {
+            "workers": self.max_workers,
+            "max_queue": self.max_queue,
+            "pending": self.pending,
+            "completed": self.completed,
+            "rejected": self.rejected,
+        }
+
+# Module-level render executor. None renders on the calling thread.
+_render_executor = None
+
+def configure_cv_renderer(max_workers, max_queue):
+    """
+    Enables process-pool rendering for render_cv_pdf().
 
     Args:
-        data (dict): A dictionary containing CV details (name, email, summary, education, experience, skills).
-        filepath (str): The full path including filename where the PDF should be saved.
-    """
-    pdf = ModernCV()
-    pdf.add_page()
-
-    # --- Personal Information Section ---
-    pdf.set_font("Arial", 'B', 24)
-    pdf.set_text_color(*pdf.primary_color)
-    pdf.cell(0, 15, txt=data.get('name', 'Your Name'), ln=1, align='C')
-
-    pdf.set_font("Arial", size=12)
-    pdf.set_text_color(*pdf.secondary_color)
-    contact_info = f"{data.get('email', '')} | {data.get('phone', '')}"
-    pdf.cell(0, 10, txt=contact_info, ln=1, align='C')
-    pdf.ln(15)
-
-    # --- Professional Summary Section ---
-    pdf.set_font("Arial", 'B', 16)
-    pdf.set_text_color(*pdf.primary_color)
-    pdf.cell(0, 10, txt="PROFESSIONAL SUMMARY", ln=1)
-    pdf.set_line_width(0.5)
-    pdf.set_draw_color(*pdf.primary_color)
-    pdf.line(10, pdf.get_y(), pdf.w - 10, pdf.get_y())
-    pdf.ln(8)
-
-    pdf.set_font("Arial", size=11)
-    pdf.set_text_color(0, 0, 0)  # Black text
-    pdf.multi_cell(0, 6, txt=data.get('summary', ''))
-    pdf.ln(12)
-
-    # --- Education Section ---
-    pdf.set_font("Arial", 'B', 16)
-    pdf.set_text_color(*pdf.primary_color)
-    pdf.cell(0, 10, txt="EDUCATION", ln=1)
-    pdf.set_line_width(0.5)
-    pdf.line(10, pdf.get_y(), pdf.w - 10, pdf.get_y())
-    pdf.ln(8)
-
-    for edu in data.get('education', []):
-        pdf.set_font("Arial", 'B', 12)
-        pdf.cell(0, 7, txt=edu.get('institution', ''), ln=1)
-
-        pdf.set_font("Arial", size=11)
-        pdf.set_text_color(*pdf.secondary_color)
-        pdf.cell(0, 6, txt=f"{edu.get('degree', '')} | {edu.get('year', '')}", ln=1)
-
-        if edu.get('description'):
-            pdf.set_text_color(0, 0, 0)
-            pdf.set_font("Arial", size=10)
-            pdf.multi_cell(0, 5, txt=edu['description'])
-            pdf.set_font("Arial", size=11) # Reset font
-        pdf.ln(5)
-
-    # --- Work Experience Section ---
-    # Only add if there's actual experience data
-    if data.get('experience') and any(exp.get('company', '').strip() for exp in data['experience']):
-        pdf.set_font("Arial", 'B', 16)
-        pdf.set_text_color(*pdf.primary_color)
-        pdf.cell(0, 10, txt="WORK EXPERIENCE", ln=1)
-        pdf.set_line_width(0.5)
-        pdf.line(10, pdf.get_y(), pdf.w - 10, pdf.get_y())
-        pdf.ln(8)
-
-        for exp in data['experience']:
-            if not exp.get('company', '').strip():
-                continue # Skip empty entries
-
-            pdf.set_font("Arial", 'B', 12)
-            pdf.set_text_color(0, 0, 0)
-            pdf.cell(0, 7, txt=exp.get('company', ''), ln=1)
-
-            pdf.set_font("Arial", size=11)
-            pdf.set_text_color(*pdf.secondary_color)
-            date_range = f"{exp.get('startDate', '')} - {exp.get('endDate', 'Present')}"
-            pdf.cell(0, 6, txt=f"{exp.get('position', '')} | {date_range}", ln=1)
-
-            if exp.get('description'):
-                pdf.set_text_color(0, 0, 0)
-                pdf.set_font("Arial", size=10)
-                pdf.multi_cell(0, 5, txt=exp['description'])
-                pdf.set_font("Arial", size=11) # Reset font
-            pdf.ln(5)
-
-    # --- Skills Section ---
-    pdf.set_font("Arial", 'B', 16)
-    pdf.set_text_color(*pdf.primary_color)
-    pdf.cell(0, 10, txt="SKILLS", ln=1)
-    pdf.set_line_width(0.5)
-    pdf.line(10, pdf.get_y(), pdf.w - 10, pdf.get_y())
-    pdf.ln(8)
-
-    pdf.set_font("Arial", size=11)
-    pdf.set_text_color(0, 0, 0)
-    # Filter out empty strings before joining
-    skills = " • ".join([skill.strip() for skill in data.get('skills', []) if skill.strip()])
-    pdf.multi_cell(0, 7, txt=skills)
+        max_workers (int): Number of render processes per web worker. 0 renders in-thread.
+        max_queue (int): Renders allowed to wait for a process before new ones get rejected.
+    """
+    global _render_executor
+    if _render_executor is not None:
+        _render_executor.shutdown(wait=False)
+    _render_executor = CVRenderExecutor(max_workers, max_queue) if max_workers else None
 
-    # Save the generated PDF to the specified filepath.
-    pdf.output(filepath)
+def get_cv_render_stats():
+    """Returns render executor counters, or None if rendering happens in-thread."""
+    return _render_executor.stats() if _render_executor is not None else None
+
+def render_cv_pdf(data, filepath=None):
+    """
+    Renders a CV through the configured executor, or on the calling thread if none is configured.
+
+    Takes the same arguments and returns the same value as generate_cv_pdf().
+
+    Raises:
+        RenderQueueFullError: If the render queue is at capacity.
+    """
+    if _render_executor is None:
+        return generate_cv_pdf(data, filepath)
+    return _render_executor.render(data, filepath)
+
+def render_cv_batch(items, concurrency):
+    """
+    Renders many CVs in parallel, yielding results as they complete.
+
+    Uses the configured render executor when there is one (waiting for a free
+    slot instead of failing when its queue is full), otherwise a thread pool.
+    At most `concurrency` renders from this batch are in flight at once.
+
+    Args:
+        items (iterable): Yields (key, data) pairs; key is passed back unchanged.
+        concurrency (int): Maximum number of renders in flight for this batch.
+
+    Yields:
+        tuple: (key, pdf_bytes, error), where exactly one of pdf_bytes and error is None.
+    """
+    thread_pool = None if _render_executor is not None else ThreadPoolExecutor(max_workers=concurrency)
+    pending = {}
+
+    def collect(block_until_one):
+        if block_until_one:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+        else:
+            done = [future for future in pending if future.done()]
+        for future in done:
+            key = pending.pop(future)
+            error = future.exception()
+            yield key, (None if error else future.result()), error
 
+    try:
+        for key, data in items:
+            while len(pending) >= concurrency:
+                yield from collect(True)
+            while True:
+                try:
+                    if thread_pool is not None:
+                        future = thread_pool.submit(generate_cv_pdf, data)
+                    else:
+                        future = _render_executor.submit(data)
+                    break
+                except RenderQueueFullError:
+                    # Other requests hold the render slots; wait for ours or for theirs to free up.
+                    if pending:
+                        yield from collect(True)
+                    else:
+                        time.sleep(0.05)
+            pending[future] = key
+            yield from collect(False)
+        while pending:
+            yield from collect(True)
+    finally:
+        for future in pending:
+            future.cancel()
+        if thread_pool is not None:
+            thread_pool.shutdown(wait=False)
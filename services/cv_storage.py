@@ -0,0 +1,354 @@
+# services/cv_storage.py
+import mmap
+import os
+import tempfile
+import uuid
+from collections import namedtuple
+from contextlib import contextmanager
+
+# Storage backends selectable with CV_STORAGE_BACKEND.
+STORAGE_BACKENDS = ('local', 'shared', 's3')
+
+# Size of the pieces streamed to clients when a backend cannot hand the file to send_file.
+CHUNK_SIZE = 64 * 1024
+
+# size in bytes; version changes whenever the stored bytes do (used in ETags);
+# created_at is a Unix timestamp.
+StoredCV = namedtuple('StoredCV', ['size', 'version', 'created_at'])
+
+
+class CVStore:
+    """
+    Where generated CV PDFs are kept between /generate-cv and /download-cv.
+
+    Files are addressed by name (the content-hash filename). Backends write
+    atomically: a reader sees either no file or the complete file. Missing
+    files raise FileNotFoundError, as with local files.
+    """
+
+    # Whether configure_cv_index() should reconcile the index with list() at startup.
+    reconcile_on_start = True
+
+    @contextmanager
+    def staged(self, name):
+        """
+        Yields a local path to write name to; the file is published when the block exits.
+
+        The file is discarded if the block raises.
+        """
+        raise NotImplementedError
+
+    def put(self, name, fileobj):
+        """Stores the contents of a binary file object under name, copying it in chunks."""
+        with self.staged(name) as path, open(path, 'wb') as out:
+            while True:
+                chunk = fileobj.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                out.write(chunk)
+
+    def stat(self, name):
+        """Returns a StoredCV for name. Raises FileNotFoundError if it is not stored."""
+        raise NotImplementedError
+
+    def refresh(self, name):
+        """Marks a stored file as reused. Returns its StoredCV, or None if it is not stored."""
+        try:
+            return self.stat(name)
+        except FileNotFoundError:
+            return None
+
+    def iter_chunks(self, name, chunk_size=CHUNK_SIZE):
+        """Yields the file's bytes in chunks. Raises FileNotFoundError before yielding if it is missing."""
+        raise NotImplementedError
+
+    def delete(self, name):
+        """Removes name. Raises FileNotFoundError if it is not stored."""
+        raise NotImplementedError
+
+    def list(self):
+        """Yields (name, size, created_at) for every stored PDF."""
+        raise NotImplementedError
+
+    def local_path(self, name):
+        """Returns a path that send_file can serve directly, or None if the backend has none."""
+        return None
+
+    def download_url(self, name, download_name):
+        """Returns a URL the client can be redirected to for the file, or None to serve it through the app."""
+        return None
+
+    def describe(self):
+        """Returns a short description of the backend, for /health."""
+        raise NotImplementedError
+
+
+class LocalCVStore(CVStore):
+    """Files in a directory on this host's disk. Downloads must reach the host that rendered the CV."""
+
+    def __init__(self, folder):
+        self.folder = folder
+        os.makedirs(folder, exist_ok=True)
+
+    def _path(self, name):
+        return os.path.join(self.folder, name)
+
+    @contextmanager
+    def staged(self, name):
+        # Render next to the final file so the rename is atomic.
+        path = self._path(name)
+        temp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        try:
+            yield temp_path
+            self._publish(temp_path, path)
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+    def _publish(self, temp_path, path):
+        os.replace(temp_path, path)
+
+    def stat(self, name):
+        stat = os.stat(self._path(name))
+        return StoredCV(stat.st_size, f"{stat.st_mtime_ns:x}", stat.st_ctime)
+
+    def refresh(self, name):
+        """
+        Re-applies the file's current timestamps, which updates its ctime (used
+        as the creation time by reconcile) while keeping its mtime, and
+        therefore its ETag, unchanged.
+        """
+        path = self._path(name)
+        try:
+            stat = os.stat(path)
+            os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+            return self.stat(name)
+        except FileNotFoundError:
+            return None
+
+    def iter_chunks(self, name, chunk_size=CHUNK_SIZE):
+        f = open(self._path(name), 'rb')
+
+        def chunks():
+            with f:
+                while True:
+                    chunk = f.read(chunk_size)
+                    if not chunk:
+                        break
+                    yield chunk
+        return chunks()
+
+    def delete(self, name):
+        os.remove(self._path(name))
+
+    def list(self):
+        for entry in os.scandir(self.folder):
+            if entry.name.endswith('.pdf') and entry.is_file():
+                stat = entry.stat()
+                yield entry.name, stat.st_size, stat.st_ctime
+
+    def local_path(self, name):
+        return self._path(name)
+
+    def describe(self):
+        return {"backend": "local", "folder": self.folder}
+
+
+class SharedDirCVStore(LocalCVStore):
+    """
+    Files in a directory mounted on every node (NFS, EFS, a shared volume).
+
+    Writes are fsynced before they are renamed into place, so another node
+    never sees a partial file. Reads go through mmap, so concurrent downloads
+    of the same CV on a node share one copy in the page cache, not a
+    read buffer per request.
+    """
+
+    def _publish(self, temp_path, path):
+        with open(temp_path, 'rb') as f:
+            os.fsync(f.fileno())
+        os.replace(temp_path, path)
+        # Persist the rename itself; not possible on every platform.
+        try:
+            dir_fd = os.open(self.folder, os.O_RDONLY)
+        except OSError:
+            return
+        try:
+            os.fsync(dir_fd)
+        except OSError:
+            pass
+        finally:
+            os.close(dir_fd)
+
+    def iter_chunks(self, name, chunk_size=CHUNK_SIZE):
+        f = open(self._path(name), 'rb')
+        if os.fstat(f.fileno()).st_size == 0:
+            f.close()
+            return iter(())  # mmap cannot map an empty file.
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        f.close()
+
+        def chunks():
+            with mapped:
+                for start in range(0, len(mapped), chunk_size):
+                    yield mapped[start:start + chunk_size]
+        return chunks()
+
+    def local_path(self, name):
+        # Stream through iter_chunks() so reads use the shared mapping.
+        return None
+
+    def describe(self):
+        return {"backend": "shared", "folder": self.folder}
+
+
+class S3CVStore(CVStore):
+    """
+    Objects in an S3-compatible bucket (AWS S3, MinIO, Ceph, R2, ...).
+
+    Uploads stream the rendered file (multipart for large ones). Downloads are
+    redirects to short-lived pre-signed URLs, or, with redirect disabled,
+    streamed through the app. Point endpoint_url at a local MinIO or other
+    S3-compatible server to develop and test without AWS. Requires boto3.
+    """
+
+    # Every node would index the whole bucket; rely on the bucket's lifecycle rules instead.
+    reconcile_on_start = False
+
+    def __init__(self, bucket, prefix='', endpoint_url=None, region=None, redirect=True, url_expiry=300,
+                 client=None):
+        """
+        Args:
+            bucket (str): Bucket name.
+            prefix (str): Key prefix for CV objects, e.g. 'cvs/'.
+            endpoint_url (str, optional): S3 API endpoint, for non-AWS or local servers.
+            region (str, optional): Bucket region.
+            redirect (bool): Redirect downloads to pre-signed URLs instead of proxying them.
+            url_expiry (int): Lifetime of pre-signed URLs, in seconds.
+            client (optional): A boto3 S3 client to use instead of creating one.
+
+        Raises:
+            RuntimeError: If boto3 is not installed and no client is given.
+        """
+        if client is None:
+            try:
+                import boto3
+            except ImportError:
+                raise RuntimeError("The 's3' CV storage backend requires boto3 (pip install boto3).")
+            client = boto3.client('s3', endpoint_url=endpoint_url, region_name=region)
+        self.client = client
+        self.bucket = bucket
+        self.prefix = prefix
+        self.redirect = redirect
+        self.url_expiry = url_expiry
+
+    def _key(self, name):
+        return self.prefix + name
+
+    @staticmethod
+    def _is_missing(error):
+        code = str(getattr(error, 'response', {}).get('Error', {}).get('Code', ''))
+        return code in ('404', 'NoSuchKey', 'NotFound')
+
+    @contextmanager
+    def staged(self, name):
+        fd, temp_path = tempfile.mkstemp(suffix='.pdf')
+        os.close(fd)
+        try:
+            yield temp_path
+            self.client.upload_file(
+                temp_path, self.bucket, self._key(name), ExtraArgs={'ContentType': 'application/pdf'}
+            )
+        finally:
+            os.remove(temp_path)
+
+    def put(self, name, fileobj):
+        self.client.upload_fileobj(fileobj, self.bucket, self._key(name), ExtraArgs={'ContentType': 'application/pdf'})
+
+    def stat(self, name):
+        try:
+            head = self.client.head_object(Bucket=self.bucket, Key=self._key(name))
+        except Exception as e:
+            if self._is_missing(e):
+                raise FileNotFoundError(name) from e
+            raise
+        return StoredCV(head['ContentLength'], head['ETag'].strip('"'), head['LastModified'].timestamp())
+
+    def iter_chunks(self, name, chunk_size=CHUNK_SIZE):
+        try:
+            body = self.client.get_object(Bucket=self.bucket, Key=self._key(name))['Body']
+        except Exception as e:
+            if self._is_missing(e):
+                raise FileNotFoundError(name) from e
+            raise
+
+        def chunks():
+            try:
+                yield from body.iter_chunks(chunk_size)
+            finally:
+                body.close()
+        return chunks()
+
+    def delete(self, name):
+        # S3 deletes succeed for missing keys; check first to keep the FileNotFoundError contract.
+        self.stat(name)
+        self.client.delete_object(Bucket=self.bucket, Key=self._key(name))
+
+    def list(self):
+        paginator = self.client.get_paginator('list_objects_v2')
+        for page in paginator.paginate(Bucket=self.bucket, Prefix=self.prefix):
+            for item in page.get('Contents', []):
+                name = item['Key'][len(self.prefix):]
+                if name.endswith('.pdf') and '/' not in name:
+                    yield name, item['Size'], item['LastModified'].timestamp()
+
+    def download_url(self, name, download_name):
+        if not self.redirect:
+            return None
+        return self.client.generate_presigned_url(
+            'get_object',
+            Params={
+                'Bucket': self.bucket,
+                'Key': self._key(name),
+                'ResponseContentType': 'application/pdf',
+                'ResponseContentDisposition': f'attachment; filename="{download_name}"',
+            },
+            ExpiresIn=self.url_expiry,
+        )
+
+    def describe(self):
+        return {"backend": "s3", "bucket": self.bucket, "prefix": self.prefix, "redirect": self.redirect}
+
+
+# Module-level store, set up by configure_cv_store().
+_cv_store = None
+
+def configure_cv_store(backend, folder, s3_options=None):
+    """
+    Creates the CV store used by the CV routes, eviction and cleanup.
+
+    Args:
+        backend (str): One of STORAGE_BACKENDS.
+        folder (str): Directory for the 'local' and 'shared' backends.
+        s3_options (dict, optional): Keyword arguments for S3CVStore.
+
+    Raises:
+        ValueError: If the backend is unknown, or 's3' is chosen without a bucket.
+    """
+    global _cv_store
+    if backend == 'local':
+        _cv_store = LocalCVStore(folder)
+    elif backend == 'shared':
+        _cv_store = SharedDirCVStore(folder)
+    elif backend == 's3':
+        s3_options = dict(s3_options or {})
+        if not s3_options.get('bucket'):
+            raise ValueError("CV_S3_BUCKET must be set for the 's3' CV storage backend.")
+        _cv_store = S3CVStore(**s3_options)
+    else:
+        raise ValueError(f"Unknown CV storage backend '{backend}'. Expected one of: {', '.join(STORAGE_BACKENDS)}.")
+    return _cv_store
+
+def get_cv_store():
+    """Returns the configured CV store, or None if it has not been configured."""
+    return _cv_store
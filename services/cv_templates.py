@@ -0,0 +1,261 @@
+# services/cv_templates.py
+from fpdf import FPDF
+from datetime import datetime
+from functools import partial
+
+# Theme used when a CV payload does not name one.
+DEFAULT_THEME = 'modern'
+
+class CVTheme:
+    """
+    Visual style of a CV template: fonts, colors, sizes and spacing.
+
+    The defaults reproduce the original SteelBlue 'modern' layout. Every
+    vertical size (cell heights and gaps) is multiplied by line_scale.
+    """
+
+    def __init__(self, name, font_family='Arial', primary_color=(70, 130, 180),
+                 secondary_color=(100, 100, 100), text_color=(0, 0, 0),
+                 name_size=24, contact_size=12, heading_size=16, entry_title_size=12,
+                 body_size=11, description_size=10, rule_width=0.5, line_scale=1.0,
+                 page_header_text="Professional CV - Page {page}", footer_text="Generated on {date}"):
+        self.name = name
+        self.font_family = font_family
+        self.primary_color = primary_color  # Headings and the name
+        self.secondary_color = secondary_color  # Subtext, header and footer
+        self.text_color = text_color  # Body text
+        self.name_size = name_size
+        self.contact_size = contact_size
+        self.heading_size = heading_size
+        self.entry_title_size = entry_title_size
+        self.body_size = body_size
+        self.description_size = description_size
+        self.rule_width = rule_width
+        self.line_scale = line_scale
+        self.page_header_text = page_header_text
+        self.footer_text = footer_text
+
+    def height(self, value):
+        """Scales a vertical size by the theme's line_scale."""
+        return value * self.line_scale
+
+# Built-in themes, selectable with the 'template' field of a CV payload.
+THEMES = {
+    'modern': CVTheme('modern'),
+    'classic': CVTheme(
+        'classic', font_family='Times', primary_color=(0, 0, 0), secondary_color=(80, 80, 80),
+        heading_size=14, rule_width=0.3,
+    ),
+    'compact': CVTheme(
+        'compact', font_family='Helvetica', primary_color=(34, 85, 51), secondary_color=(90, 90, 90),
+        name_size=20, contact_size=10, heading_size=13, entry_title_size=11,
+        body_size=10, description_size=9, rule_width=0.4, line_scale=0.8,
+    ),
+}
+
+# Section specs, in page order. 'kind' selects the compiler used for the section:
+#   header  - name and contact line
+#   text    - a heading and a free-text field
+#   entries - a heading and a list of dicts (title, "a | b" subtitle, optional description)
+#   list    - a heading and a list of strings joined with bullets
+DEFAULT_SECTIONS = [
+    {'kind': 'header'},
+    {'kind': 'text', 'title': 'PROFESSIONAL SUMMARY', 'field': 'summary', 'line_height': 6, 'gap_after': 12},
+    {
+        'kind': 'entries', 'title': 'EDUCATION', 'field': 'education',
+        'entry_title': 'institution', 'subtitle': lambda edu: f"{edu.get('degree', '')} | {edu.get('year', '')}",
+    },
+    {
+        # Only shown when at least one entry names a company; entries without one are skipped.
+        'kind': 'entries', 'title': 'WORK EXPERIENCE', 'field': 'experience',
+        'entry_title': 'company', 'required_field': 'company',
+        'subtitle': lambda exp: f"{exp.get('position', '')} | {exp.get('startDate', '')} - {exp.get('endDate', 'Present')}",
+    },
+    {'kind': 'list', 'title': 'SKILLS', 'field': 'skills', 'separator': ' • ', 'line_height': 7},
+]
+
+class ModernCV(FPDF):
+    """
+    Custom PDF class extending FPDF for generating modern-styled CVs.
+
+    Encapsulates styling and common PDF elements (header, footer).
+    """
+
+    def __init__(self, theme=None):
+        """Initializes the PDF document with the theme's colors and auto page break."""
+        super().__init__()
+        self.theme = theme or THEMES[DEFAULT_THEME]
+        self.primary_color = self.theme.primary_color
+        self.secondary_color = self.theme.secondary_color
+        self.set_auto_page_break(auto=True, margin=15) # Automatically create new pages
+        self._footer_text = self.theme.footer_text.format(date=datetime.now().strftime('%Y-%m-%d'))
+
+    def header(self):
+        """Defines the header for each page (except the first)."""
+        # A common practice is to skip the header on the very first page of a CV.
+        if self.page_no() == 1:
+            return
+
+        self.set_font(self.theme.font_family, 'B', 10)
+        self.set_text_color(*self.secondary_color)
+        self.cell(0, 10, self.theme.page_header_text.format(page=self.page_no()), 0, 0, 'C')
+
+    def footer(self):
+        """Defines the footer for each page."""
+        self.set_y(-15) # Position 15mm from bottom
+        self.set_font(self.theme.font_family, 'I', 8)
+        self.set_text_color(*self.secondary_color)
+        self.cell(0, 10, self._footer_text, 0, 0, 'C')
+
+class CVRenderPlan:
+    """
+    A template compiled into a flat list of drawing steps.
+
+    Fonts, colors, sizes and static strings are resolved once when the plan is
+    compiled; rendering a CV only runs the steps against the request data.
+    """
+
+    def __init__(self, theme, sections=None):
+        self.theme = theme
+        self.steps = [_compile_section(spec, theme) for spec in (sections or DEFAULT_SECTIONS)]
+
+    def render(self, data):
+        """Lays out data with this plan and returns the populated ModernCV document."""
+        pdf = ModernCV(self.theme)
+        pdf.add_page()
+        for step in self.steps:
+            step(pdf, data)
+        return pdf
+
+def _compile_section(spec, theme):
+    compilers = {
+        'header': _compile_header,
+        'text': _compile_text_section,
+        'entries': _compile_entries_section,
+        'list': _compile_list_section,
+    }
+    if spec['kind'] not in compilers:
+        raise ValueError(f"Unknown CV section kind: {spec['kind']}")
+    return compilers[spec['kind']](spec, theme)
+
+def _compile_heading(title, theme):
+    """Returns a step drawing a section title with a rule underneath."""
+    family, size, color = theme.font_family, theme.heading_size, theme.primary_color
+    cell_height, gap = theme.height(10), theme.height(8)
+
+    def draw(pdf):
+        pdf.set_font(family, 'B', size)
+        pdf.set_text_color(*color)
+        pdf.cell(0, cell_height, txt=title, ln=1)
+        pdf.set_line_width(theme.rule_width)
+        pdf.set_draw_color(*color)
+        pdf.line(10, pdf.get_y(), pdf.w - 10, pdf.get_y())
+        pdf.ln(gap)
+
+    return draw
+
+def _draw_header(pdf, data, theme):
+    pdf.set_font(theme.font_family, 'B', theme.name_size)
+    pdf.set_text_color(*theme.primary_color)
+    pdf.cell(0, theme.height(15), txt=data.get('name', 'Your Name'), ln=1, align='C')
+
+    pdf.set_font(theme.font_family, size=theme.contact_size)
+    pdf.set_text_color(*theme.secondary_color)
+    contact_info = f"{data.get('email', '')} | {data.get('phone', '')}"
+    pdf.cell(0, theme.height(10), txt=contact_info, ln=1, align='C')
+    pdf.ln(theme.height(15))
+
+def _compile_header(spec, theme):
+    return partial(_draw_header, theme=theme)
+
+def _compile_text_section(spec, theme):
+    heading = _compile_heading(spec['title'], theme)
+    field, line_height, gap = spec['field'], theme.height(spec['line_height']), theme.height(spec['gap_after'])
+
+    def draw(pdf, data):
+        heading(pdf)
+        pdf.set_font(theme.font_family, size=theme.body_size)
+        pdf.set_text_color(*theme.text_color)
+        pdf.multi_cell(0, line_height, txt=data.get(field, ''))
+        pdf.ln(gap)
+
+    return draw
+
+def _compile_entries_section(spec, theme):
+    heading = _compile_heading(spec['title'], theme)
+    field, title_key, subtitle = spec['field'], spec['entry_title'], spec['subtitle']
+    required = spec.get('required_field')
+    title_height, subtitle_height = theme.height(7), theme.height(6)
+    description_height, gap = theme.height(5), theme.height(5)
+
+    def draw(pdf, data):
+        entries = data.get(field) or []
+        if required:
+            entries = [entry for entry in entries if entry.get(required, '').strip()]
+            if not entries:
+                return
+        heading(pdf)
+        for entry in entries:
+            pdf.set_font(theme.font_family, 'B', theme.entry_title_size)
+            pdf.set_text_color(*theme.text_color)
+            pdf.cell(0, title_height, txt=entry.get(title_key, ''), ln=1)
+
+            pdf.set_font(theme.font_family, size=theme.body_size)
+            pdf.set_text_color(*theme.secondary_color)
+            pdf.cell(0, subtitle_height, txt=subtitle(entry), ln=1)
+
+            if entry.get('description'):
+                pdf.set_text_color(*theme.text_color)
+                pdf.set_font(theme.font_family, size=theme.description_size)
+                pdf.multi_cell(0, description_height, txt=entry['description'])
+            pdf.ln(gap)
+
+    return draw
+
+def _compile_list_section(spec, theme):
+    heading = _compile_heading(spec['title'], theme)
+    field, separator, line_height = spec['field'], spec['separator'], theme.height(spec['line_height'])
+
+    def draw(pdf, data):
+        heading(pdf)
+        pdf.set_font(theme.font_family, size=theme.body_size)
+        pdf.set_text_color(*theme.text_color)
+        # Filter out empty strings before joining
+        items = separator.join([item.strip() for item in data.get(field, []) if item.strip()])
+        pdf.multi_cell(0, line_height, txt=items)
+
+    return draw
+
+# Render plans for every theme, compiled once at import (i.e. at startup, and
+# once per render process).
+_PLANS = {}
+
+def register_template(theme, sections=None):
+    """
+    Compiles and registers a template under theme.name, replacing any existing one.
+
+    Args:
+        theme (CVTheme): The template's visual style.
+        sections (list, optional): Section specs; defaults to DEFAULT_SECTIONS.
+    """
+    THEMES[theme.name] = theme
+    _PLANS[theme.name] = CVRenderPlan(theme, sections)
+
+def get_render_plan(name=None):
+    """
+    Returns the compiled render plan for a theme name (the default theme if name is empty).
+
+    Raises:
+        ValueError: If no template with that name is registered.
+    """
+    plan = _PLANS.get(name or DEFAULT_THEME)
+    if plan is None:
+        raise ValueError(f"Unknown CV template '{name}'. Available templates: {', '.join(available_templates())}.")
+    return plan
+
+def available_templates():
+    """Returns the names of all registered templates."""
+    return sorted(_PLANS)
+
+for _theme in list(THEMES.values()):
+    register_template(_theme)
@@ -0,0 +1,200 @@
+# services/fake_gemini.py
+import asyncio
+import json
+import random
+import threading
+import time
+from types import SimpleNamespace
+
+from services.response_cache import normalize_prompt
+
+# Failure modes the fake model can inject, for exercising repair and retry paths.
+FAILURE_MODES = ('malformed', 'truncated', 'unavailable')
+
+# Canned answers used when no recording matches a prompt, chosen by a phrase
+# that identifies which route built the prompt (see services.prompts).
+_CANNED_RESPONSES = [
+    ("career opportunities", json.dumps({"jobs": [
+        {
+            "title": f"Sample Role {i}",
+            "description": "Works on representative tasks for this degree.",
+            "skills": ["Communication", "Problem solving", "Domain knowledge"],
+            "education": "Bachelor's degree",
+            "outlook": "Growing",
+            "salary": "$50,000 - $80,000",
+        }
+        for i in range(1, 6)
+    ]})),
+    ("career advisor", json.dumps({
+        "keySkills": [f"Key skill {i}" for i in range(1, 7)],
+        "careerPaths": [f"Career path {i}" for i in range(1, 6)],
+        "certifications": [f"Certification {i}" for i in range(1, 5)],
+        "industryTrends": [f"Industry trend {i}" for i in range(1, 5)],
+    })),
+    ("interview questions", "\n\n".join(
+        f"{i}. What is a sample interview question number {i}?\n"
+        f"   - Tips: Be specific, Use an example, Keep it brief"
+        for i in range(1, 11)
+    )),
+]
+_DEFAULT_RESPONSE = "This is a placeholder response from the fake Gemini backend."
+
+# Batch prompts (see services.prompts) list one item per "- " line before this phrase
+# and ask for an object keyed by item.
+_BATCH_MARKER = "one key per program"
+
+
+class FakeServiceUnavailable(Exception):
+    """Raised by the 'unavailable' failure mode; mirrors google.api_core.exceptions.ServiceUnavailable."""
+
+    code = 503
+
+
+class FakeGeminiModel:
+    """
+    Local stand-in for genai.GenerativeModel, for benchmarks and offline development.
+
+    Replays recorded responses (see RecordingModel) or canned answers after a
+    simulated latency, and can corrupt a fraction of them to exercise the
+    JSON repair and retry paths. Implements the subset of the model interface
+    that gemini_service uses: generate_content (optionally streaming) and
+    generate_content_async. With a seed, latencies and failures are reproducible.
+    """
+
+    def __init__(self, latency=0.5, jitter=0.1, failure_mode=None, failure_rate=0.0,
+                 recordings_path=None, seed=None, stream_chunks=8):
+        """
+        Args:
+            latency (float): Mean seconds before a response (or the first chunk) is returned.
+            jitter (float): Maximum random deviation from latency, in seconds.
+            failure_mode (str, optional): 'malformed' (not repairable JSON), 'truncated'
+                (output cut short, as when the token limit is hit) or 'unavailable'
+                (the call fails with a 503 error).
+            failure_rate (float): Fraction of responses corrupted with failure_mode.
+            recordings_path (str, optional): JSONL file of {"prompt", "text"} records to replay.
+            seed (int, optional): Seed for latency jitter and failure injection.
+            stream_chunks (int): Number of chunks a streamed response is split into.
+        """
+        if failure_mode is not None and failure_mode not in FAILURE_MODES:
+            raise ValueError(f"Unknown failure mode '{failure_mode}'. Expected one of: {', '.join(FAILURE_MODES)}.")
+        self.latency = latency
+        self.jitter = jitter
+        self.failure_mode = failure_mode
+        self.failure_rate = failure_rate
+        self.stream_chunks = max(1, stream_chunks)
+        self._random = random.Random(seed)
+        self._random_lock = threading.Lock()
+        self._recordings = load_recordings(recordings_path) if recordings_path else {}
+
+    def _draw(self):
+        """Returns (delay, corrupt, cut_fraction) for one call."""
+        with self._random_lock:
+            delay = max(0.0, self.latency + self._random.uniform(-self.jitter, self.jitter))
+            corrupt = bool(self.failure_mode) and self._random.random() < self.failure_rate
+            cut = self._random.uniform(0.3, 0.9)
+        return delay, corrupt, cut
+
+    @staticmethod
+    def _wait(delay, request_options):
+        """Sleeps for delay, or raises TimeoutError once the request's timeout has passed."""
+        timeout = (request_options or {}).get("timeout")
+        if timeout is not None and delay > timeout:
+            time.sleep(timeout)
+            raise TimeoutError(f"Fake Gemini call timed out after {timeout:.2f}s.")
+        time.sleep(delay)
+
+    def _respond(self, prompt, corrupt, cut):
+        if corrupt and self.failure_mode == 'unavailable':
+            raise FakeServiceUnavailable("503 The fake model is overloaded. Please try again later.")
+        text = self._recordings.get(normalize_prompt(prompt))
+        if text is None:
+            lowered = prompt.lower()
+            text = next((answer for phrase, answer in _CANNED_RESPONSES if phrase in lowered), _DEFAULT_RESPONSE)
+            if _BATCH_MARKER in lowered:
+                listing = prompt[:lowered.index(_BATCH_MARKER)].splitlines()
+                items = [line.strip()[2:] for line in listing if line.strip().startswith("- ")]
+                text = json.dumps({item: json.loads(text) for item in items})
+        if corrupt and self.failure_mode == 'malformed':
+            # Python-literal style quoting: no repair step can turn this into JSON.
+            text = "Here you go: " + text.replace('"', "'")
+        elif corrupt and self.failure_mode == 'truncated':
+            text = text[:max(1, int(len(text) * cut))]
+        return text
+
+    @staticmethod
+    def _response(prompt, text):
+        usage = SimpleNamespace(prompt_token_count=len(prompt) // 4, candidates_token_count=len(text) // 4)
+        return SimpleNamespace(text=text, usage_metadata=usage)
+
+    def generate_content(self, prompt, generation_config=None, stream=False, request_options=None):
+        delay, corrupt, cut = self._draw()
+        if stream:
+            return self._stream(prompt, delay, corrupt, cut, request_options)
+        self._wait(delay, request_options)
+        return self._response(prompt, self._respond(prompt, corrupt, cut))
+
+    def _stream(self, prompt, delay, corrupt, cut, request_options):
+        # The first chunk arrives after the full latency, the rest are spread over another half of it.
+        self._wait(delay, request_options)
+        text = self._respond(prompt, corrupt, cut)
+        size = max(1, -(-len(text) // self.stream_chunks))
+        pieces = [text[i:i + size] for i in range(0, len(text), size)] or [""]
+        for index, piece in enumerate(pieces):
+            if index:
+                time.sleep(delay / 2 / len(pieces))
+            last = index == len(pieces) - 1
+            yield self._response(prompt, piece) if last else SimpleNamespace(text=piece)
+
+    async def generate_content_async(self, prompt, generation_config=None, request_options=None):
+        delay, corrupt, cut = self._draw()
+        timeout = (request_options or {}).get("timeout")
+        if timeout is not None and delay > timeout:
+            await asyncio.sleep(timeout)
+            raise TimeoutError(f"Fake Gemini call timed out after {timeout:.2f}s.")
+        await asyncio.sleep(delay)
+        return self._response(prompt, self._respond(prompt, corrupt, cut))
+
+
+class RecordingModel:
+    """
+    Wraps a real model and appends every non-streamed response to a JSONL file.
+
+    The file can be replayed offline with FakeGeminiModel(recordings_path=...).
+    """
+
+    def __init__(self, model, path):
+        self._model = model
+        self.path = path
+        self._lock = threading.Lock()
+
+    def _record(self, prompt, response):
+        line = json.dumps({"prompt": normalize_prompt(prompt), "text": response.text})
+        with self._lock, open(self.path, 'a', encoding='utf-8') as f:
+            f.write(line + "\n")
+
+    def generate_content(self, prompt, generation_config=None, stream=False, request_options=None):
+        response = self._model.generate_content(
+            prompt, generation_config=generation_config, stream=stream, request_options=request_options
+        )
+        if not stream:
+            self._record(prompt, response)
+        return response
+
+    async def generate_content_async(self, prompt, generation_config=None, request_options=None):
+        response = await self._model.generate_content_async(
+            prompt, generation_config=generation_config, request_options=request_options
+        )
+        self._record(prompt, response)
+        return response
+
+
+def load_recordings(path):
+    """Reads a recordings JSONL file into {normalized_prompt: text}. Later records win."""
+    recordings = {}
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                record = json.loads(line)
+                recordings[normalize_prompt(record["prompt"])] = record["text"]
+    return recordings
@@ -1,47 +1,755 @@
 # services/gemini_service.py
-import google.generativeai as genai
+import asyncio
+import json
 import os
+import threading
+import time
+from services.fake_gemini import FakeGeminiModel, RecordingModel
+from services.rate_limiter import PRIORITY_DEFAULT, RateLimiter, estimate_tokens
+from services.resilience import (
+    CircuitBreaker, ResilientCaller, RetryPolicy, UpstreamUnavailableError, is_transient,
+)
+from services.response_cache import LRUCache, SQLiteCache, ResponseCache, make_cache_key
+from services.structured_output import StructuredOutputError, coerce, decode_json_response
+from services.single_flight import SingleFlight
+from utils import metrics
 
-# Module-level variable to store the Gemini model instance.
+# Name of the Gemini model used for all generations. Part of every cache key.
+GEMINI_MODEL_NAME = 'gemini-1.5-flash'
+
+# Asks the model to answer with JSON only (no prose or markdown fences).
+JSON_GENERATION_CONFIG = {"response_mime_type": "application/json"}
+
+# Call metrics. 'mode' is text, json or stream.
+_GEMINI_LATENCY = metrics.histogram("gemini_request_duration_seconds", "Latency of Gemini API calls.", ("mode",))
+_GEMINI_REQUESTS = metrics.counter("gemini_requests_total", "Gemini API calls by outcome.", ("mode", "outcome"))
+_GEMINI_TOKENS = metrics.counter("gemini_tokens_total", "Tokens used by Gemini API calls.", ("type",))
+_GEMINI_PARSE_FAILURES = metrics.counter(
+    "gemini_json_parse_failures_total", "Structured Gemini responses that could not be repaired or coerced."
+)
+_GEMINI_BATCH_ITEMS = metrics.counter(
+    "gemini_batch_items_total", "Items of batched structured requests by how they were answered.", ("source",)
+)
+_GEMINI_STALE = metrics.counter(
+    "gemini_stale_responses_total", "Expired cached answers served because Gemini was unavailable."
+)
+
+# Backend settings from configure_gemini(). The model client itself is created on first
+# use in each process (see _get_model()): the google-generativeai import is slow, and its
+# grpc channels must not be created before gunicorn forks the workers that use them.
+_gemini_settings = None
+
+# This process's model client, the pid it was created in, and how long creating it took.
 _gemini_model = None
+_gemini_model_pid = None
+_gemini_model_init_seconds = None
+_gemini_model_lock = threading.Lock()
+
+# Module-level response cache. None disables caching.
+_response_cache = None
+
+# Deadline, retry, hedging and circuit breaker policy for Gemini calls. See configure_resilience().
+_resilience = ResilientCaller("gemini")
+
+# How long past its expiry a cached answer may still be served while Gemini is unavailable.
+_max_stale = 7 * 86400
+
+# Client-side RPM/TPM limiter, shared by the workers on this host. None disables it.
+_rate_limiter = None
+
+# Coalesces identical prompts that are in flight at the same time into one upstream call.
+_in_flight = SingleFlight()
+
+# Event loop that runs every async Gemini call in this process, on a daemon thread.
+# The SDK's async (grpc.aio) client is bound to the loop it was first used on, while
+# Flask runs each async view in its own short-lived loop, so all calls go through here.
+_async_loop = None
+_async_loop_pid = None
+_async_loop_lock = threading.Lock()
 
-def configure_gemini(api_key):
+def configure_gemini(api_key, backend='google', fake_options=None, record_path=None):
     """
-    Configures the Google Gemini API with the provided API key.
+    Configures the model backend used for all Gemini calls.
 
-    This should be called once during application startup.
-    Raises ValueError if the API key is missing.
+    This should be called once during application startup. It only checks and
+    stores the settings; the model client is created by the first call in each
+    process, or ahead of time by preload_gemini_client().
+
+    Args:
+        api_key (str): Google API key. Required by the 'google' backend only.
+        backend (str): 'google' for the real Gemini API, or 'fake' for the local
+            stub in services.fake_gemini (benchmarks and offline development).
+        fake_options (dict, optional): Keyword arguments for FakeGeminiModel.
+        record_path (str, optional): With the 'google' backend, append every
+            response to this JSONL file for later replay by the fake backend.
+
+    Raises:
+        ValueError: If the API key is missing for the 'google' backend, or the backend is unknown.
     """
-    if not api_key:
+    global _gemini_settings, _gemini_model, _gemini_model_pid
+    if backend not in ('google', 'fake'):
+        raise ValueError(f"Unknown Gemini backend '{backend}'. Expected 'google' or 'fake'.")
+    if backend == 'google' and not api_key:
         raise ValueError("GOOGLE_API_KEY environment variable not set.")
+    with _gemini_model_lock:
+        _gemini_settings = {
+            'api_key': api_key, 'backend': backend, 'fake_options': fake_options, 'record_path': record_path,
+        }
+        _gemini_model = None
+        _gemini_model_pid = None
+    print(f"Gemini backend '{backend}' configured; the model is initialized on first use.")
+
+def _create_model(api_key, backend, fake_options, record_path):
+    """Creates the model client for the configured backend."""
+    if backend == 'fake':
+        model = FakeGeminiModel(**(fake_options or {}))
+        print("Fake Gemini backend initialized; no API calls will be made.")
+        return model
+    # Imported here rather than at module level; see _gemini_settings.
+    import google.generativeai as genai
     genai.configure(api_key=api_key)
-    # Initialize the model once to reuse it across requests.
-    global _gemini_model
-    _gemini_model = genai.GenerativeModel('gemini-1.5-flash')
-    print("Gemini API successfully configured and model initialized.")
+    # Initialize the model once per process to reuse it across requests.
+    model = genai.GenerativeModel(GEMINI_MODEL_NAME)
+    if record_path:
+        model = RecordingModel(model, record_path)
+        print(f"Recording Gemini responses to {record_path}.")
+    print("Gemini API model initialized.")
+    return model
+
+def _get_model():
+    """
+    Returns this process's model client, creating it on first use.
+
+    Raises:
+        RuntimeError: If configure_gemini() has not been called.
+    """
+    global _gemini_model, _gemini_model_pid, _gemini_model_init_seconds
+    model = _gemini_model
+    if model is not None and _gemini_model_pid == os.getpid():
+        return model
+    with _gemini_model_lock:
+        # Re-created after a fork: the parent's client (if any) holds the parent's grpc state.
+        if _gemini_model is None or _gemini_model_pid != os.getpid():
+            if _gemini_settings is None:
+                raise RuntimeError("Gemini model not configured. Call configure_gemini() first.")
+            started = time.perf_counter()
+            _gemini_model = _create_model(**_gemini_settings)
+            _gemini_model_pid = os.getpid()
+            _gemini_model_init_seconds = time.perf_counter() - started
+        return _gemini_model
+
+def preload_gemini_client():
+    """
+    Creates this process's model client now instead of on the first call.
+
+    Meant for a background thread right after a worker starts, so that the
+    first request does not pay for the import. Errors are logged, not raised;
+    the next call retries.
+    """
+    try:
+        _get_model()
+    except Exception as e:
+        print(f"Could not initialize the Gemini model ahead of time: {e}")
+
+def configure_response_cache(max_entries, ttl, db_path=None):
+    """
+    Enables caching of Gemini responses.
+
+    Args:
+        max_entries (int): Maximum number of entries kept in the in-process LRU tier.
+            A value of 0 disables the cache entirely.
+        ttl (int): Time-to-live of each cached response, in seconds.
+        db_path (str, optional): Path of a SQLite file shared by all workers on the host.
+            When omitted, only the in-process tier is used.
+    """
+    global _response_cache
+    if not max_entries:
+        _response_cache = None
+        return
+    shared = SQLiteCache(db_path, ttl=ttl) if db_path else None
+    _response_cache = ResponseCache(LRUCache(max_entries=max_entries, ttl=ttl), shared)
+    print(f"Gemini response cache enabled ({max_entries} entries, ttl={ttl}s, shared={'yes' if shared else 'no'}).")
+
+def configure_resilience(deadline, max_attempts, base_delay, max_delay, failure_threshold, recovery_time,
+                         hedge_percentile=None, hedge_min_delay=1.0, max_stale=7 * 86400):
+    """
+    Configures how Gemini calls are bounded and retried.
+
+    Without this call, the module defaults of services.resilience.ResilientCaller apply.
+
+    Args:
+        deadline (float): Seconds allowed for one call, including retries.
+        max_attempts (int): Attempts per call for transient errors (timeouts, 429, 5xx).
+        base_delay (float): Backoff before the first retry, in seconds; doubles per retry.
+        max_delay (float): Upper bound of the backoff, in seconds.
+        failure_threshold (int): Consecutive transient failures that open the circuit breaker.
+        recovery_time (float): Seconds the breaker stays open before a probe call is allowed.
+        hedge_percentile (float, optional): Send a second request when the first is slower
+            than this percentile of recent latencies (e.g. 0.95). None disables hedging.
+        hedge_min_delay (float): Never hedge earlier than this many seconds.
+        max_stale (int): Seconds past expiry that a cached answer may be served while
+            Gemini is unavailable. 0 disables stale answers.
+    """
+    global _resilience, _max_stale
+    _resilience = ResilientCaller(
+        "gemini",
+        deadline=deadline,
+        retry=RetryPolicy(max_attempts, base_delay, max_delay),
+        breaker=CircuitBreaker("gemini", failure_threshold, recovery_time),
+        hedge_percentile=hedge_percentile,
+        hedge_min_delay=hedge_min_delay,
+    )
+    _max_stale = max_stale
+    hedging = f", hedging at p{round(hedge_percentile * 100)}" if hedge_percentile else ""
+    print(f"Gemini calls: {deadline}s deadline, {max_attempts} attempts, breaker after {failure_threshold} failures{hedging}.")
 
-def get_gemini_response(prompt):
+def configure_rate_limiter(requests_per_minute, tokens_per_minute, db_path=None, expected_output_tokens=800):
+    """
+    Keeps Gemini calls within the project's per-minute quota.
+
+    Args:
+        requests_per_minute (int): Request quota; 0 for no request limit.
+        tokens_per_minute (int): Token quota; 0 for no token limit. Both 0 disables limiting.
+        db_path (str, optional): SQLite file through which all workers share the quota.
+        expected_output_tokens (int): Output tokens assumed per call until usage is reported.
+    """
+    global _rate_limiter
+    if not requests_per_minute and not tokens_per_minute:
+        _rate_limiter = None
+        return
+    _rate_limiter = RateLimiter(requests_per_minute, tokens_per_minute, db_path, expected_output_tokens)
+    print(f"Gemini rate limit: {requests_per_minute or 'unlimited'} RPM, {tokens_per_minute or 'unlimited'} TPM "
+          f"(shared={'yes' if db_path else 'no'}).")
+
+def _usage_tokens(response):
+    """Returns the total tokens a response reports using, or None if it does not say."""
+    usage = getattr(response, "usage_metadata", None)
+    if usage is None:
+        return None
+    return (getattr(usage, "prompt_token_count", 0) or 0) + (getattr(usage, "candidates_token_count", 0) or 0)
+
+def _send_within_quota(prompt, priority, timeout, send):
+    """Waits for quota, calls send(time_left) and settles the token estimate against actual usage."""
+    if _rate_limiter is None:
+        return send(timeout)
+    started = time.monotonic()
+    estimate = _rate_limiter.acquire(estimate_tokens(prompt), priority, timeout)
+    response = send(timeout - (time.monotonic() - started))
+    _rate_limiter.settle(estimate, _usage_tokens(response))
+    return response
+
+def _serve_stale(cache, cache_key, error):
+    """Returns an expired cached answer while Gemini is unavailable, or re-raises error if there is none."""
+    stale = cache.get_stale(cache_key, _max_stale) if cache is not None and _max_stale else None
+    if stale is None:
+        raise error
+    _GEMINI_STALE.inc()
+    print(f"Gemini unavailable ({error}); serving a stale cached response.")
+    return stale
+
+def get_response_cache():
+    """Returns the configured response cache, or None if caching is disabled."""
+    return _response_cache
+
+def response_cache_key(prompt, structured=False):
+    """
+    Returns the response cache key for prompt.
+
+    Structured (JSON mode) answers are cached separately from plain text
+    answers to the same prompt.
+    """
+    return make_cache_key(prompt, GEMINI_MODEL_NAME + ":json" if structured else GEMINI_MODEL_NAME)
+
+def get_gemini_response(prompt, use_cache=True, refresh=False, priority=PRIORITY_DEFAULT):
     """
     Interacts with the configured Gemini model to get a text response.
 
     Args:
         prompt (str): The text prompt to send to the Gemini model.
+        use_cache (bool): Whether to serve from and populate the response cache.
+        refresh (bool): Regenerate even if a cached answer exists, then replace it.
+            Other callers keep being served the old answer until then.
+        priority (int): Quota priority, one of the rate_limiter.PRIORITY_* constants.
 
     Returns:
         str: The text content of the Gemini model's response.
 
     Raises:
+        UpstreamUnavailableError: If Gemini is unavailable and no stale cached answer exists.
         RuntimeError: If the Gemini model has not been configured.
         Exception: For any other errors during API interaction.
     """
-    if _gemini_model is None:
-        raise RuntimeError("Gemini model not configured. Call configure_gemini() first.")
+    cache = _response_cache if use_cache else None
+    cache_key = response_cache_key(prompt)
+    if cache is not None and not refresh:
+        cached = cache.get(cache_key)
+        if cached is not None:
+            return cached
+
     try:
-        response = _gemini_model.generate_content(prompt)
-        return response.text
+        # Concurrent callers with an identical prompt wait for the first one's result.
+        return _in_flight.do(cache_key, _generate_and_cache, prompt, cache_key, cache, priority)
+    except UpstreamUnavailableError as e:
+        if refresh:
+            raise
+        return _serve_stale(cache, cache_key, e)
+
+def _generate_and_cache(prompt, cache_key, cache, priority=PRIORITY_DEFAULT):
+    """Calls the Gemini model for prompt and stores the text in cache, if given."""
+    text = _call_model(prompt, priority=priority)
+    if cache is not None and text:
+        cache.set(cache_key, text)
+    return text
+
+def _call_model(prompt, generation_config=None, priority=PRIORITY_DEFAULT):
+    """Sends prompt to the Gemini model and returns the response text."""
+    model = _get_model()
+    mode = "json" if generation_config else "text"
+    started = time.perf_counter()
+    try:
+        # Each attempt waits for quota, then gets the time left before the call's deadline.
+        response = _resilience.call(lambda timeout: _send_within_quota(
+            prompt, priority, timeout, lambda time_left: model.generate_content(
+                prompt, generation_config=generation_config, request_options={"timeout": time_left}
+            )
+        ))
+        text = response.text
+        _record_call(mode, started, response)
+        return text
+    except UpstreamUnavailableError as e:
+        _record_call(mode, started, error=True)
+        print(f"Gemini unavailable for prompt: '{prompt[:100]}...'. Error: {e}")
+        raise
     except Exception as e:
+        _record_call(mode, started, error=True)
         # Log the specific error for debugging.
         print(f"Error calling Gemini API with prompt: '{prompt[:100]}...'. Error: {e}")
         # Re-raise or return a specific error indication as per error handling strategy.
         raise Exception(f"Failed to get response from Gemini API: {e}")
 
+def _record_call(mode, started, response=None, error=False):
+    """Records the latency, outcome and token usage of one Gemini call."""
+    _GEMINI_LATENCY.observe(time.perf_counter() - started, mode)
+    _GEMINI_REQUESTS.inc(mode, "error" if error else "ok")
+    usage = getattr(response, "usage_metadata", None)
+    if usage is not None:
+        _GEMINI_TOKENS.inc("prompt", amount=getattr(usage, "prompt_token_count", 0) or 0)
+        _GEMINI_TOKENS.inc("completion", amount=getattr(usage, "candidates_token_count", 0) or 0)
+
+def get_structured_response(prompt, schema, use_cache=True, max_attempts=2, refresh=False,
+                            priority=PRIORITY_DEFAULT):
+    """
+    Gets a JSON response from Gemini, decoded and coerced to the given schema.
+
+    The model is asked for JSON output. Malformed output goes through a bounded
+    repair pass (see services.structured_output) and the model is re-queried
+    only when repair fails or the result does not fit the schema. Only valid,
+    coerced results are cached, and not those repaired after truncation.
+
+    Args:
+        prompt (str): The text prompt to send to the Gemini model.
+        schema (dict): The expected shape, e.g. structured_output.JOBS_SCHEMA.
+        use_cache (bool): Whether to serve from and populate the response cache.
+        max_attempts (int): Maximum number of generations before giving up.
+        refresh (bool): Regenerate even if a cached answer exists, then replace it.
+        priority (int): Quota priority, one of the rate_limiter.PRIORITY_* constants.
+
+    Returns:
+        The coerced response (a dict for object schemas).
+
+    Raises:
+        StructuredOutputError: If no attempt produced a usable response.
+        UpstreamUnavailableError: If Gemini is unavailable and no stale cached answer exists.
+        RuntimeError: If the Gemini model has not been configured.
+        Exception: For any other errors during API interaction.
+    """
+    cache = _response_cache if use_cache else None
+    cache_key = response_cache_key(prompt, structured=True)
+    if cache is not None and not refresh:
+        cached = cache.get(cache_key)
+        if cached is not None:
+            return json.loads(cached)
+
+    try:
+        # Callers share the canonical JSON text and decode their own copy.
+        text = _in_flight.do(
+            cache_key, _generate_structured, prompt, schema, cache_key, cache, max_attempts, priority
+        )
+    except UpstreamUnavailableError as e:
+        if refresh:
+            raise
+        text = _serve_stale(cache, cache_key, e)
+    return json.loads(text)
+
+def _generate_structured(prompt, schema, cache_key, cache, max_attempts, priority=PRIORITY_DEFAULT):
+    """Generates until a response parses against schema. Returns it as canonical JSON text."""
+    last_error = None
+    for attempt in range(1, max_attempts + 1):
+        raw = _call_model(prompt, JSON_GENERATION_CONFIG, priority)
+        try:
+            decoded = decode_json_response(raw)
+            result = coerce(decoded.value, schema)
+        except StructuredOutputError as e:
+            _GEMINI_PARSE_FAILURES.inc()
+            print(f"Structured output attempt {attempt}/{max_attempts} failed: {e}. Raw response: {raw[:200]}")
+            last_error = e
+            continue
+        text = json.dumps(result)
+        _cache_structured(cache, cache_key, text, decoded.truncated)
+        return text
+    raise last_error
+
+def _cache_structured(cache, cache_key, text, truncated):
+    """Caches a coerced response, unless it was cut short and only decoded after repair."""
+    if cache is None:
+        return
+    if truncated:
+        print(f"Not caching truncated structured output: {text[:200]}")
+        return
+    cache.set(cache_key, text)
+
+def stream_gemini_response(prompt, use_cache=True, priority=PRIORITY_DEFAULT):
+    """
+    Streams the Gemini model's response as it is generated.
+
+    A cached response is yielded as a single chunk. Otherwise chunks are yielded
+    as they arrive and the full text is cached once the stream completes.
+    Streams are not coalesced with other in-flight requests or retried, but
+    they respect the circuit breaker and fall back to a stale cached answer if
+    Gemini fails before the first chunk.
+
+    Args:
+        prompt (str): The text prompt to send to the Gemini model.
+        use_cache (bool): Whether to serve from and populate the response cache.
+        priority (int): Quota priority, one of the rate_limiter.PRIORITY_* constants.
+
+    Yields:
+        str: Successive pieces of the response text.
+
+    Raises:
+        UpstreamUnavailableError: If Gemini is unavailable and no stale cached answer exists.
+        RuntimeError: If the Gemini model has not been configured.
+        Exception: For any other errors during API interaction.
+    """
+    cache = _response_cache if use_cache else None
+    cache_key = response_cache_key(prompt)
+    if cache is not None:
+        cached = cache.get(cache_key)
+        if cached is not None:
+            yield cached
+            return
+
+    model = _get_model()
+    breaker = _resilience.breaker
+    estimate = None
+    try:
+        if _rate_limiter is not None:
+            estimate = _rate_limiter.acquire(estimate_tokens(prompt), priority, _resilience.deadline)
+        breaker.before_call()
+    except UpstreamUnavailableError as e:
+        if estimate is not None:
+            _rate_limiter.settle(estimate, 0)
+        yield _serve_stale(cache, cache_key, e)
+        return
+    chunks = []
+    started = time.perf_counter()
+    chunk = None
+    # None if the client went away mid-stream, which says nothing about Gemini's health.
+    failed = None
+    try:
+        stream = model.generate_content(prompt, stream=True, request_options={"timeout": _resilience.deadline})
+        for chunk in stream:
+            text = chunk.text
+            if text:
+                chunks.append(text)
+                yield text
+        # Usage totals arrive with the last chunk.
+        _record_call("stream", started, chunk)
+        failed = False
+    except Exception as e:
+        _record_call("stream", started, error=True)
+        failed = is_transient(e)
+        print(f"Error streaming from Gemini API with prompt: '{prompt[:100]}...'. Error: {e}")
+        if failed and not chunks:
+            yield _serve_stale(cache, cache_key, UpstreamUnavailableError(f"Gemini stream failed: {e}"))
+            return
+        raise Exception(f"Failed to stream response from Gemini API: {e}")
+    finally:
+        if failed is None:
+            breaker.release()
+        elif failed:
+            breaker.record_failure()
+        else:
+            breaker.record_success()
+        if estimate is not None:
+            used = _usage_tokens(chunk) if chunk is not None else None
+            if used is None:
+                # No usage report: count the prompt and whatever was generated before the stream ended.
+                used = estimate_tokens(prompt + "".join(chunks))
+            _rate_limiter.settle(estimate, used)
+
+    if cache is not None and chunks:
+        cache.set(cache_key, "".join(chunks))
+
+def _get_async_loop():
+    """Returns the process-wide Gemini event loop, starting it on first use (and after fork)."""
+    global _async_loop, _async_loop_pid
+    with _async_loop_lock:
+        if _async_loop is None or _async_loop_pid != os.getpid():
+            loop = asyncio.new_event_loop()
+            threading.Thread(target=loop.run_forever, name="gemini-async-loop", daemon=True).start()
+            _async_loop = loop
+            _async_loop_pid = os.getpid()
+        return _async_loop
+
+async def get_gemini_response_async(prompt, use_cache=True, priority=PRIORITY_DEFAULT):
+    """
+    Asynchronous counterpart of get_gemini_response().
+
+    Awaiting this does not hold a thread while Gemini generates, so a single
+    process can keep many LLM calls pending at once. Shares the response cache
+    and in-flight coalescing with the synchronous path.
+
+    Args:
+        prompt (str): The text prompt to send to the Gemini model.
+        use_cache (bool): Whether to serve from and populate the response cache.
+        priority (int): Quota priority, one of the rate_limiter.PRIORITY_* constants.
+
+    Returns:
+        str: The text content of the Gemini model's response.
+
+    Raises:
+        UpstreamUnavailableError: If Gemini is unavailable and no stale cached answer exists.
+        RuntimeError: If the Gemini model has not been configured.
+        Exception: For any other errors during API interaction.
+    """
+    cache = _response_cache if use_cache else None
+    cache_key = response_cache_key(prompt)
+    if cache is not None:
+        cached = cache.get(cache_key)
+        if cached is not None:
+            return cached
+
+    try:
+        return await _in_flight.do_async(cache_key, _generate_and_cache_async, prompt, cache_key, cache, priority)
+    except UpstreamUnavailableError as e:
+        return _serve_stale(cache, cache_key, e)
+
+async def _generate_and_cache_async(prompt, cache_key, cache, priority=PRIORITY_DEFAULT):
+    """Async version of _generate_and_cache()."""
+    text = await _call_model_async(prompt, priority=priority)
+    if cache is not None and text:
+        cache.set(cache_key, text)
+    return text
+
+async def _call_model_async(prompt, generation_config=None, priority=PRIORITY_DEFAULT):
+    """Async version of _call_model(), run against the shared Gemini event loop."""
+    model = _get_model()
+    mode = "json" if generation_config else "text"
+    started = time.perf_counter()
+    loop = _get_async_loop()
+
+    async def attempt(timeout):
+        started_attempt = time.monotonic()
+        estimate = None
+        if _rate_limiter is not None:
+            estimate = await _rate_limiter.acquire_async(estimate_tokens(prompt), priority, timeout)
+        # Cancelling the wrapped future (deadline passed, or a hedge won) cancels the call on the Gemini loop.
+        response = await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(
+            model.generate_content_async(
+                prompt, generation_config=generation_config,
+                request_options={"timeout": timeout - (time.monotonic() - started_attempt)},
+            ),
+            loop,
+        ))
+        if estimate is not None:
+            _rate_limiter.settle(estimate, _usage_tokens(response))
+        return response
+
+    try:
+        response = await _resilience.call_async(attempt)
+        text = response.text
+        _record_call(mode, started, response)
+        return text
+    except UpstreamUnavailableError as e:
+        _record_call(mode, started, error=True)
+        print(f"Gemini unavailable for prompt: '{prompt[:100]}...'. Error: {e}")
+        raise
+    except Exception as e:
+        _record_call(mode, started, error=True)
+        print(f"Error calling Gemini API with prompt: '{prompt[:100]}...'. Error: {e}")
+        raise Exception(f"Failed to get response from Gemini API: {e}")
+
+async def get_structured_response_async(prompt, schema, use_cache=True, max_attempts=2, priority=PRIORITY_DEFAULT):
+    """
+    Asynchronous counterpart of get_structured_response().
+
+    Raises:
+        StructuredOutputError: If no attempt produced a usable response.
+        UpstreamUnavailableError: If Gemini is unavailable and no stale cached answer exists.
+        RuntimeError: If the Gemini model has not been configured.
+        Exception: For any other errors during API interaction.
+    """
+    cache = _response_cache if use_cache else None
+    cache_key = response_cache_key(prompt, structured=True)
+    if cache is not None:
+        cached = cache.get(cache_key)
+        if cached is not None:
+            return json.loads(cached)
+
+    try:
+        text = await _in_flight.do_async(
+            cache_key, _generate_structured_async, prompt, schema, cache_key, cache, max_attempts, priority
+        )
+    except UpstreamUnavailableError as e:
+        text = _serve_stale(cache, cache_key, e)
+    return json.loads(text)
+
+async def _generate_structured_async(prompt, schema, cache_key, cache, max_attempts, priority=PRIORITY_DEFAULT):
+    """Async version of _generate_structured()."""
+    last_error = None
+    for attempt in range(1, max_attempts + 1):
+        raw = await _call_model_async(prompt, JSON_GENERATION_CONFIG, priority)
+        try:
+            decoded = decode_json_response(raw)
+            result = coerce(decoded.value, schema)
+        except StructuredOutputError as e:
+            _GEMINI_PARSE_FAILURES.inc()
+            print(f"Structured output attempt {attempt}/{max_attempts} failed: {e}. Raw response: {raw[:200]}")
+            last_error = e
+            continue
+        text = json.dumps(result)
+        _cache_structured(cache, cache_key, text, decoded.truncated)
+        return text
+    raise last_error
+
+async def get_structured_batch_async(items, build_prompt, build_batch_prompt, schema, use_cache=True,
+                                     batch_size=5, priority=PRIORITY_DEFAULT):
+    """
+    Gets structured responses for several items, asking Gemini about the uncached ones together.
+
+    Every item's answer is cached under the key of its own single-item prompt,
+    build_prompt(item), so batched and single requests share cache entries and
+    return the same answers. Uncached items are sent in groups of up to
+    batch_size with build_batch_prompt(group), whose response must be a JSON
+    object keyed by item. Items missing from that response, or whose answer
+    does not fit schema, are asked for one by one with get_structured_response_async(),
+    as is everything when the batch call fails.
+
+    Args:
+        items (list): Distinct strings, e.g. program names.
+        build_prompt (callable): Returns the single-item prompt for an item.
+        build_batch_prompt (callable): Returns the prompt for a list of items.
+        schema (dict): The expected shape of one item's answer.
+        use_cache (bool): Whether to serve from and populate the response cache.
+        batch_size (int): Maximum items per Gemini call.
+        priority (int): Quota priority, one of the rate_limiter.PRIORITY_* constants.
+
+    Returns:
+        dict: Item to its coerced response.
+
+    Raises:
+        StructuredOutputError: If an item could not be answered in the expected shape.
+        UpstreamUnavailableError: If Gemini is unavailable and an item has no stale cached answer.
+    """
+    cache = _response_cache if use_cache else None
+    results = {}
+    missing = []
+    for item in items:
+        cached = cache.get(response_cache_key(build_prompt(item), structured=True)) if cache is not None else None
+        if cached is not None:
+            results[item] = json.loads(cached)
+            _GEMINI_BATCH_ITEMS.inc("cache")
+        else:
+            missing.append(item)
+
+    groups = [missing[start:start + batch_size] for start in range(0, len(missing), max(1, batch_size))]
+    batches = [group for group in groups if len(group) > 1]
+    answered = await asyncio.gather(*(
+        _get_batch_async(group, build_prompt, build_batch_prompt(group), schema, cache, priority) for group in batches
+    ))
+    for texts in answered:
+        for item, text in texts.items():
+            results[item] = json.loads(text)
+        _GEMINI_BATCH_ITEMS.inc("batch", amount=len(texts))
+
+    # Single-item groups, and whatever the batches did not answer.
+    remaining = [item for item in missing if item not in results]
+    singles = await asyncio.gather(*(
+        get_structured_response_async(build_prompt(item), schema, use_cache, priority=priority) for item in remaining
+    ))
+    results.update(zip(remaining, singles))
+    _GEMINI_BATCH_ITEMS.inc("single", amount=len(remaining))
+    return results
+
+async def _get_batch_async(items, build_prompt, batch_prompt, schema, cache, priority):
+    """Runs one batch call, coalesced with identical in-flight batches. Returns item to JSON text."""
+    try:
+        return await _in_flight.do_async(
+            response_cache_key(batch_prompt, structured=True),
+            _generate_batch_async, items, build_prompt, batch_prompt, schema, cache, priority,
+        )
+    except UpstreamUnavailableError as e:
+        # The single calls fail fast too while the breaker is open, and fall back to stale answers.
+        print(f"Batched Gemini call for {len(items)} items failed: {e}")
+        return {}
+
+async def _generate_batch_async(items, build_prompt, batch_prompt, schema, cache, priority=PRIORITY_DEFAULT):
+    """
+    Sends a batch prompt and splits the keyed response into per-item answers.
+
+    Each usable answer is coerced to schema and cached under its item's
+    single-item key. Returns item to canonical JSON text for those answers.
+    """
+    raw = await _call_model_async(batch_prompt, JSON_GENERATION_CONFIG, priority)
+    try:
+        decoded, truncated = decode_json_response(raw)
+    except StructuredOutputError as e:
+        _GEMINI_PARSE_FAILURES.inc()
+        print(f"Batched structured output failed: {e}. Raw response: {raw[:200]}")
+        return {}
+    if not isinstance(decoded, dict):
+        _GEMINI_PARSE_FAILURES.inc()
+        print(f"Batched structured output was not keyed by item. Raw response: {raw[:200]}")
+        return {}
+    # The model sometimes changes the case or spacing of the keys.
+    normalized = {str(key).strip().lower(): value for key, value in decoded.items()}
+    texts = {}
+    for item in items:
+        value = decoded.get(item)
+        if value is None:
+            value = normalized.get(item.strip().lower())
+        if value is None:
+            print(f"Batched structured output has no answer for '{item}'.")
+            continue
+        try:
+            result = coerce(value, schema)
+        except StructuredOutputError as e:
+            print(f"Batched structured output for '{item}' is unusable: {e}")
+            continue
+        text = json.dumps(result)
+        _cache_structured(cache, response_cache_key(build_prompt(item), structured=True), text, truncated)
+        texts[item] = text
+    return texts
+
+def get_gemini_stats():
+    """
+    Returns counters describing how Gemini requests were served.
+
+    Includes response cache hits/misses (when caching is enabled), the
+    number of upstream calls executed versus merged into an in-flight call,
+    the call policy with the circuit breaker's state, quota usage, and
+    whether this process has created its model client yet.
+    """
+    initialized = _gemini_model is not None and _gemini_model_pid == os.getpid()
+    return {
+        "client": {
+            "backend": _gemini_settings['backend'] if _gemini_settings else None,
+            "initialized": initialized,
+            "init_seconds": round(_gemini_model_init_seconds, 3) if initialized else None,
+        },
+        "cache": _response_cache.stats() if _response_cache is not None else None,
+        "single_flight": _in_flight.stats(),
+        "resilience": _resilience.stats(),
+        "rate_limit": _rate_limiter.stats() if _rate_limiter is not None else None,
+    }
@@ -0,0 +1,156 @@
+# services/prompts.py
+
+# Prompt builders shared by the routes and the cache warmup job. The response
+# cache is keyed on the prompt text, so anything that wants to hit the same
+# cache entries as the routes must build its prompts here.
+
+
+def build_recommendations_prompt(program):
+    """Prompt for /get_recommendations: structured job opportunities for a degree."""
+    # Construct a detailed prompt for the Gemini API to ensure structured JSON output.
+    return f"""
+        Provide a structured JSON response with career opportunities for a degree in {program}.
+        The JSON must have this format:
+        {{
+        "jobs": [
+            {{
+            "title": "Job Title",
+            "description": "Brief job description.",
+            "skills": ["Skill1", "Skill2"],
+            "education": "Required education level",
+            "outlook": "Job market outlook",
+            "salary": "Average salary range"
+            }}
+        ]
+        }}
+        """
+
+
+def build_recommendations_batch_prompt(programs):
+    """
+    Prompt for /get_recommendations with several programs, answered in one call.
+
+    The answer is keyed by program; each value has the shape asked for by
+    build_recommendations_prompt(), and is cached under that prompt.
+    """
+    listing = "\n".join(f"        - {program}" for program in programs)
+    return f"""
+        Provide a structured JSON response with career opportunities for a degree in each of these programs:
+{listing}
+        The JSON must be an object with one key per program, spelled exactly as listed above, in this format:
+        {{
+        "Program": {{
+            "jobs": [
+                {{
+                "title": "Job Title",
+                "description": "Brief job description.",
+                "skills": ["Skill1", "Skill2"],
+                "education": "Required education level",
+                "outlook": "Job market outlook",
+                "salary": "Average salary range"
+                }}
+            ]
+        }}
+        }}
+        Answer for each program as if it were the only one asked about.
+        """
+
+
+def build_career_guidance_prompt(program):
+    """Prompt for /career_guidance: skills, career paths, certifications and trends."""
+    # Craft a detailed prompt for Gemini to generate career guidance in the expected format
+    return f"""
+        You are a professional career advisor. Provide comprehensive career guidance for someone studying {program}.
+        
+        Return the response as valid JSON with this EXACT structure:
+        {{
+            "keySkills": [
+                "Skill 1",
+                "Skill 2",
+                "Skill 3",
+                "Skill 4",
+                "Skill 5"
+            ],
+            "careerPaths": [
+                "Career Path 1",
+                "Career Path 2", 
+                "Career Path 3",
+                "Career Path 4",
+                "Career Path 5"
+            ],
+            "certifications": [
+                "Certification 1",
+                "Certification 2",
+                "Certification 3",
+                "Certification 4"
+            ],
+            "industryTrends": [
+                "Industry Trend 1",
+                "Industry Trend 2",
+                "Industry Trend 3",
+                "Industry Trend 4"
+            ]
+        }}
+        
+        Requirements:
+        - Provide 5-8 key skills that are essential for this field
+        - List 5-7 realistic career paths/job titles
+        - Include 4-6 relevant certifications or qualifications
+        - Describe 4-5 current industry trends affecting this field
+        - All entries should be concise but informative (1-2 sentences max)
+        - Return ONLY valid JSON, no additional text or markdown
+        """
+
+
+def build_career_guidance_batch_prompt(programs):
+    """
+    Prompt for /career_guidance with several programs, answered in one call.
+
+    The answer is keyed by program; each value has the shape asked for by
+    build_career_guidance_prompt(), and is cached under that prompt.
+    """
+    listing = "\n".join(f"        - {program}" for program in programs)
+    return f"""
+        You are a professional career advisor. Provide comprehensive career guidance for someone studying each of these programs:
+{listing}
+
+        Return the response as valid JSON: an object with one key per program, spelled exactly as listed above,
+        each with this EXACT structure:
+        {{
+            "Program": {{
+                "keySkills": ["Skill 1", "Skill 2", "Skill 3", "Skill 4", "Skill 5"],
+                "careerPaths": ["Career Path 1", "Career Path 2", "Career Path 3", "Career Path 4", "Career Path 5"],
+                "certifications": ["Certification 1", "Certification 2", "Certification 3", "Certification 4"],
+                "industryTrends": ["Industry Trend 1", "Industry Trend 2", "Industry Trend 3", "Industry Trend 4"]
+            }}
+        }}
+
+        Requirements, for every program:
+        - Provide 5-8 key skills that are essential for this field
+        - List 5-7 realistic career paths/job titles
+        - Include 4-6 relevant certifications or qualifications
+        - Describe 4-5 current industry trends affecting this field
+        - All entries should be concise but informative (1-2 sentences max)
+        - Answer for each program as if it were the only one asked about
+        - Return ONLY valid JSON, no additional text or markdown
+        """
+
+
+def build_interview_prompt(role):
+    """Prompt for /interview-questions: numbered questions, each followed by a "- Tips:" line."""
+    # Construct a precise prompt for Gemini to guide its response format.
+    return f"""
+        Generate a list of 10 common interview questions for the role of {role}.
+        For each question, provide 3-5 tips on how to answer it effectively.
+        Format the response as follows:
+
+        1. [Question text]
+           - Tips: [Tip 1], [Tip 2], [Tip 3], etc.
+
+        2. [Question text]
+           - Tips: [Tip 1], [Tip 2], [Tip 3], etc.
+
+        ...and so on.
+
+        Make sure each question is clearly numbered and each set of tips is on a separate line starting with "- Tips:".
+        """
@@ -0,0 +1,117 @@
+# services/query_log.py
+import os
+import sqlite3
+import threading
+from collections import Counter
+from datetime import date, timedelta
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS query_counts (
+    day TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    value TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (day, kind, value)
+);
+"""
+
+
+class QueryLog:
+    """
+    Daily counts of the programs and roles users ask about.
+
+    Requests only bump an in-memory counter; the counts are written to a
+    SQLite file shared by all workers when flush() is called (periodically by
+    the cache warmup scheduler, and at exit). The cache warmup job reads
+    yesterday's most frequent queries back from it.
+    """
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._pending = Counter()  # (day, kind, value) -> count
+        self._lock = threading.Lock()
+        # Connections are opened per thread; sqlite3 objects must not cross threads.
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.executescript(_SCHEMA)
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=5)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def record(self, kind, value):
+        """Counts one query, e.g. record('program', 'Nursing'). Blank and non-string values are ignored."""
+        if not isinstance(value, str):
+            return
+        value = value.strip()
+        if not value:
+            return
+        with self._lock:
+            self._pending[(date.today().isoformat(), kind, value)] += 1
+
+    def flush(self):
+        """Adds the pending counts to the database. Returns the number of distinct queries written."""
+        with self._lock:
+            pending, self._pending = self._pending, Counter()
+        if not pending:
+            return 0
+        try:
+            with self._connect() as conn:
+                conn.executemany(
+                    "INSERT INTO query_counts (day, kind, value, count) VALUES (?, ?, ?, ?)"
+                    " ON CONFLICT(day, kind, value) DO UPDATE SET count = count + excluded.count",
+                    [(day, kind, value, count) for (day, kind, value), count in pending.items()],
+                )
+        except sqlite3.Error:
+            # Keep the counts for the next attempt.
+            with self._lock:
+                self._pending.update(pending)
+            raise
+        return len(pending)
+
+    def top(self, kind, limit, day=None):
+        """
+        Returns the most frequent values of a kind on a day, most frequent first.
+
+        Args:
+            kind (str): 'program' or 'role'.
+            limit (int): Maximum number of values returned.
+            day (date, optional): Defaults to yesterday.
+        """
+        day = day or date.today() - timedelta(days=1)
+        rows = self._connect().execute(
+            "SELECT value FROM query_counts WHERE day = ? AND kind = ? ORDER BY count DESC, value LIMIT ?",
+            (day.isoformat(), kind, limit),
+        ).fetchall()
+        return [row[0] for row in rows]
+
+    def purge_before(self, day):
+        """Deletes counts older than day. Returns the number of rows deleted."""
+        with self._connect() as conn:
+            return conn.execute("DELETE FROM query_counts WHERE day < ?", (day.isoformat(),)).rowcount
+
+
+# Module-level query log, set up by configure_query_log(). None disables recording.
+_query_log = None
+
+def configure_query_log(db_path):
+    """Opens the query log at db_path."""
+    global _query_log
+    _query_log = QueryLog(db_path)
+    return _query_log
+
+def get_query_log():
+    """Returns the configured query log, or None if it has not been configured."""
+    return _query_log
+
+def record_query(kind, value):
+    """Counts a query in the configured log; does nothing if no log is configured."""
+    if _query_log is not None:
+        _query_log.record(kind, value)
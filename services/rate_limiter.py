@@ -0,0 +1,277 @@
+# services/rate_limiter.py
+import asyncio
+import os
+import sqlite3
+import threading
+import time
+from collections import Counter
+
+from services.resilience import UpstreamUnavailableError
+from utils import metrics
+
+# Request priorities, most urgent first. Interactive requests (a user waiting on
+# the answer) go ahead of default ones, and both go ahead of background work
+# such as cache refreshes.
+PRIORITY_INTERACTIVE = 0
+PRIORITY_DEFAULT = 1
+PRIORITY_BACKGROUND = 2
+PRIORITY_NAMES = {PRIORITY_INTERACTIVE: "interactive", PRIORITY_DEFAULT: "default", PRIORITY_BACKGROUND: "background"}
+
+# Fraction of each bucket a priority must leave untouched. Lower priorities stop
+# early, so a burst of background work cannot use up the quota interactive
+# requests need, even in another worker process.
+PRIORITY_RESERVES = {PRIORITY_INTERACTIVE: 0.0, PRIORITY_DEFAULT: 0.1, PRIORITY_BACKGROUND: 0.3}
+
+# Longest a waiting caller sleeps before checking the buckets again; other
+# processes may return quota (see settle()) or a more urgent caller may leave.
+_MAX_POLL_INTERVAL = 0.5
+# Poll interval while a more urgent caller in this process is waiting.
+_YIELD_INTERVAL = 0.02
+
+_WAIT_SECONDS = metrics.histogram(
+    "rate_limit_wait_seconds", "Time spent waiting for Gemini quota.", ("priority",)
+)
+_REJECTED = metrics.counter(
+    "rate_limit_rejections_total", "Calls refused because quota would not free up in time.", ("priority",)
+)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS rate_buckets (
+    name TEXT PRIMARY KEY,
+    level REAL NOT NULL,
+    updated REAL NOT NULL
+);
+"""
+
+
+class RateLimitedError(UpstreamUnavailableError):
+    """Raised when quota would not be available before the caller's timeout."""
+
+
+def estimate_tokens(text):
+    """Rough token count of text (about four characters per token), used before the API reports usage."""
+    return max(1, -(-len(text) // 4))
+
+
+class _MemoryBuckets:
+    """Bucket state for a single process."""
+
+    def __init__(self):
+        self._state = {}
+        self._lock = threading.Lock()
+
+    def transact(self, update):
+        """Calls update(state) with {name: (level, updated)} under a lock and returns its result."""
+        with self._lock:
+            return update(self._state)
+
+    def read(self):
+        """Returns a copy of the stored {name: (level, updated)}."""
+        with self._lock:
+            return dict(self._state)
+
+
+class _SQLiteBuckets:
+    """Bucket state in a SQLite file, shared by every worker process on the host."""
+
+    def __init__(self, db_path):
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.db_path = db_path
+        # Connections are opened per thread; sqlite3 objects must not cross threads.
+        self._local = threading.local()
+        self._connect().executescript(_SCHEMA)
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # Autocommit mode; transact() manages its own transactions.
+            conn = sqlite3.connect(self.db_path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def transact(self, update):
+        """Calls update(state) inside an exclusive write transaction and stores the new state."""
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            state = {name: (level, updated) for name, level, updated in conn.execute(
+                "SELECT name, level, updated FROM rate_buckets"
+            )}
+            result = update(state)
+            conn.executemany(
+                "INSERT OR REPLACE INTO rate_buckets (name, level, updated) VALUES (?, ?, ?)",
+                [(name, level, updated) for name, (level, updated) in state.items()],
+            )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return result
+
+    def read(self):
+        """Returns the stored {name: (level, updated)} without taking the write lock."""
+        return {name: (level, updated) for name, level, updated in self._connect().execute(
+            "SELECT name, level, updated FROM rate_buckets"
+        )}
+
+
+class RateLimiter:
+    """
+    Token buckets for requests per minute and tokens per minute.
+
+    Each call takes one request and its estimated tokens (prompt plus expected
+    output) from the buckets, which refill continuously at the configured
+    per-minute rates. A call that does not fit waits until it does, or fails
+    with RateLimitedError if that would take longer than its timeout. Once the
+    API reports actual usage, settle() corrects the token bucket.
+
+    Fairness: within a process, a caller waits while a more urgent one is
+    waiting; across processes, lower priorities must leave PRIORITY_RESERVES
+    of each bucket untouched. With a db_path the buckets are shared by all
+    workers on the host, so together they stay within the quota.
+    """
+
+    def __init__(self, requests_per_minute, tokens_per_minute, db_path=None, expected_output_tokens=800):
+        """
+        Args:
+            requests_per_minute (int): Request quota; 0 for no request limit.
+            tokens_per_minute (int): Token quota (input plus output); 0 for no token limit.
+            db_path (str, optional): SQLite file holding the shared bucket state.
+                When omitted, the limits apply to this process only.
+            expected_output_tokens (int): Output tokens assumed per call until usage is known.
+        """
+        self.limits = {"requests": requests_per_minute, "tokens": tokens_per_minute}
+        self.expected_output_tokens = expected_output_tokens
+        self._buckets = _SQLiteBuckets(db_path) if db_path else _MemoryBuckets()
+        self._waiting = Counter()  # priority -> callers waiting in this process
+        self._waiting_lock = threading.Lock()
+        self.granted = 0
+        self.rejected = 0
+
+    def _refill(self, state, now):
+        """Brings every bucket in state up to date and returns {name: level}."""
+        levels = {}
+        for name, capacity in self.limits.items():
+            if not capacity:
+                continue
+            level, updated = state.get(name, (capacity, now))
+            levels[name] = min(capacity, level + max(0.0, now - updated) * capacity / 60.0)
+            state[name] = (levels[name], now)
+        return levels
+
+    def _try_take(self, cost, priority):
+        """Takes cost from the buckets if it fits. Returns 0, or the seconds until it could fit."""
+        def update(state):
+            now = time.time()
+            levels = self._refill(state, now)
+            wait = 0.0
+            for name, level in levels.items():
+                capacity = self.limits[name]
+                # A call that cannot fit beside its priority's reserve waits for a full
+                # bucket rather than forever.
+                needed = min(cost[name] + PRIORITY_RESERVES[priority] * capacity, capacity)
+                if level < needed:
+                    wait = max(wait, (needed - level) * 60.0 / capacity)
+            if wait == 0.0:
+                for name, level in levels.items():
+                    state[name] = (level - cost[name], now)
+            return wait
+        return self._buckets.transact(update)
+
+    def _outranked(self, priority):
+        with self._waiting_lock:
+            return any(count for waiting, count in self._waiting.items() if waiting < priority)
+
+    def _set_waiting(self, priority, delta):
+        with self._waiting_lock:
+            self._waiting[priority] += delta
+
+    def _cost(self, prompt_tokens):
+        return {"requests": 1, "tokens": prompt_tokens + self.expected_output_tokens}
+
+    def _next_delay(self, cost, priority, started, deadline):
+        """Returns None once quota is taken, else how long to sleep. Raises RateLimitedError past the deadline."""
+        wait = _YIELD_INTERVAL if self._outranked(priority) else self._try_take(cost, priority)
+        now = time.monotonic()
+        if wait == 0.0:
+            self.granted += 1
+            _WAIT_SECONDS.observe(now - started, PRIORITY_NAMES[priority])
+            return None
+        if deadline is not None and now + wait > deadline:
+            self.rejected += 1
+            _REJECTED.inc(PRIORITY_NAMES[priority])
+            raise RateLimitedError("Gemini quota exhausted; try again shortly.", retry_after=wait)
+        return min(wait, _MAX_POLL_INTERVAL)
+
+    def acquire(self, prompt_tokens, priority=PRIORITY_DEFAULT, timeout=None):
+        """
+        Blocks until a call with prompt_tokens input tokens fits in the quota, then takes it.
+
+        Args:
+            prompt_tokens (int): Estimated input tokens (see estimate_tokens()).
+            priority (int): One of the PRIORITY_* constants.
+            timeout (float, optional): Maximum seconds to wait.
+
+        Returns:
+            int: The tokens taken, to pass to settle() once actual usage is known.
+
+        Raises:
+            RateLimitedError: If the quota will not allow the call within timeout.
+        """
+        cost = self._cost(prompt_tokens)
+        started = time.monotonic()
+        deadline = None if timeout is None else started + timeout
+        self._set_waiting(priority, 1)
+        try:
+            while True:
+                delay = self._next_delay(cost, priority, started, deadline)
+                if delay is None:
+                    return cost["tokens"]
+                time.sleep(delay)
+        finally:
+            self._set_waiting(priority, -1)
+
+    async def acquire_async(self, prompt_tokens, priority=PRIORITY_DEFAULT, timeout=None):
+        """Asynchronous counterpart of acquire(); waits without holding a thread."""
+        cost = self._cost(prompt_tokens)
+        started = time.monotonic()
+        deadline = None if timeout is None else started + timeout
+        self._set_waiting(priority, 1)
+        try:
+            while True:
+                delay = self._next_delay(cost, priority, started, deadline)
+                if delay is None:
+                    return cost["tokens"]
+                await asyncio.sleep(delay)
+        finally:
+            self._set_waiting(priority, -1)
+
+    def settle(self, estimated_tokens, actual_tokens):
+        """Corrects the token bucket once a call's actual usage is known (refunds over-estimates)."""
+        if not self.limits["tokens"] or actual_tokens is None:
+            return
+
+        def update(state):
+            levels = self._refill(state, time.time())
+            level, updated = state["tokens"]
+            state["tokens"] = (min(self.limits["tokens"], level + estimated_tokens - actual_tokens), updated)
+            return levels
+        self._buckets.transact(update)
+
+    def stats(self):
+        """Returns the limits, current bucket levels and grant/reject counts of this process."""
+        # A plain read: /health must not contend for the write lock with callers taking quota.
+        levels = self._refill(self._buckets.read(), time.time())
+        with self._waiting_lock:
+            waiting = {PRIORITY_NAMES[p]: count for p, count in self._waiting.items() if count}
+        return {
+            "requests_per_minute": self.limits["requests"],
+            "tokens_per_minute": self.limits["tokens"],
+            "available": {name: round(level, 1) for name, level in levels.items()},
+            "waiting": waiting,
+            "granted": self.granted,
+            "rejected": self.rejected,
+        }
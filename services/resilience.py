@@ -0,0 +1,353 @@
+# services/resilience.py
+import asyncio
+import os
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from utils import metrics
+
+# HTTP status codes (as carried by google.api_core exceptions in .code) worth retrying.
+TRANSIENT_STATUS_CODES = {408, 429, 500, 502, 503, 504}
+# Exception class names treated as transient, so the SDK need not be imported here.
+_TRANSIENT_ERROR_NAMES = {
+    "ServiceUnavailable", "DeadlineExceeded", "TooManyRequests", "ResourceExhausted",
+    "InternalServerError", "BadGateway", "GatewayTimeout", "RetryError",
+}
+
+_RETRIES = metrics.counter("upstream_retries_total", "Retried upstream calls.", ("upstream",))
+_HEDGES = metrics.counter("upstream_hedged_requests_total", "Hedged upstream requests, by which request won.", ("upstream", "winner"))
+_DEADLINES = metrics.counter("upstream_deadline_exceeded_total", "Upstream calls that ran out of time.", ("upstream",))
+_BREAKER_TRANSITIONS = metrics.counter(
+    "upstream_circuit_transitions_total", "Circuit breaker state changes.", ("upstream", "state")
+)
+
+
+class UpstreamUnavailableError(Exception):
+    """Raised when an upstream call fails after retries, runs out of time, or is refused by the breaker."""
+
+    def __init__(self, message, retry_after=None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class CircuitOpenError(UpstreamUnavailableError):
+    """Raised without calling upstream while the circuit breaker is open."""
+
+
+class DeadlineExceededError(UpstreamUnavailableError):
+    """Raised when a call's deadline passes before any attempt succeeds."""
+
+
+def is_transient(error):
+    """True for errors that may succeed on retry: timeouts, connection errors, 429 and 5xx."""
+    if isinstance(error, (TimeoutError, ConnectionError)):
+        return True
+    code = getattr(error, "code", None)
+    if isinstance(code, int) and code in TRANSIENT_STATUS_CODES:
+        return True
+    return type(error).__name__ in _TRANSIENT_ERROR_NAMES
+
+
+class CircuitBreaker:
+    """
+    Stops calling an upstream after repeated transient failures.
+
+    closed    - calls go through; failure_threshold consecutive failures open the circuit.
+    open      - calls fail immediately with CircuitOpenError for recovery_time seconds.
+    half_open - a single probe call is let through; success closes the circuit,
+                failure opens it again.
+
+    State is per process; every gunicorn worker has its own breaker.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, name, failure_threshold=5, recovery_time=30.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.recovery_time = recovery_time
+        self.state = self.CLOSED
+        self._failures = 0
+        self._opened_at = None
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+        self.times_opened = 0
+
+    def _set_state(self, state):
+        if state != self.state:
+            self.state = state
+            _BREAKER_TRANSITIONS.inc(self.name, state)
+
+    def before_call(self):
+        """Raises CircuitOpenError unless a call may go through now."""
+        with self._lock:
+            if self.state == self.OPEN and time.monotonic() >= self._opened_at + self.recovery_time:
+                self._set_state(self.HALF_OPEN)
+                self._probe_in_flight = False
+            if self.state == self.CLOSED:
+                return
+            if self.state == self.HALF_OPEN and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return
+            retry_after = self.recovery_time if self.state == self.HALF_OPEN else max(
+                0.0, self._opened_at + self.recovery_time - time.monotonic()
+            )
+        raise CircuitOpenError(f"{self.name} circuit breaker is open.", retry_after=retry_after)
+
+    def release(self):
+        """Ends a call that was refused before reaching upstream, without recording an outcome."""
+        with self._lock:
+            self._probe_in_flight = False
+
+    def record_success(self):
+        """Records a call that reached upstream and got an answer (even an error answer)."""
+        with self._lock:
+            self._failures = 0
+            self._probe_in_flight = False
+            self._set_state(self.CLOSED)
+
+    def record_failure(self):
+        """Records a transient failure, opening the circuit when the threshold is reached."""
+        with self._lock:
+            self._failures += 1
+            self._probe_in_flight = False
+            if self.state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    self.times_opened += 1
+                self._opened_at = time.monotonic()
+                self._set_state(self.OPEN)
+
+    def stats(self):
+        return {"state": self.state, "consecutive_failures": self._failures, "times_opened": self.times_opened}
+
+
+class RetryPolicy:
+    """Exponential backoff with full jitter: attempt n waits uniform(0, min(max_delay, base_delay * 2**(n-1)))."""
+
+    def __init__(self, max_attempts=3, base_delay=0.5, max_delay=4.0):
+        self.max_attempts = max(1, max_attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def backoff(self, attempt):
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+
+
+class LatencyTracker:
+    """Sliding window of recent successful call latencies, for choosing when to hedge."""
+
+    def __init__(self, window=200, min_samples=20):
+        self.min_samples = min_samples
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, seconds):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, fraction):
+        """Returns the latency at fraction (e.g. 0.95) of the window, or None until enough samples exist."""
+        with self._lock:
+            if len(self._samples) < self.min_samples:
+                return None
+            ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+class ResilientCaller:
+    """
+    Runs upstream calls with a deadline, retries, optional hedging and a circuit breaker.
+
+    - Every call has an overall deadline; each attempt is given the time left
+      and the caller stops waiting when it runs out, even if the upstream
+      client ignores its timeout.
+    - Transient failures are retried with exponential backoff and jitter while
+      time remains. Other errors are raised immediately.
+    - With hedging enabled, an attempt still running after the hedge
+      percentile of recent latencies gets a second, concurrent request; the
+      first to succeed wins and the other is cancelled.
+    - The breaker refuses calls while open, so a degraded upstream fails fast
+      instead of tying up every request thread.
+
+    Attempts are functions taking the remaining timeout in seconds. call()
+    expects a blocking function; call_async() a function returning an awaitable.
+    """
+
+    def __init__(self, name, deadline=20.0, retry=None, breaker=None, hedge_percentile=None,
+                 hedge_min_delay=1.0, max_threads=64):
+        """
+        Args:
+            name (str): Upstream name, used in metrics and error messages.
+            deadline (float): Seconds allowed for a call, across all attempts.
+            retry (RetryPolicy, optional): Defaults to RetryPolicy().
+            breaker (CircuitBreaker, optional): Defaults to CircuitBreaker(name).
+            hedge_percentile (float, optional): Hedge attempts slower than this latency
+                percentile (e.g. 0.95). None disables hedging.
+            hedge_min_delay (float): Never hedge earlier than this many seconds.
+            max_threads (int): Threads running blocking attempts for call().
+        """
+        self.name = name
+        self.deadline = deadline
+        self.retry = retry or RetryPolicy()
+        self.breaker = breaker or CircuitBreaker(name)
+        self.hedge_percentile = hedge_percentile
+        self.hedge_min_delay = hedge_min_delay
+        self.latency = LatencyTracker()
+        self.max_threads = max_threads
+        self._executor = None
+        self._executor_pid = None
+        self._executor_lock = threading.Lock()
+
+    def _get_executor(self):
+        # Created lazily, and again after a fork: a forked child has none of its parent's threads.
+        with self._executor_lock:
+            if self._executor is None or self._executor_pid != os.getpid():
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.max_threads, thread_name_prefix=f"{self.name}-call"
+                )
+                self._executor_pid = os.getpid()
+            return self._executor
+
+    def _hedge_delay(self, remaining):
+        if self.hedge_percentile is None:
+            return None
+        threshold = self.latency.percentile(self.hedge_percentile)
+        if threshold is None:
+            return None
+        delay = max(threshold, self.hedge_min_delay)
+        return delay if delay < remaining else None
+
+    def _after_failure(self, error, attempt, deadline):
+        """Records a failed attempt. Returns the backoff delay, or raises if the call should give up."""
+        if isinstance(error, UpstreamUnavailableError) and not isinstance(error, DeadlineExceededError):
+            # Refused locally (e.g. by a rate limiter) before reaching upstream; nothing to record.
+            self.breaker.release()
+            raise error
+        if not is_transient(error):
+            # Upstream answered; it is up, the request itself was bad.
+            self.breaker.record_success()
+            raise error
+        self.breaker.record_failure()
+        if isinstance(error, DeadlineExceededError):
+            _DEADLINES.inc(self.name)
+            raise error
+        delay = self.retry.backoff(attempt)
+        if attempt >= self.retry.max_attempts or time.monotonic() + delay >= deadline:
+            raise UpstreamUnavailableError(f"{self.name} call failed after {attempt} attempt(s): {error}") from error
+        _RETRIES.inc(self.name)
+        return delay
+
+    def _deadline_error(self):
+        return DeadlineExceededError(f"{self.name} call exceeded its {self.deadline}s deadline.")
+
+    def call(self, attempt_fn):
+        """Runs attempt_fn(timeout) under the policies and returns its result."""
+        self.breaker.before_call()
+        deadline = time.monotonic() + self.deadline
+        attempt = 0
+        while True:
+            attempt += 1
+            started = time.monotonic()
+            try:
+                result = self._attempt(attempt_fn, deadline)
+            except Exception as e:
+                time.sleep(self._after_failure(e, attempt, deadline))
+                self.breaker.before_call()
+                continue
+            self.latency.record(time.monotonic() - started)
+            self.breaker.record_success()
+            return result
+
+    def _attempt(self, attempt_fn, deadline):
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise self._deadline_error()
+        executor = self._get_executor()
+        primary = executor.submit(attempt_fn, remaining)
+        pending = {primary}
+        hedged = False
+        hedge_delay = self._hedge_delay(remaining)
+        if hedge_delay is not None and not wait(pending, timeout=hedge_delay).done:
+            pending.add(executor.submit(attempt_fn, deadline - time.monotonic()))
+            hedged = True
+        error = None
+        while pending:
+            done, pending = wait(pending, timeout=max(0.0, deadline - time.monotonic()), return_when=FIRST_COMPLETED)
+            if not done:
+                # Threads cannot be interrupted; an abandoned attempt finishes in the background.
+                for future in pending:
+                    future.cancel()
+                raise self._deadline_error()
+            for future in done:
+                if future.exception() is None:
+                    for other in pending:
+                        other.cancel()
+                    if hedged:
+                        _HEDGES.inc(self.name, "primary" if future is primary else "hedge")
+                    return future.result()
+                error = future.exception()
+        raise error
+
+    async def call_async(self, attempt_fn):
+        """Async counterpart of call(); attempt_fn(timeout) returns an awaitable."""
+        self.breaker.before_call()
+        deadline = time.monotonic() + self.deadline
+        attempt = 0
+        while True:
+            attempt += 1
+            started = time.monotonic()
+            try:
+                result = await self._attempt_async(attempt_fn, deadline)
+            except Exception as e:
+                await asyncio.sleep(self._after_failure(e, attempt, deadline))
+                self.breaker.before_call()
+                continue
+            self.latency.record(time.monotonic() - started)
+            self.breaker.record_success()
+            return result
+
+    async def _attempt_async(self, attempt_fn, deadline):
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise self._deadline_error()
+        primary = asyncio.ensure_future(attempt_fn(remaining))
+        pending = {primary}
+        hedged = False
+        hedge_delay = self._hedge_delay(remaining)
+        if hedge_delay is not None:
+            done, _ = await asyncio.wait(pending, timeout=hedge_delay)
+            if not done:
+                pending.add(asyncio.ensure_future(attempt_fn(deadline - time.monotonic())))
+                hedged = True
+        error = None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(
+                    pending, timeout=max(0.0, deadline - time.monotonic()), return_when=asyncio.FIRST_COMPLETED
+                )
+                if not done:
+                    raise self._deadline_error()
+                for task in done:
+                    if task.exception() is None:
+                        if hedged:
+                            _HEDGES.inc(self.name, "primary" if task is primary else "hedge")
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+
+    def stats(self):
+        return {
+            "deadline_seconds": self.deadline,
+            "max_attempts": self.retry.max_attempts,
+            "hedging": self.hedge_percentile is not None,
+            "hedge_after_seconds": self._hedge_delay(float("inf")),
+            "breaker": self.breaker.stats(),
+        }
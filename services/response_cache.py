@@ -0,0 +1,266 @@
+# services/response_cache.py
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+# Collapses runs of whitespace so that prompts differing only in indentation
+# (our prompts are indented f-strings) share a cache entry.
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def normalize_prompt(prompt):
+    """Returns the prompt with surrounding whitespace removed and inner runs collapsed."""
+    return _WHITESPACE_RE.sub(" ", prompt).strip()
+
+
+def make_cache_key(prompt, model_name):
+    """
+    Builds a stable cache key from the normalized prompt and the model name.
+
+    Args:
+        prompt (str): The raw prompt sent to the model.
+        model_name (str): The name of the model that answers the prompt.
+
+    Returns:
+        str: A hex SHA-256 digest identifying the (model, prompt) pair.
+    """
+    digest = hashlib.sha256()
+    digest.update(model_name.encode("utf-8"))
+    digest.update(b"\x00")
+    digest.update(normalize_prompt(prompt).encode("utf-8"))
+    return digest.hexdigest()
+
+
+class LRUCache:
+    """
+    Bounded in-process cache with per-entry TTL and least-recently-used eviction.
+
+    Safe to share between request threads of a single worker.
+    """
+
+    def __init__(self, max_entries=512, ttl=3600):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Returns the cached value for key, or None if it is missing or expired."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at <= time.time():
+                # Expired entries stay until evicted, so get_stale() can still serve them.
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def get_stale(self, key, max_stale):
+        """Returns the value for key even if it expired less than max_stale seconds ago, or None."""
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is None or entry[0] + max_stale <= time.time():
+            return None
+        return entry[1]
+
+    def get_entry(self, key):
+        """Returns (value, expires_at) for a live entry without touching its recency, or None."""
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is None or entry[0] <= time.time():
+            return None
+        return entry[1], entry[0]
+
+    def set(self, key, value, ttl=None):
+        """Stores value under key, evicting the least recently used entries if full."""
+        expires_at = time.time() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class SQLiteCache:
+    """
+    Shared cache tier backed by a local SQLite file.
+
+    All gunicorn workers on the same host can point at the same file, so an
+    answer fetched by one worker is reused by the others.
+    """
+
+    def __init__(self, db_path, ttl=3600):
+        self.db_path = db_path
+        self.ttl = ttl
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # Connections are opened per thread; sqlite3 objects must not cross threads.
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS response_cache ("
+                " key TEXT PRIMARY KEY,"
+                " value TEXT NOT NULL,"
+                " expires_at REAL NOT NULL)"
+            )
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=5)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key):
+        """Returns the cached value for key, or None if it is missing or expired."""
+        row = self._connect().execute(
+            "SELECT value, expires_at FROM response_cache WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None or row[1] <= time.time():
+            return None
+        return row[0]
+
+    def get_entry(self, key):
+        """Returns (value, expires_at) for a live entry, or None."""
+        row = self._connect().execute(
+            "SELECT value, expires_at FROM response_cache WHERE key = ? AND expires_at > ?", (key, time.time())
+        ).fetchone()
+        return tuple(row) if row is not None else None
+
+    def get_stale(self, key, max_stale):
+        """Returns the value for key even if it expired less than max_stale seconds ago, or None."""
+        row = self._connect().execute(
+            "SELECT value FROM response_cache WHERE key = ? AND expires_at > ?", (key, time.time() - max_stale)
+        ).fetchone()
+        return row[0] if row is not None else None
+
+    def set(self, key, value, ttl=None):
+        expires_at = time.time() + (self.ttl if ttl is None else ttl)
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO response_cache (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, value, expires_at),
+            )
+
+    def delete(self, key):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM response_cache WHERE key = ?", (key,))
+
+    def purge_expired(self, grace=0):
+        """Removes rows expired for more than grace seconds. Returns the number of rows deleted."""
+        with self._connect() as conn:
+            cursor = conn.execute("DELETE FROM response_cache WHERE expires_at <= ?", (time.time() - grace,))
+            return cursor.rowcount
+
+
+class ResponseCache:
+    """
+    Two-tier response cache: a per-process LRU in front of an optional shared tier.
+
+    Lookups try the in-process tier first and fall back to the shared tier,
+    promoting shared hits into the local LRU for the time the shared entry
+    has left. Writes go to both tiers.
+    """
+
+    def __init__(self, local=None, shared=None):
+        self.local = local if local is not None else LRUCache()
+        self.shared = shared
+        self.hits = 0
+        self.misses = 0
+        self._stats_lock = threading.Lock()
+
+    def get(self, key):
+        value = self.local.get(key)
+        if value is None and self.shared is not None:
+            try:
+                entry = self.shared.get_entry(key)
+            except sqlite3.Error as e:
+                print(f"Warning: shared response cache read failed: {e}")
+                entry = None
+            if entry is not None:
+                value, expires_at = entry
+                # Never outlive the shared entry, so a refresh or expiry there is seen here too.
+                self.local.set(key, value, ttl=expires_at - time.time())
+        with self._stats_lock:
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return value
+
+    def get_entry(self, key):
+        """
+        Returns (value, expires_at) for key from whichever tier expires last, or None.
+
+        Used by maintenance jobs (e.g. cache warmup) to inspect remaining
+        lifetimes; it does not count towards the hit/miss statistics.
+        """
+        entries = [self.local.get_entry(key)]
+        if self.shared is not None:
+            try:
+                entries.append(self.shared.get_entry(key))
+            except sqlite3.Error as e:
+                print(f"Warning: shared response cache read failed: {e}")
+        entries = [entry for entry in entries if entry is not None]
+        return max(entries, key=lambda entry: entry[1]) if entries else None
+
+    def get_stale(self, key, max_stale):
+        """
+        Returns a value for key that expired less than max_stale seconds ago, or None.
+
+        Fallback for when the upstream is unavailable; live entries are returned too.
+        Does not count towards the hit/miss statistics.
+        """
+        value = self.local.get_stale(key, max_stale)
+        if value is None and self.shared is not None:
+            try:
+                value = self.shared.get_stale(key, max_stale)
+            except sqlite3.Error as e:
+                print(f"Warning: shared response cache read failed: {e}")
+        return value
+
+    def set(self, key, value, ttl=None):
+        self.local.set(key, value, ttl)
+        if self.shared is not None:
+            try:
+                self.shared.set(key, value, ttl)
+            except sqlite3.Error as e:
+                print(f"Warning: shared response cache write failed: {e}")
+
+    def delete(self, key):
+        self.local.delete(key)
+        if self.shared is not None:
+            try:
+                self.shared.delete(key)
+            except sqlite3.Error as e:
+                print(f"Warning: shared response cache delete failed: {e}")
+
+    def stats(self):
+        """Returns hit/miss counters and the current size of the local tier."""
+        with self._stats_lock:
+            hits, misses = self.hits, self.misses
+        return {
+            "hits": hits,
+            "misses": misses,
+            "local_entries": len(self.local),
+            "shared": self.shared is not None,
+        }
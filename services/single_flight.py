@@ -0,0 +1,116 @@
+# services/single_flight.py
+import asyncio
+import threading
+from concurrent.futures import Future
+
+
+class _Call:
+    """An in-flight call whose outcome is shared by every caller waiting on it."""
+
+    __slots__ = ("future", "waiters")
+
+    def __init__(self):
+        # A thread-safe future, so waiters may block on it or await it from any event loop.
+        self.future = Future()
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls that share a key into a single execution.
+
+    The first caller for a key (the leader) runs the function; callers arriving
+    while it is still running wait for it and receive the same result, or the
+    same exception. Once the call finishes the key is released, so later calls
+    run again (caching finished results is the response cache's job).
+    """
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+        self.executed = 0  # Calls that actually ran the function.
+        self.merged = 0    # Calls that were served by another caller's execution.
+
+    def do(self, key, fn, *args, **kwargs):
+        """
+        Runs fn(*args, **kwargs) unless an identical call is already in flight.
+
+        Args:
+            key (str): Identifies calls that are interchangeable.
+            fn (callable): The function to run on behalf of all callers.
+
+        Returns:
+            The return value of fn.
+
+        Raises:
+            Whatever fn raised, re-raised in every waiting caller.
+        """
+        call, leader = self._join(key)
+        if not leader:
+            return call.future.result()
+
+        try:
+            result = fn(*args, **kwargs)
+        except BaseException as e:
+            self._finish(key, call, error=e)
+            raise
+        self._finish(key, call, result=result)
+        return result
+
+    async def do_async(self, key, coro_fn, *args, **kwargs):
+        """
+        Awaitable counterpart of do() for coroutine functions.
+
+        Callers are coalesced with both sync and async callers of the same key,
+        even when they run on different threads or event loops. Cancelling a
+        waiter only cancels that waiter; the others still get the outcome.
+        """
+        call, leader = self._join(key)
+        if not leader:
+            # Shielded: cancelling the wrapper would otherwise cancel the shared future.
+            return await asyncio.shield(asyncio.wrap_future(call.future))
+
+        try:
+            result = await coro_fn(*args, **kwargs)
+        except BaseException as e:
+            self._finish(key, call, error=e)
+            raise
+        self._finish(key, call, result=result)
+        return result
+
+    def _join(self, key):
+        """Registers a caller for key. Returns (call, is_leader)."""
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                call.waiters += 1
+                self.merged += 1
+                return call, False
+            call = _Call()
+            self._calls[key] = call
+            self.executed += 1
+            return call, True
+
+    def _finish(self, key, call, result=None, error=None):
+        """Releases key and publishes the outcome to every waiter."""
+        with self._lock:
+            self._calls.pop(key, None)
+        if call.future.done():
+            return
+        if error is not None:
+            call.future.set_exception(error)
+        else:
+            call.future.set_result(result)
+
+    def in_flight(self):
+        """Returns the number of distinct keys currently being executed."""
+        with self._lock:
+            return len(self._calls)
+
+    def stats(self):
+        """Returns execution/merge counters for monitoring."""
+        return {
+            "executed": self.executed,
+            "merged": self.merged,
+            "in_flight": self.in_flight(),
+        }
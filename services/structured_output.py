@@ -0,0 +1,242 @@
+# services/structured_output.py
+import json
+import re
+from collections import namedtuple
+
+# Schemas use a small JSON-Schema subset: "object" (with "properties" and
+# "required"), "array" (with "items") and "string". Only declared properties
+# are kept. A required property must be present and non-empty.
+
+_STRING = {"type": "string"}
+_STRING_LIST = {"type": "array", "items": _STRING}
+
+# Schema for /get_recommendations.
+JOBS_SCHEMA = {
+    "type": "object",
+    "required": ["jobs"],
+    "properties": {
+        "jobs": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "required": ["title"],
+                "properties": {
+                    "title": _STRING,
+                    "description": _STRING,
+                    "skills": _STRING_LIST,
+                    "education": _STRING,
+                    "outlook": _STRING,
+                    "salary": _STRING,
+                },
+            },
+        },
+    },
+}
+
+# Schema for /career_guidance.
+CAREER_GUIDANCE_SCHEMA = {
+    "type": "object",
+    "required": ["keySkills"],
+    "properties": {
+        "keySkills": _STRING_LIST,
+        "careerPaths": _STRING_LIST,
+        "certifications": _STRING_LIST,
+        "industryTrends": _STRING_LIST,
+    },
+}
+
+# Markdown code fences the model sometimes wraps JSON in, even in JSON mode.
+_FENCE_START = re.compile(r"^\s*```[a-zA-Z]*\s*")
+_FENCE_END = re.compile(r"\s*```\s*$")
+_TRAILING_COMMA = re.compile(r",\s*([}\]])")
+_DANGLING_KEY = re.compile(r'(,\s*"[^"]*"\s*:\s*|,\s*|:\s*)$')
+_DANGLING_STRING = re.compile(r'(?<=[{,])\s*"[^"]*"$')
+
+
+# value: the decoded JSON; truncated: whether it only decoded after closing
+# brackets left open by truncated output, so trailing content may be missing.
+DecodedJSON = namedtuple("DecodedJSON", ["value", "truncated"])
+
+
+class StructuredOutputError(ValueError):
+    """Raised when a model response cannot be decoded or coerced to the expected schema."""
+
+
+class EmptyOutputError(StructuredOutputError):
+    """Raised when a response decodes but leaves a required property, or every property, empty."""
+
+
+def strip_code_fences(text):
+    """Removes a surrounding markdown code fence (``` or ```json) from text."""
+    return _FENCE_END.sub("", _FENCE_START.sub("", text)).strip()
+
+
+def _close_truncated_json(text, drop_dangling_string=False):
+    """
+    Closes any string, array or object left open by truncated output.
+
+    A dangling key with its colon, or a trailing comma, at the cut-off point is
+    dropped first. With drop_dangling_string, a last string that may be an
+    object key without its colon is dropped as well.
+    """
+    stack = []
+    in_string = False
+    escaped = False
+    for char in text:
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == "\\":
+                escaped = True
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = True
+        elif char in "{[":
+            stack.append("}" if char == "{" else "]")
+        elif char in "}]" and stack:
+            stack.pop()
+    if in_string:
+        text += '"'
+    text = text.rstrip()
+    if drop_dangling_string:
+        text = _DANGLING_STRING.sub("", text)
+    # Drop a trailing comma, or a key whose value was never written.
+    text = _DANGLING_KEY.sub("", text)
+    return text + "".join(reversed(stack))
+
+
+def decode_json(text):
+    """
+    Decodes a model response as JSON, applying a bounded set of repairs if needed.
+
+    Repairs are tried once each, in order: stripping code fences, trimming any
+    prose around the outermost JSON value, removing trailing commas, and
+    closing brackets left open by truncated output.
+
+    Raises:
+        StructuredOutputError: If the text is still not valid JSON after repair.
+    """
+    return decode_json_response(text).value
+
+
+def decode_json_response(text):
+    """
+    Like decode_json(), but also reports whether the truncation repair was needed.
+
+    Returns:
+        DecodedJSON: The decoded value and its truncated flag.
+
+    Raises:
+        StructuredOutputError: If the text is still not valid JSON after repair.
+    """
+    candidate = strip_code_fences(text)
+    try:
+        return DecodedJSON(json.loads(candidate), False)
+    except json.JSONDecodeError as e:
+        first_error = e
+
+    starts = [i for i in (candidate.find("{"), candidate.find("[")) if i != -1]
+    if starts:
+        candidate = candidate[min(starts):]
+    end = max(candidate.rfind("}"), candidate.rfind("]"))
+    trimmed = candidate[:end + 1] if end != -1 else candidate
+    without_trailing_commas = _TRAILING_COMMA.sub(r"\1", candidate)
+    for repaired, truncated in (
+        (trimmed, False),
+        (_TRAILING_COMMA.sub(r"\1", trimmed), False),
+        (_close_truncated_json(without_trailing_commas), True),
+        (_close_truncated_json(without_trailing_commas, drop_dangling_string=True), True),
+    ):
+        try:
+            return DecodedJSON(json.loads(repaired), truncated)
+        except json.JSONDecodeError:
+            continue
+    raise StructuredOutputError(f"Response is not valid JSON: {first_error}")
+
+
+def coerce(value, schema, path="$"):
+    """
+    Validates value against schema, coercing near-misses into the expected shape.
+
+    - Missing object properties get an empty default; undeclared ones are dropped.
+    - An object with a required property left empty, or with every property
+      empty, is rejected ({} or {"error": ...} is not an answer).
+    - A bare list is accepted for an object with a single array property.
+    - A single item is wrapped in a list where an array is expected; invalid items are dropped.
+    - Numbers and booleans become strings; string lists are joined where a string is expected.
+
+    Raises:
+        EmptyOutputError: If a required property, or every property, is left empty.
+        StructuredOutputError: If value cannot be coerced otherwise.
+    """
+    expected = schema["type"]
+    if expected == "object":
+        properties = schema.get("properties", {})
+        if isinstance(value, list):
+            array_properties = [name for name, spec in properties.items() if spec["type"] == "array"]
+            if len(array_properties) == 1:
+                value = {array_properties[0]: value}
+        if not isinstance(value, dict):
+            raise StructuredOutputError(f"{path}: expected an object, got {type(value).__name__}")
+        result = {
+            name: coerce(value[name], spec, f"{path}.{name}") if value.get(name) is not None else _default(spec)
+            for name, spec in properties.items()
+        }
+        for name in schema.get("required", ()):
+            if _is_empty(result[name]):
+                raise EmptyOutputError(f"{path}.{name}: required but missing or empty")
+        if properties and all(_is_empty(item) for item in result.values()):
+            raise EmptyOutputError(f"{path}: none of the expected properties are set")
+        return result
+
+    if expected == "array":
+        if value is None:
+            return []
+        if not isinstance(value, list):
+            value = [value]
+        items = []
+        for index, item in enumerate(value):
+            try:
+                items.append(coerce(item, schema["items"], f"{path}[{index}]"))
+            except StructuredOutputError as e:
+                print(f"Warning: dropping invalid item: {e}")
+        return items
+
+    if expected == "string":
+        if isinstance(value, str):
+            return value.strip()
+        if isinstance(value, (int, float, bool)):
+            return str(value)
+        if isinstance(value, list) and all(isinstance(item, str) for item in value):
+            return ", ".join(item.strip() for item in value)
+        raise StructuredOutputError(f"{path}: expected a string, got {type(value).__name__}")
+
+    raise ValueError(f"Unsupported schema type: {expected}")
+
+
+def _default(schema):
+    if schema["type"] == "object":
+        return {name: _default(spec) for name, spec in schema.get("properties", {}).items()}
+    if schema["type"] == "array":
+        return []
+    return ""
+
+
+def _is_empty(value):
+    if isinstance(value, dict):
+        return all(_is_empty(item) for item in value.values())
+    return value in ("", [])
+
+
+def parse_structured(text, schema):
+    """
+    Decodes and coerces a model response in one step.
+
+    Returns:
+        The coerced value (a dict for object schemas).
+
+    Raises:
+        StructuredOutputError: If the response cannot be repaired or coerced.
+    """
+    return coerce(decode_json(text), schema)
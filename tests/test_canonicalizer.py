@@ -0,0 +1,151 @@
+# tests/test_canonicalizer.py
+import json
+
+import pytest
+
+from services import canonicalizer
+from services.canonicalizer import (
+    PROGRAM_ALIASES, ROLE_ALIASES, CanonicalIndex, canonicalize, configure_canonicalizer, normalize,
+)
+
+
+def curated(kind, **options):
+    index = CanonicalIndex(kind, **options)
+    for canonical, aliases in (PROGRAM_ALIASES if kind == 'program' else ROLE_ALIASES).items():
+        index.add(canonical, aliases)
+    return index
+
+
+@pytest.fixture
+def programs():
+    return curated('program')
+
+
+@pytest.fixture
+def roles():
+    return curated('role')
+
+
+def test_normalize_drops_formatting_degrees_and_abbreviations():
+    assert normalize('program', "B.Sc. (Hons) in Computer Sci") == "computer science"
+    assert normalize('program', "  computer   SCIENCE ") == "computer science"
+    assert normalize('program', "Bachelor's degree in Économie") == "economie"
+    assert normalize('role', "Sr. Software Eng") == "senior software engineer"
+    assert normalize('program', "Degree") == "degree"  # A bare prefix is kept rather than emptied.
+
+
+@pytest.mark.parametrize("value, canonical", [
+    ("B.Sc Computer Sci", "Computer Science"),
+    ("computer science ", "Computer Science"),
+    ("CS", "Computer Science"),
+    ("Bachelor of Science in Nursing", "Nursing"),
+])
+def test_known_names_and_aliases_match_exactly(programs, value, canonical):
+    assert programs.lookup(value) == (canonical, 1.0, 'exact')
+
+
+@pytest.mark.parametrize("value, canonical", [
+    ("Computr Science", "Computer Science"),
+    ("Mechanical Enginering", "Mechanical Engineering"),
+    ("Mathematic", "Mathematics"),
+])
+def test_typos_match_fuzzily(programs, value, canonical):
+    match = programs.lookup(value)
+    assert (match.canonical, match.source) == (canonical, 'fuzzy')
+    assert programs.threshold <= match.score < 1
+
+
+def test_fuzzy_matches_need_the_same_number_of_words(roles):
+    assert roles.lookup("Data Scientst").canonical == "Data Scientist"
+    assert roles.lookup("Senior Data Scientist") == ("Senior Data Scientist", 0.0, 'unknown')
+
+
+def test_unknown_inputs_keep_their_spelling(roles):
+    assert roles.lookup("iOS   Developer") == ("iOS Developer", 0.0, 'unknown')
+    assert roles.lookup("HR") == ("HR", 0.0, 'unknown')
+
+
+def test_unknown_input_is_learned_after_enough_sightings(roles):
+    for spelling in ("Prompt Engineer", "prompt engineer", "Prompt  Engineer"):
+        assert roles.lookup(spelling).source == 'unknown'
+    # Learned in the spelling of its latest sighting, with whitespace collapsed.
+    assert roles.lookup("PROMPT ENGINEER") == ("Prompt Engineer", 1.0, 'exact')
+    assert roles.lookup("Prompt Enginer").canonical == "Prompt Engineer"
+    assert roles.stats()["vocabulary"]["learned"] == 1
+
+
+def test_lookups_without_observe_do_not_count_or_teach(roles):
+    for _ in range(5):
+        roles.lookup("Prompt Engineer", observe=False)
+    assert roles.lookup("Prompt Engineer", observe=False).source == 'unknown'
+    assert roles.stats()["lookups"] == 0
+    assert roles.stats()["vocabulary"]["learned"] == 0
+
+
+def test_learning_can_be_disabled():
+    index = curated('role', learn_after=0)
+    for _ in range(5):
+        index.lookup("Prompt Engineer")
+    assert index.lookup("Prompt Engineer").source == 'unknown'
+
+
+def test_observed_inputs_are_bounded_least_recent_first():
+    index = curated('role', learn_after=2, max_observed=2)
+    index.lookup("Alpha Wrangler")
+    index.lookup("Beta Wrangler")
+    index.lookup("Alpha Wrangler", observe=False)  # Not a sighting; Alpha stays least recent.
+    index.lookup("Gamma Wrangler")  # Forgets Alpha's sighting.
+    assert list(index._observed) == ["beta wrangler", "gamma wrangler"]
+    index.lookup("Alpha Wrangler")
+    assert "alpha wrangler" in index._observed  # Counted afresh, so not learned yet.
+    index.lookup("Alpha Wrangler")
+    assert index.lookup("Alpha Wrangler").source == 'exact'
+
+
+def test_learning_stops_at_max_learned():
+    index = curated('role', learn_after=1, max_learned=1)
+    index.lookup("Alpha Wrangler")
+    index.lookup("Beta Wrangler")
+    assert index.lookup("Alpha Wrangler").source == 'exact'
+    assert index.lookup("Beta Wrangler").source == 'unknown'
+    assert not index._observed
+    assert index.stats()["vocabulary"]["learned"] == 1
+
+
+def test_memo_is_bounded_and_cleared_when_names_are_added():
+    index = curated('role', memo_size=2)
+    for value in ("SWE", "SRE", "RN"):
+        index.lookup(value)
+    assert list(index._memo) == ["SRE", "RN"]
+    index.lookup("RN")
+    assert index.stats()["memo_hits"] == 1
+    index.add("Prompt Engineer")
+    assert not index._memo
+
+
+def test_stats_report_the_hit_rate(programs):
+    programs.lookup("CS")
+    programs.lookup("Computr Science")
+    programs.lookup("Underwater Basket Weaving")
+    programs.lookup("Underwater Basket Weaving", observe=False)
+    stats = programs.stats()
+    assert stats["by_source"] == {"exact": 1, "fuzzy": 1, "unknown": 1}
+    assert stats["hit_rate"] == pytest.approx(0.667)
+
+
+class FakeQueryLog:
+    def top(self, kind, limit):
+        return {"program": ["Game Design"], "role": ["Prompt Engineer"]}[kind][:limit]
+
+
+def test_configure_adds_extra_aliases_and_seeds_from_the_query_log(tmp_path, monkeypatch):
+    monkeypatch.setattr(canonicalizer, "_indexes", {})  # Restored after the test.
+    assert canonicalize('program', "CS") == "CS"  # Disabled until configured.
+    aliases_path = tmp_path / "aliases.json"
+    aliases_path.write_text(json.dumps({"program": {"Computer Science": ["Informatics"]}}))
+    configure_canonicalizer(aliases_path=str(aliases_path), query_log=FakeQueryLog(), seed_top_n=5)
+    assert canonicalize('program', "informatics") == "Computer Science"
+    assert canonicalize('program', "game design") == "Game Design"
+    assert canonicalize('role', "prompt engineer") == "Prompt Engineer"
+    assert canonicalize('program', ["CS"]) == ["CS"]
+    assert canonicalizer.get_canonicalizer_stats()["role"]["vocabulary"]["learned"] == 1
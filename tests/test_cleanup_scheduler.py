@@ -0,0 +1,62 @@
+# tests/test_cleanup_scheduler.py
+import logging
+
+import pytest
+
+pytest.importorskip("fpdf")  # utils.cleanup_utils imports the CV job queue, which imports cv_service.
+
+from utils import cleanup_utils, leader_lock
+from utils.cleanup_utils import CleanupScheduler
+
+
+class FakeApp:
+    logger = logging.getLogger("test-cleanup")
+
+
+@pytest.fixture
+def cleanups(monkeypatch):
+    calls = []
+
+    def cleanup(app):
+        calls.append(app)
+        return 3
+
+    monkeypatch.setattr(cleanup_utils, "cleanup_cv_files", cleanup)
+    return calls
+
+
+@pytest.mark.skipif(leader_lock.fcntl is None, reason="needs fcntl")
+def test_one_scheduler_leads_until_it_stops(tmp_path):
+    path = str(tmp_path / "cleanup.lock")
+    first = CleanupScheduler(FakeApp(), interval=60, lock_path=path)
+    second = CleanupScheduler(FakeApp(), interval=60, lock_path=path)
+    assert first._try_become_leader()
+    assert not second._try_become_leader()
+    assert first.is_leader and not second.is_leader
+    first.stop()
+    assert second._try_become_leader()
+    second.stop()
+
+
+def test_run_once_records_deleted_files(tmp_path, cleanups):
+    scheduler = CleanupScheduler(FakeApp(), interval=60, lock_path=str(tmp_path / "cleanup.lock"))
+    scheduler.run_once()
+    scheduler.run_once()
+    stats = scheduler.stats()
+    assert len(cleanups) == 2
+    assert stats["runs"] == 2
+    assert stats["total_deleted"] == 6
+    assert stats["last_deleted"] == 3
+    assert stats["last_error"] is None
+
+
+def test_run_once_records_errors_and_keeps_going(tmp_path, monkeypatch):
+    def failing_cleanup(app):
+        raise RuntimeError("disk unavailable")
+
+    monkeypatch.setattr(cleanup_utils, "cleanup_cv_files", failing_cleanup)
+    scheduler = CleanupScheduler(FakeApp(), interval=60, lock_path=str(tmp_path / "cleanup.lock"))
+    scheduler.run_once()
+    assert scheduler.stats()["runs"] == 1
+    assert scheduler.stats()["last_deleted"] == 0
+    assert scheduler.stats()["last_error"] == "disk unavailable"
@@ -0,0 +1,111 @@
+# tests/test_cv_eviction.py
+import logging
+
+import pytest
+
+from services import cv_eviction
+from services.cv_eviction import (
+    ByteQuotaPolicy, CountQuotaPolicy, MaxAgePolicy, cleanup_policies, evict, evict_over_high_water,
+)
+from services.cv_index import CVIndex
+from services.cv_storage import LocalCVStore
+
+logger = logging.getLogger("test-eviction")
+
+
+@pytest.fixture
+def stored(tmp_path, monkeypatch, clock):
+    """A CV store and index holding a.pdf, b.pdf, c.pdf (10, 20, 30 bytes) created 100s apart."""
+    monkeypatch.setattr(cv_eviction, "time", clock)
+    store = LocalCVStore(str(tmp_path / "cvs"))
+    index = CVIndex(str(tmp_path / "index.db"))
+    for offset, (name, size) in enumerate([("a.pdf", 10), ("b.pdf", 20), ("c.pdf", 30)]):
+        with store.staged(name) as path, open(path, 'wb') as f:
+            f.write(b'x' * size)
+        index.record(name, size, created_at=clock.now - 300 + offset * 100)
+    return store, index
+
+
+def stored_names(store):
+    return sorted(name for name, _, _ in store.list())
+
+
+def config(**overrides):
+    values = {
+        'MAX_CVS_STORED': 100,
+        'CV_MAX_STORAGE_BYTES': 0,
+        'CV_EVICTION_ORDER': 'lru',
+        'CV_EVICTION_HIGH_WATER': 0.9,
+        'CV_EVICTION_LOW_WATER': 0.5,
+        'MAX_CV_AGE_HOURS': 1,
+    }
+    values.update(overrides)
+    return values
+
+
+def test_max_age_evicts_only_old_files(stored):
+    store, index = stored
+    assert evict(index, store, [MaxAgePolicy(150)], logger) == 2
+    assert stored_names(store) == ["c.pdf"]
+    assert index.totals() == (1, 30)
+
+
+def test_count_quota_follows_the_eviction_order(stored, clock):
+    store, index = stored
+    index.mark_used("a.pdf", used_at=clock.now)
+    assert CountQuotaPolicy(2, 'fifo').select(index) == ["a.pdf"]
+    assert CountQuotaPolicy(2, 'lru').select(index) == ["b.pdf"]
+    assert CountQuotaPolicy(3).select(index) == []
+
+
+def test_byte_quota_stops_once_enough_is_freed(stored):
+    store, index = stored
+    assert ByteQuotaPolicy(50, 'fifo').select(index) == ["a.pdf"]
+    assert ByteQuotaPolicy(30, 'fifo').select(index) == ["a.pdf", "b.pdf"]
+    assert ByteQuotaPolicy(60).select(index) == []
+
+
+def test_policies_see_what_earlier_ones_left(stored):
+    store, index = stored
+    # The age limit removes a.pdf, so the count quota has nothing left to do.
+    assert evict(index, store, [MaxAgePolicy(250), CountQuotaPolicy(2, 'fifo')], logger) == 1
+    assert stored_names(store) == ["b.pdf", "c.pdf"]
+
+
+def test_missing_files_are_dropped_from_the_index(stored):
+    store, index = stored
+    store.delete("a.pdf")
+    assert evict(index, store, [MaxAgePolicy(250)], logger) == 0
+    assert index.totals() == (2, 50)
+
+
+def test_failed_deletes_keep_their_index_entry(stored, monkeypatch):
+    store, index = stored
+
+    def failing_delete(name):
+        raise PermissionError("in use")
+
+    monkeypatch.setattr(store, "delete", failing_delete)
+    assert evict(index, store, [MaxAgePolicy(250)], logger) == 0
+    assert index.totals() == (3, 60)
+
+
+def test_high_water_evicts_down_to_low_water(stored):
+    store, index = stored
+    assert evict_over_high_water(index, store, config(MAX_CVS_STORED=4), logger) == 0
+    assert evict_over_high_water(index, store, config(MAX_CVS_STORED=3), logger) == 2
+    assert index.count() == 1
+
+
+def test_high_water_on_bytes(stored):
+    store, index = stored
+    assert evict_over_high_water(index, store, config(CV_MAX_STORAGE_BYTES=100), logger) == 0
+    assert evict_over_high_water(index, store, config(CV_MAX_STORAGE_BYTES=60, CV_EVICTION_ORDER='fifo'), logger) == 2
+    assert stored_names(store) == ["c.pdf"]
+
+
+def test_cleanup_policies_apply_the_age_limit_first(stored, clock):
+    store, index = stored
+    clock.advance(3600 - 150)
+    assert evict(index, store, cleanup_policies(config(MAX_CVS_STORED=2)), logger) == 2
+    assert stored_names(store) == ["c.pdf"]
@@ -0,0 +1,56 @@
+# tests/test_cv_index.py
+from services.cv_index import CVIndex
+from services.cv_storage import LocalCVStore
+
+
+def write_pdf(store, name, size):
+    with store.staged(name) as path, open(path, 'wb') as f:
+        f.write(b'x' * size)
+
+
+def test_totals_follow_inserts_updates_and_removals(tmp_path):
+    index = CVIndex(str(tmp_path / "index.db"))
+    index.record("a.pdf", 100)
+    index.record("b.pdf", 50)
+    assert index.totals() == (2, 150)
+    index.record("a.pdf", 10)  # Replaced, not added.
+    assert index.totals() == (2, 60)
+    index.remove("b.pdf")
+    assert index.totals() == (1, 10)
+    assert index.count() == 1
+
+
+def test_created_before_and_oldest_orders(tmp_path):
+    index = CVIndex(str(tmp_path / "index.db"))
+    index.record("a.pdf", 1, created_at=100)
+    index.record("b.pdf", 1, created_at=200)
+    index.record("c.pdf", 1, created_at=300)
+    index.mark_used("a.pdf", used_at=400)
+    assert index.created_before(250) == ["a.pdf", "b.pdf"]
+    assert index.oldest(2, 'fifo') == ["a.pdf", "b.pdf"]
+    assert index.oldest(2, 'lru') == ["b.pdf", "c.pdf"]
+    assert list(index.iter_oldest('lru')) == [("b.pdf", 1), ("c.pdf", 1), ("a.pdf", 1)]
+
+
+def test_touch_resets_age_only_for_indexed_files(tmp_path):
+    index = CVIndex(str(tmp_path / "index.db"))
+    index.record("a.pdf", 1, created_at=100)
+    assert index.touch("a.pdf", created_at=500)
+    assert index.created_before(200) == []
+    assert not index.touch("missing.pdf")
+
+
+def test_reconcile_adds_unindexed_files_and_drops_stale_entries(tmp_path):
+    store = LocalCVStore(str(tmp_path / "cvs"))
+    write_pdf(store, "on_disk.pdf", 30)
+    index = CVIndex(str(tmp_path / "index.db"))
+    index.record("gone.pdf", 10)
+    assert index.reconcile(store) == (1, 1)
+    assert index.totals() == (1, 30)
+    assert index.reconcile(store) == (0, 0)
+
+
+def test_index_is_shared_between_instances(tmp_path):
+    path = str(tmp_path / "index.db")
+    CVIndex(path).record("a.pdf", 5)
+    assert CVIndex(path).totals() == (1, 5)
@@ -0,0 +1,177 @@
+# tests/test_cv_jobs.py
+import logging
+from contextlib import nullcontext
+
+import pytest
+
+pytest.importorskip("fpdf")  # services.cv_jobs renders through cv_service.
+
+from services import cv_jobs
+from services.cv_index import CVIndex
+from services.cv_jobs import CVJobQueue
+from services.cv_storage import LocalCVStore
+from utils import cv_job_utils
+from utils.cv_job_utils import CVJobWorkers
+
+CV = {"name": "Ada", "email": "ada@example.com"}
+
+
+@pytest.fixture(autouse=True)
+def fake_time(monkeypatch, clock):
+    monkeypatch.setattr(cv_jobs, "time", clock)
+
+
+@pytest.fixture
+def queue(tmp_path):
+    return CVJobQueue(str(tmp_path / "jobs.db"), max_attempts=3, retry_delay=2, lease_seconds=60)
+
+
+def test_identical_payloads_share_a_job(queue, clock):
+    job, created = queue.enqueue(CV, content_hash="h1")
+    again, created_again = queue.enqueue(dict(CV), content_hash="h1")
+    clock.advance(1)
+    other, _ = queue.enqueue(dict(CV, name="Grace"), content_hash="h2")
+    assert created and not created_again
+    assert again["id"] == job["id"]
+    assert other["id"] != job["id"]
+    assert queue.get(other["id"])["queue_position"] == 2
+
+
+def test_done_job_is_reused_only_while_its_pdf_is_stored(queue, tmp_path, monkeypatch):
+    store = LocalCVStore(str(tmp_path / "cvs"))
+    monkeypatch.setattr(cv_jobs, "get_cv_store", lambda: store)
+    monkeypatch.setattr(cv_jobs, "get_cv_index", lambda: CVIndex(str(tmp_path / "index.db")))
+    job, _ = queue.enqueue(CV, content_hash="h1")
+    job_id, token, _, _ = queue.claim()
+    with store.staged("cv_h1.pdf") as path, open(path, 'wb') as f:
+        f.write(b"pdf")
+    assert queue.complete(job_id, token, "cv_h1.pdf")
+    assert queue.enqueue(CV, content_hash="h1") == (queue.get(job_id), False)
+    store.delete("cv_h1.pdf")
+    _, created = queue.enqueue(CV, content_hash="h1")
+    assert created
+
+
+def test_claim_leases_one_job_at_a_time(queue):
+    job, _ = queue.enqueue(CV, content_hash="h1")
+    job_id, token, payload, content_hash = queue.claim()
+    assert (job_id, payload, content_hash) == (job["id"], CV, "h1")
+    assert queue.claim() is None
+    assert queue.get(job_id)["status"] == cv_jobs.RUNNING
+
+
+def test_expired_lease_is_reclaimed_and_the_old_holder_is_fenced_off(queue, clock):
+    queue.enqueue(CV, content_hash="h1")
+    job_id, stale, _, _ = queue.claim()
+    clock.advance(61)
+    reclaimed_id, current, _, _ = queue.claim()
+    assert reclaimed_id == job_id and current != stale
+    assert queue.get(job_id)["attempts"] == 2
+
+    # Every update under the old token is rejected and leaves the job alone.
+    assert not queue.renew(job_id, stale)
+    assert not queue.set_stage(job_id, stale, 'rendering')
+    assert not queue.release(job_id, stale, 0)
+    assert queue.fail(job_id, stale, "boom") is None
+    assert not queue.complete(job_id, stale, "stale.pdf")
+    job = queue.get(job_id)
+    assert (job["status"], job["stage"], job["filename"], job["error"]) == (cv_jobs.RUNNING, 'starting', None, None)
+
+    assert queue.complete(job_id, current, "cv.pdf")
+    assert queue.get(job_id)["status"] == cv_jobs.DONE
+
+
+def test_renewing_keeps_a_slow_job_from_being_reclaimed(queue, clock):
+    queue.enqueue(CV, content_hash="h1")
+    job_id, token, _, _ = queue.claim()
+    clock.advance(50)
+    assert queue.renew(job_id, token)
+    clock.advance(50)
+    assert queue.set_stage(job_id, token, 'rendering')
+    clock.advance(50)
+    assert queue.claim() is None
+    clock.advance(11)
+    assert queue.claim()[0] == job_id
+
+
+def test_failures_back_off_then_fail_for_good(queue, clock):
+    job, _ = queue.enqueue(CV, content_hash="h1")
+    for attempt in (1, 2):
+        job_id, token, _, _ = queue.claim()
+        assert queue.fail(job_id, token, "render error") is True
+        assert queue.claim() is None  # Not due until the backoff has passed.
+        clock.advance(2 * 2 ** attempt)
+    job_id, token, _, _ = queue.claim()
+    assert queue.fail(job_id, token, "render error") is False
+    job = queue.get(job_id)
+    assert (job["status"], job["attempts"], job["error"]) == (cv_jobs.FAILED, 3, "render error")
+    _, created = queue.enqueue(CV, content_hash="h1")  # A failed job is not reused.
+    assert created
+
+
+def test_release_does_not_use_up_an_attempt(queue, clock):
+    queue.enqueue(CV, content_hash="h1")
+    job_id, token, _, _ = queue.claim()
+    assert queue.release(job_id, token, 5)
+    assert queue.get(job_id)["attempts"] == 0
+    assert queue.claim() is None
+    clock.advance(5)
+    assert queue.claim()[0] == job_id
+
+
+def test_purge_finished(queue, clock):
+    queue.enqueue(CV, content_hash="h1")
+    job_id, token, _, _ = queue.claim()
+    queue.complete(job_id, token, "cv.pdf")
+    assert queue.purge_finished(60) == 0
+    clock.advance(61)
+    assert queue.purge_finished(60) == 1
+    assert queue.get(job_id) is None
+
+
+class FakeApp:
+    config = {}
+    logger = logging.getLogger("test-cv-jobs")
+
+    def app_context(self):
+        return nullcontext()
+
+
+def test_worker_drops_the_result_of_a_reclaimed_job(queue, clock, monkeypatch):
+    job, _ = queue.enqueue(CV, content_hash="h1")
+    reclaimed = []
+
+    def slow_render(data, config, logger, content_hash, on_stage):
+        on_stage('rendering')
+        clock.advance(61)  # The lease runs out mid-render and another worker takes the job.
+        reclaimed.append(queue.claim())
+        return "cv_h1.pdf", False
+
+    monkeypatch.setattr(cv_job_utils, "store_rendered_cv", slow_render)
+    workers = CVJobWorkers(FakeApp(), queue)
+    assert workers.run_once()
+    assert reclaimed[0][0] == job["id"]
+    assert workers.stats()["lease_lost"] == 1
+    assert workers.stats()["completed"] == 0
+    assert queue.get(job["id"])["status"] == cv_jobs.RUNNING
+
+
+def test_worker_completes_and_retries_jobs(queue, monkeypatch):
+    outcomes = iter([RuntimeError("fpdf error"), ("cv_h1.pdf", False)])
+
+    def render(data, config, logger, content_hash, on_stage):
+        outcome = next(outcomes)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    monkeypatch.setattr(cv_job_utils, "store_rendered_cv", render)
+    monkeypatch.setattr(cv_jobs.random, "uniform", lambda a, b: 0)  # Retry immediately.
+    job, _ = queue.enqueue(CV, content_hash="h1")
+    workers = CVJobWorkers(FakeApp(), queue)
+    assert workers.run_once()
+    assert queue.get(job["id"])["stage"] == 'retrying'
+    assert workers.run_once()
+    assert queue.get(job["id"])["filename"] == "cv_h1.pdf"
+    assert workers.stats()["completed"] == 1
+    assert not workers.run_once()
@@ -0,0 +1,90 @@
+# tests/test_cv_render_executor.py
+from concurrent.futures import Future
+from concurrent.futures.process import BrokenProcessPool
+
+import pytest
+
+pytest.importorskip("fpdf")
+
+from services import cv_service  # noqa: E402
+from services.cv_service import CVRenderExecutor, RenderQueueFullError  # noqa: E402
+
+
+class FakePool:
+    """Records submissions; each returns a pending future the test resolves."""
+
+    def __init__(self, broken=False):
+        self.broken = broken
+        self.futures = []
+        self.shut_down = False
+
+    def submit(self, fn, *args):
+        if self.broken:
+            raise BrokenProcessPool("A child process terminated abruptly.")
+        future = Future()
+        self.futures.append(future)
+        return future
+
+    def shutdown(self, wait=True, cancel_futures=False):
+        self.shut_down = True
+
+
+@pytest.fixture
+def pools(monkeypatch):
+    """The pools the executor creates, in order; a test may queue up the next ones in `upcoming`."""
+    created = []
+    upcoming = []
+
+    def make_pool(**kwargs):
+        pool = upcoming.pop(0) if upcoming else FakePool()
+        created.append(pool)
+        return pool
+
+    monkeypatch.setattr(cv_service, "ProcessPoolExecutor", make_pool)
+    return created, upcoming
+
+
+def test_queue_limit_rejects_and_frees_slots(pools):
+    created, _ = pools
+    executor = CVRenderExecutor(max_workers=1, max_queue=1)
+    first = executor.submit({})
+    executor.submit({})
+    with pytest.raises(RenderQueueFullError):
+        executor.submit({})
+    first.set_result(b"%PDF")
+    executor.submit({})
+    assert executor.stats()["rejected"] == 1
+    assert executor.stats()["pending"] == 2
+
+
+def test_submit_retries_once_on_a_fresh_pool_when_the_pool_is_broken(pools):
+    created, upcoming = pools
+    upcoming.append(FakePool(broken=True))
+    executor = CVRenderExecutor(max_workers=1, max_queue=1)
+    future = executor.submit({})
+    assert len(created) == 2
+    assert created[0].shut_down
+    assert future is created[1].futures[0]
+    assert executor.stats()["pending"] == 1
+
+
+def test_a_render_failing_with_a_broken_pool_resets_it_for_the_next_batch_item(pools):
+    created, _ = pools
+    executor = CVRenderExecutor(max_workers=2, max_queue=0)
+    first = executor.submit({})
+    first.set_exception(BrokenProcessPool("A child process terminated abruptly."))
+    assert created[0].shut_down
+    executor.submit({})
+    assert len(created) == 2
+    assert executor.stats()["pending"] == 1
+
+
+def test_a_late_failure_from_an_old_pool_does_not_reset_the_new_one(pools):
+    created, _ = pools
+    executor = CVRenderExecutor(max_workers=2, max_queue=0)
+    first, second = executor.submit({}), executor.submit({})
+    first.set_exception(BrokenProcessPool("gone"))
+    executor.submit({})
+    second.set_exception(BrokenProcessPool("gone"))
+    assert len(created) == 2
+    assert not created[1].shut_down
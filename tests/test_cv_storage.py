@@ -0,0 +1,198 @@
+# tests/test_cv_storage.py
+import io
+import os
+from datetime import datetime, timezone
+
+import pytest
+
+from services import cv_storage
+from services.cv_storage import LocalCVStore, S3CVStore, SharedDirCVStore, configure_cv_store
+
+
+class ClientError(Exception):
+    """Shaped like botocore's ClientError: the error code is in response['Error']['Code']."""
+
+    def __init__(self, code):
+        super().__init__(code)
+        self.response = {'Error': {'Code': code}}
+
+
+class _Body:
+    def __init__(self, data):
+        self.data = data
+        self.closed = False
+
+    def iter_chunks(self, chunk_size):
+        for start in range(0, len(self.data), chunk_size):
+            yield self.data[start:start + chunk_size]
+
+    def close(self):
+        self.closed = True
+
+
+class _Paginator:
+    def __init__(self, objects):
+        self.objects = objects
+
+    def paginate(self, Bucket, Prefix):
+        yield {'Contents': [
+            {'Key': key, 'Size': len(data), 'LastModified': datetime(2024, 1, 1, tzinfo=timezone.utc)}
+            for key, data in sorted(self.objects.items()) if key.startswith(Prefix)
+        ]}
+
+
+class FakeS3Client:
+    """In-memory stand-in for the few boto3 S3 client methods S3CVStore uses."""
+
+    def __init__(self):
+        self.objects = {}
+        self.versions = {}
+
+    def _store(self, key, data):
+        self.objects[key] = data
+        self.versions[key] = self.versions.get(key, 0) + 1
+
+    def upload_file(self, path, bucket, key, ExtraArgs=None):
+        with open(path, 'rb') as f:
+            self._store(key, f.read())
+
+    def upload_fileobj(self, fileobj, bucket, key, ExtraArgs=None):
+        self._store(key, fileobj.read())
+
+    def head_object(self, Bucket, Key):
+        if Key not in self.objects:
+            raise ClientError('404')
+        return {
+            'ContentLength': len(self.objects[Key]),
+            'ETag': f'"v{self.versions[Key]}"',
+            'LastModified': datetime(2024, 1, 1, tzinfo=timezone.utc),
+        }
+
+    def get_object(self, Bucket, Key):
+        if Key not in self.objects:
+            raise ClientError('NoSuchKey')
+        return {'Body': _Body(self.objects[Key])}
+
+    def delete_object(self, Bucket, Key):
+        self.objects.pop(Key, None)
+
+    def get_paginator(self, operation):
+        return _Paginator(self.objects)
+
+    def generate_presigned_url(self, operation, Params, ExpiresIn):
+        return f"https://s3.example/{Params['Bucket']}/{Params['Key']}?expires={ExpiresIn}"
+
+
+@pytest.fixture(params=['local', 'shared', 's3'])
+def store(request, tmp_path):
+    if request.param == 'local':
+        return LocalCVStore(str(tmp_path / "cvs"))
+    if request.param == 'shared':
+        return SharedDirCVStore(str(tmp_path / "cvs"))
+    return S3CVStore('bucket', prefix='cvs/', client=FakeS3Client())
+
+
+def write(store, name, data):
+    with store.staged(name) as path, open(path, 'wb') as f:
+        f.write(data)
+
+
+def test_staged_file_is_published_on_exit(store):
+    write(store, "a.pdf", b"pdf bytes")
+    assert store.stat("a.pdf").size == 9
+    assert b"".join(store.iter_chunks("a.pdf", chunk_size=4)) == b"pdf bytes"
+
+
+def test_failed_write_publishes_nothing(store):
+    with pytest.raises(RuntimeError):
+        with store.staged("a.pdf") as path:
+            with open(path, 'wb') as f:
+                f.write(b"partial")
+            raise RuntimeError("render failed")
+    with pytest.raises(FileNotFoundError):
+        store.stat("a.pdf")
+    assert list(store.list()) == []
+
+
+def test_put_copies_a_file_object(store):
+    data = os.urandom(cv_storage.CHUNK_SIZE * 2 + 10)
+    store.put("a.pdf", io.BytesIO(data))
+    assert b"".join(store.iter_chunks("a.pdf")) == data
+
+
+def test_version_changes_when_the_bytes_do(store):
+    write(store, "a.pdf", b"first")
+    first = store.stat("a.pdf").version
+    assert store.stat("a.pdf").version == first
+    write(store, "a.pdf", b"second version")
+    if isinstance(store, LocalCVStore):
+        # A rewrite within the same mtime tick would keep the version; move the mtime on explicitly.
+        stat = os.stat(store._path("a.pdf"))
+        os.utime(store._path("a.pdf"), ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+    assert store.stat("a.pdf").version != first
+
+
+def test_refresh_keeps_the_version(store):
+    write(store, "a.pdf", b"pdf")
+    before = store.stat("a.pdf")
+    assert store.refresh("a.pdf").version == before.version
+    assert store.refresh("missing.pdf") is None
+
+
+def test_missing_files_raise_file_not_found(store):
+    with pytest.raises(FileNotFoundError):
+        store.stat("missing.pdf")
+    with pytest.raises(FileNotFoundError):
+        store.iter_chunks("missing.pdf")
+    with pytest.raises(FileNotFoundError):
+        store.delete("missing.pdf")
+
+
+def test_list_and_delete(store):
+    write(store, "a.pdf", b"aaa")
+    write(store, "b.pdf", b"bb")
+    assert sorted((name, size) for name, size, _ in store.list()) == [("a.pdf", 3), ("b.pdf", 2)]
+    store.delete("a.pdf")
+    assert [name for name, _, _ in store.list()] == ["b.pdf"]
+
+
+def test_empty_file_streams_no_chunks(store):
+    write(store, "empty.pdf", b"")
+    assert list(store.iter_chunks("empty.pdf")) == []
+
+
+def test_local_store_ignores_temporary_and_other_files(tmp_path):
+    store = LocalCVStore(str(tmp_path))
+    write(store, "a.pdf", b"a")
+    (tmp_path / "a.pdf.123.tmp").write_bytes(b"partial")
+    (tmp_path / "notes.txt").write_bytes(b"x")
+    assert [name for name, _, _ in store.list()] == ["a.pdf"]
+    assert store.local_path("a.pdf") == str(tmp_path / "a.pdf")
+
+
+def test_shared_store_streams_through_the_app(tmp_path):
+    store = SharedDirCVStore(str(tmp_path))
+    write(store, "a.pdf", b"a")
+    assert store.local_path("a.pdf") is None
+    assert store.download_url("a.pdf", "cv.pdf") is None
+
+
+def test_s3_store_redirects_to_presigned_urls():
+    client = FakeS3Client()
+    store = S3CVStore('bucket', prefix='cvs/', client=client, url_expiry=60)
+    write(store, "a.pdf", b"a")
+    assert list(client.objects) == ["cvs/a.pdf"]
+    assert store.download_url("a.pdf", "cv.pdf") == "https://s3.example/bucket/cvs/a.pdf?expires=60"
+    assert S3CVStore('bucket', client=client, redirect=False).download_url("a.pdf", "cv.pdf") is None
+    assert not store.reconcile_on_start
+
+
+def test_configure_cv_store(tmp_path, monkeypatch):
+    monkeypatch.setattr(cv_storage, "_cv_store", None)  # Restored after the test.
+    assert isinstance(configure_cv_store('local', str(tmp_path)), LocalCVStore)
+    assert isinstance(configure_cv_store('shared', str(tmp_path)), SharedDirCVStore)
+    assert cv_storage.get_cv_store().describe() == {"backend": "shared", "folder": str(tmp_path)}
+    with pytest.raises(ValueError):
+        configure_cv_store('s3', str(tmp_path), {})
+    with pytest.raises(ValueError):
+        configure_cv_store('ftp', str(tmp_path))
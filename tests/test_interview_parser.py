@@ -0,0 +1,157 @@
+# tests/test_interview_parser.py
+import random
+import re
+
+import pytest
+
+from benchmarks.parser_corpus import REPRESENTATIVE_CASES, mutate, synthetic_cases
+from utils.interview_parser import InterviewQuestionParser, parse_interview_questions
+
+
+def baseline_parse(text):
+    """The batch parser /interview-questions used before the streaming parser, minus the route's limits."""
+    questions_with_tips = []
+    lines = text.strip().split("\n")
+    current_question = None
+    question_pattern = re.compile(r"^\s*(\d+)[\.\)]?\s*(.+)")
+    tips_pattern = re.compile(r"^\s*[-•*]?\s*(?:Tips|tips|TIPS)?:?\s*(.+)")
+
+    i = 0
+    while i < len(lines):
+        line = lines[i].strip()
+        if not line:
+            i += 1
+            continue
+        question_match = question_pattern.match(line)
+        if question_match:
+            if current_question and current_question.get("question") and current_question.get("tips") is not None:
+                questions_with_tips.append(current_question)
+            current_question = {"question": question_match.group(2).strip(), "tips": []}
+            i += 1
+            continue
+        tips_match = tips_pattern.match(line)
+        if tips_match and current_question:
+            tips_text = tips_match.group(1).strip()
+            parsed_tips = []
+            for delimiter in [", ", "; ", "\n- ", " • "]:
+                if delimiter in tips_text:
+                    parsed_tips = [tip.strip() for tip in tips_text.split(delimiter) if tip.strip()]
+                    if parsed_tips:
+                        break
+            if not parsed_tips and tips_text:
+                parsed_tips = [tips_text]
+            current_question["tips"].extend(parsed_tips)
+            j = i + 1
+            while j < len(lines) and not question_pattern.match(lines[j].strip()):
+                next_line = lines[j].strip()
+                if next_line and (next_line.startswith("-") or next_line.startswith("•")):
+                    tip = next_line.lstrip("-•").strip()
+                    if tip:
+                        current_question["tips"].append(tip)
+                j += 1
+            i = j
+            continue
+        if current_question and (line.startswith("-") or line.startswith("•")):
+            tip = line.lstrip("-•").strip()
+            if tip:
+                current_question["tips"].append(tip)
+        i += 1
+    if current_question and current_question.get("question") and current_question.get("tips") is not None:
+        questions_with_tips.append(current_question)
+
+    if not questions_with_tips:
+        for paragraph in text.split("\n\n"):
+            lines = paragraph.strip().split("\n")
+            potential_question = lines[0].strip()
+            if re.search(r"^\d+[\.\)]|question|interview", potential_question.lower()):
+                question_text = re.sub(r"^\d+[\.\)]?\s*", "", potential_question).strip()
+                tips = []
+                for line in lines[1:]:
+                    line = line.strip()
+                    if line and not line.lower().startswith(("question", "interview")):
+                        tip = re.sub(r"^[-•*]?\s*", "", line).strip()
+                        if tip:
+                            tips.append(tip)
+                if question_text and tips:
+                    questions_with_tips.append({"question": question_text, "tips": tips})
+    return questions_with_tips
+
+
+def limited(questions, max_questions=10, max_tips=5):
+    return [{"question": q["question"], "tips": q["tips"][:max_tips]} for q in questions[:max_questions]]
+
+
+def parse_in_chunks(text, sizes, max_questions=None, max_tips=None):
+    parser = InterviewQuestionParser(max_questions=max_questions, max_tips=max_tips)
+    questions = []
+    start = 0
+    while start < len(text):
+        size = next(sizes)
+        questions.extend(parser.feed(text[start:start + size]))
+        start += size
+    questions.extend(parser.close())
+    return questions
+
+
+def _corpus():
+    cases = [case for case in REPRESENTATIVE_CASES + synthetic_cases(seed=7, per_variant=10)
+             if case["kind"] == "interview"]
+    rng = random.Random(11)
+    mutated = [dict(case, text=mutate(case["text"], rng)) for case in rng.sample(cases, 40)]
+    return cases + mutated
+
+
+CORPUS = _corpus()
+
+
+@pytest.mark.parametrize("case", CORPUS, ids=[f"{case['variant']}/{case['name']}" for case in CORPUS])
+def test_matches_the_baseline_parser(case):
+    text = case["text"]
+    expected = baseline_parse(text)
+    assert parse_interview_questions(text) == expected
+    assert parse_interview_questions(text, max_questions=10, max_tips=5) == limited(expected)
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_chunk_boundaries_do_not_change_the_result(seed):
+    rng = random.Random(seed)
+    sizes = iter(lambda: rng.randint(1, 40), None)
+    for case in CORPUS:
+        assert parse_in_chunks(case["text"], sizes, 10, 5) == limited(baseline_parse(case["text"]))
+
+
+def test_numbered_questions_with_inline_and_bulleted_tips():
+    text = (
+        "Here you go:\n"
+        "1. Tell me about yourself.\n"
+        "   - Tips: Be brief, Focus on the role\n"
+        "   - Mention a recent project\n"
+        "2) Why this company?\n"
+        "   - Tips: Research the company; Connect it to your goals\n"
+    )
+    assert parse_interview_questions(text) == [
+        {"question": "Tell me about yourself.", "tips": ["Be brief", "Focus on the role", "Mention a recent project"]},
+        {"question": "Why this company?", "tips": ["Research the company", "Connect it to your goals"]},
+    ]
+
+
+def test_paragraph_fallback_when_nothing_is_numbered():
+    text = "Question: Describe a conflict.\n- Stay calm\n- Show the outcome\n\nSome closing remarks."
+    assert parse_interview_questions(text) == [
+        {"question": "Question: Describe a conflict.", "tips": ["Stay calm", "Show the outcome"]},
+    ]
+
+
+def test_questions_are_emitted_as_soon_as_the_next_one_starts():
+    parser = InterviewQuestionParser()
+    assert parser.feed("1. First?\n - Tips: a, b\n") == []
+    assert parser.feed("2. Second?\n") == [{"question": "First?", "tips": ["a", "b"]}]
+    assert parser.close() == [{"question": "Second?", "tips": []}]
+
+
+def test_stops_at_max_questions():
+    text = "\n".join(f"{n}. Question {n}?\n - Tips: x" for n in range(1, 20))
+    parser = InterviewQuestionParser(max_questions=3)
+    questions = parser.feed(text) + parser.close()
+    assert [q["question"] for q in questions] == ["Question 1?", "Question 2?", "Question 3?"]
+    assert parser.done
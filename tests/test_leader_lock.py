@@ -0,0 +1,26 @@
+# tests/test_leader_lock.py
+import pytest
+
+from utils import leader_lock
+from utils.leader_lock import LeaderLock
+
+pytestmark = pytest.mark.skipif(leader_lock.fcntl is None, reason="needs fcntl")
+
+
+def test_only_one_holder_per_lock_file(tmp_path):
+    path = str(tmp_path / "locks" / "cleanup.lock")
+    first, second = LeaderLock(path), LeaderLock(path)
+    assert first.try_acquire()
+    assert not second.try_acquire()
+    assert first.try_acquire()  # Re-entrant for the holder.
+    assert first.held and not second.held
+
+
+def test_release_lets_another_process_take_over(tmp_path):
+    path = str(tmp_path / "cleanup.lock")
+    first, second = LeaderLock(path), LeaderLock(path)
+    assert first.try_acquire()
+    first.release()
+    assert not first.held
+    assert second.try_acquire()
+    assert not first.try_acquire()
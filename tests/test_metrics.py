@@ -0,0 +1,85 @@
+# tests/test_metrics.py
+import json
+import os
+
+import pytest
+
+from utils import metrics
+
+LIVE_PID, OTHER_PID = 4_000_001, 4_000_002
+
+
+@pytest.fixture
+def metrics_dir(tmp_path, monkeypatch):
+    """A metrics directory where LIVE_PID and OTHER_PID start out running; the returned set is editable."""
+    monkeypatch.setattr(metrics, "_metrics_dir", str(tmp_path))
+    alive = {LIVE_PID, OTHER_PID}
+    monkeypatch.setattr(metrics, "_pid_alive", lambda pid: pid in alive)
+    return alive
+
+
+def write_snapshot(pid, jobs, latency=None):
+    """Writes pid's snapshot as flush_metrics() would, with test_jobs_total and optionally test_latency_seconds."""
+    snapshot = {
+        "test_jobs_total": {"kind": "counter", "help": "Jobs.", "labelnames": ["kind"], "values": [[["cv"], jobs]]},
+    }
+    if latency is not None:
+        snapshot["test_latency_seconds"] = {
+            "kind": "histogram", "help": "Latency.", "labelnames": [], "buckets": [1, 5], "values": [[[], latency]],
+        }
+    with open(metrics._snapshot_path(pid), "w", encoding="utf-8") as f:
+        json.dump(snapshot, f)
+
+
+def jobs_total():
+    values = metrics._collect_all().get("test_jobs_total", {"values": []})["values"]
+    return sum(value for labels, value in values)
+
+
+def test_counters_and_histograms_sum_across_processes(metrics_dir):
+    write_snapshot(LIVE_PID, 3, latency=[1, 0, 0, 0.5])
+    write_snapshot(OTHER_PID, 4, latency=[0, 2, 1, 20.0])
+    merged = metrics._collect_all()
+    assert merged["test_jobs_total"]["values"] == [[["cv"], 7]]
+    assert merged["test_latency_seconds"]["values"] == [[[], [1, 2, 1, 20.5]]]
+
+
+def test_exited_process_is_folded_into_the_retired_snapshot(metrics_dir, tmp_path):
+    write_snapshot(LIVE_PID, 3)
+    write_snapshot(OTHER_PID, 4)
+    metrics_dir.discard(OTHER_PID)
+    assert jobs_total() == 7
+    assert not os.path.exists(metrics._snapshot_path(OTHER_PID))
+    assert os.path.exists(tmp_path / "metrics_retired.json")
+    assert jobs_total() == 7  # Not folded in a second time.
+
+
+def test_counters_survive_pid_reuse(metrics_dir):
+    write_snapshot(OTHER_PID, 5)
+    totals = [jobs_total()]
+    # The process exits and a new one starts with the same ID before the next scrape.
+    metrics._retire_snapshot(OTHER_PID, check_alive=False)  # What configure_metrics() does first.
+    write_snapshot(OTHER_PID, 1)
+    totals.append(jobs_total())
+    # It exits too and is noticed by a scrape; then the ID is reused again.
+    metrics_dir.discard(OTHER_PID)
+    totals.append(jobs_total())
+    metrics_dir.add(OTHER_PID)
+    metrics._retire_snapshot(OTHER_PID, check_alive=False)
+    write_snapshot(OTHER_PID, 2)
+    totals.append(jobs_total())
+    assert totals == [5, 6, 6, 8]
+
+
+def test_running_processes_are_not_retired(metrics_dir):
+    write_snapshot(OTHER_PID, 5)
+    metrics._retire_snapshot(OTHER_PID)
+    assert os.path.exists(metrics._snapshot_path(OTHER_PID))
+
+
+def test_flush_writes_this_process_snapshot(metrics_dir):
+    metrics.counter("test_flushed_total", "Flushed.").inc(amount=2)
+    metrics.flush_metrics()
+    with open(metrics._snapshot_path(os.getpid()), encoding="utf-8") as f:
+        snapshot = json.load(f)
+    assert snapshot["test_flushed_total"]["values"] == [[[], 2]]
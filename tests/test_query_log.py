@@ -0,0 +1,48 @@
+# tests/test_query_log.py
+from datetime import date, timedelta
+
+from services.query_log import QueryLog
+
+
+def test_counts_are_written_on_flush_and_ranked(tmp_path):
+    log = QueryLog(str(tmp_path / "queries.db"))
+    for program in ["Nursing", "Law", " Nursing ", "Law", "Nursing", "Art"]:
+        log.record('program', program)
+    log.record('role', "Nurse")
+    today = date.today()
+    assert log.top('program', 10, day=today) == []  # Nothing written before flush().
+    assert log.flush() == 4
+    assert log.top('program', 2, day=today) == ["Nursing", "Law"]
+    assert log.top('role', 10, day=today) == ["Nurse"]
+    assert log.top('program', 10) == []  # Defaults to yesterday.
+
+
+def test_flushes_accumulate_across_instances(tmp_path):
+    path = str(tmp_path / "queries.db")
+    first, second = QueryLog(path), QueryLog(path)
+    first.record('program', "Law")
+    second.record('program', "Art")
+    second.record('program', "Art")
+    first.flush()
+    second.flush()
+    first.record('program', "Law")
+    first.record('program', "Law")
+    first.flush()
+    assert second.top('program', 10, day=date.today()) == ["Law", "Art"]
+    assert first.flush() == 0
+
+
+def test_blank_and_non_string_values_are_ignored(tmp_path):
+    log = QueryLog(str(tmp_path / "queries.db"))
+    for value in [None, "", "   ", 42, ["Law"], {"name": "Law"}]:
+        log.record('program', value)
+    assert log.flush() == 0
+
+
+def test_purge_before_drops_old_days(tmp_path):
+    log = QueryLog(str(tmp_path / "queries.db"))
+    log.record('program', "Law")
+    log.flush()
+    assert log.purge_before(date.today()) == 0
+    assert log.purge_before(date.today() + timedelta(days=1)) == 1
+    assert log.top('program', 10, day=date.today()) == []
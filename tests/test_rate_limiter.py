@@ -0,0 +1,107 @@
+# tests/test_rate_limiter.py
+import asyncio
+
+import pytest
+
+from services import rate_limiter
+from services.rate_limiter import (
+    PRIORITY_BACKGROUND, PRIORITY_DEFAULT, PRIORITY_INTERACTIVE, RateLimitedError, RateLimiter, estimate_tokens,
+)
+
+
+@pytest.fixture(autouse=True)
+def fake_time(monkeypatch, clock):
+    # acquire() sleeps through the fake clock, so waiting for quota advances time instantly.
+    monkeypatch.setattr(rate_limiter, "time", clock)
+
+
+def test_estimate_tokens_rounds_up():
+    assert estimate_tokens("") == 1
+    assert estimate_tokens("abcd") == 1
+    assert estimate_tokens("abcde") == 2
+
+
+def test_burst_up_to_capacity_then_reject_with_retry_after():
+    limiter = RateLimiter(6, 0)
+    for _ in range(6):
+        limiter.acquire(10, PRIORITY_INTERACTIVE, timeout=0)
+    with pytest.raises(RateLimitedError) as rejected:
+        limiter.acquire(10, PRIORITY_INTERACTIVE, timeout=0)
+    assert rejected.value.retry_after == pytest.approx(10)  # One request refills every 60/6 seconds.
+    assert limiter.stats()["rejected"] == 1
+
+
+def test_buckets_refill_over_time_up_to_capacity(clock):
+    limiter = RateLimiter(10, 0)
+    for _ in range(10):
+        limiter.acquire(1, PRIORITY_INTERACTIVE)
+    assert limiter.stats()["available"]["requests"] == 0
+    clock.advance(30)
+    assert limiter.stats()["available"]["requests"] == 5
+    clock.advance(600)
+    assert limiter.stats()["available"]["requests"] == 10
+
+
+def test_acquire_waits_for_quota(clock):
+    limiter = RateLimiter(60, 0)
+    for _ in range(60):
+        limiter.acquire(1, PRIORITY_INTERACTIVE)
+    started = clock.now
+    limiter.acquire(1, PRIORITY_INTERACTIVE, timeout=5)
+    assert clock.now - started == pytest.approx(1)
+
+
+def test_lower_priorities_leave_a_reserve():
+    limiter = RateLimiter(10, 0)
+    for _ in range(9):
+        limiter.acquire(1, PRIORITY_DEFAULT, timeout=0)
+    with pytest.raises(RateLimitedError):
+        limiter.acquire(1, PRIORITY_DEFAULT, timeout=0)  # The last 10% is kept for interactive calls.
+    limiter.acquire(1, PRIORITY_INTERACTIVE, timeout=0)
+
+
+def test_call_larger_than_its_reserve_allows_waits_for_a_full_bucket(clock):
+    limiter = RateLimiter(0, 1000, expected_output_tokens=0)
+    limiter.acquire(100, PRIORITY_INTERACTIVE)
+    started = clock.now
+    # 900 tokens plus the 30% background reserve exceed the bucket; capped at its capacity.
+    assert limiter.acquire(900, PRIORITY_BACKGROUND, timeout=60) == 900
+    assert clock.now - started == pytest.approx(6)
+    assert limiter.stats()["available"]["tokens"] == pytest.approx(100)
+
+
+def test_settle_refunds_over_estimates_up_to_capacity():
+    limiter = RateLimiter(0, 1000, expected_output_tokens=500)
+    taken = limiter.acquire(100, PRIORITY_INTERACTIVE)
+    assert taken == 600
+    limiter.settle(taken, 150)
+    assert limiter.stats()["available"]["tokens"] == pytest.approx(850)
+    limiter.settle(1000, 0)
+    assert limiter.stats()["available"]["tokens"] == 1000
+    limiter.settle(0, 300)  # Under-estimates are charged.
+    assert limiter.stats()["available"]["tokens"] == pytest.approx(700)
+
+
+def test_sqlite_buckets_are_shared_between_limiters(tmp_path):
+    path = str(tmp_path / "rate.db")
+    first, second = RateLimiter(2, 0, db_path=path), RateLimiter(2, 0, db_path=path)
+    first.acquire(1, PRIORITY_INTERACTIVE, timeout=0)
+    second.acquire(1, PRIORITY_INTERACTIVE, timeout=0)
+    with pytest.raises(RateLimitedError):
+        first.acquire(1, PRIORITY_INTERACTIVE, timeout=0)
+
+
+def test_stats_does_not_write_bucket_state(tmp_path, clock):
+    limiter = RateLimiter(10, 0, db_path=str(tmp_path / "rate.db"))
+    limiter.acquire(1, PRIORITY_INTERACTIVE)
+    stored = limiter._buckets.read()
+    clock.advance(6)
+    assert limiter.stats()["available"]["requests"] == 10
+    assert limiter._buckets.read() == stored
+
+
+def test_acquire_async_takes_quota():
+    limiter = RateLimiter(1, 0)
+    assert asyncio.run(limiter.acquire_async(10, PRIORITY_INTERACTIVE, timeout=0)) == 810
+    with pytest.raises(RateLimitedError):
+        asyncio.run(limiter.acquire_async(10, PRIORITY_INTERACTIVE, timeout=0))
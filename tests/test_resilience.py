@@ -0,0 +1,239 @@
+# tests/test_resilience.py
+import asyncio
+import threading
+
+import pytest
+
+from services import resilience
+from services.resilience import (
+    CircuitBreaker, CircuitOpenError, DeadlineExceededError, ResilientCaller, RetryPolicy,
+    UpstreamUnavailableError, is_transient,
+)
+
+
+class ServiceUnavailable(Exception):
+    """Named like the google.api_core error, which is_transient() recognizes by name."""
+
+
+class BadRequest(Exception):
+    code = 400
+
+
+def no_backoff(max_attempts=3):
+    return RetryPolicy(max_attempts=max_attempts, base_delay=0, max_delay=0)
+
+
+def flaky(failures, result="ok", error=ServiceUnavailable):
+    """An attempt function failing `failures` times with error, then returning result; .calls counts attempts."""
+    def attempt(timeout):
+        attempt.calls += 1
+        if attempt.calls <= failures:
+            raise error("unavailable")
+        return result
+    attempt.calls = 0
+    return attempt
+
+
+def test_transient_errors():
+    assert is_transient(TimeoutError())
+    assert is_transient(ConnectionResetError())
+    assert is_transient(ServiceUnavailable())
+    error = Exception()
+    error.code = 503
+    assert is_transient(error)
+    assert not is_transient(BadRequest())
+    assert not is_transient(ValueError())
+
+
+class TestCircuitBreaker:
+    @pytest.fixture(autouse=True)
+    def fake_time(self, monkeypatch, clock):
+        monkeypatch.setattr(resilience, "time", clock)
+
+    def open_breaker(self):
+        breaker = CircuitBreaker("test", failure_threshold=3, recovery_time=30)
+        for _ in range(3):
+            breaker.before_call()
+            breaker.record_failure()
+        return breaker
+
+    def test_opens_after_consecutive_failures(self):
+        breaker = CircuitBreaker("test", failure_threshold=3, recovery_time=30)
+        breaker.record_failure()
+        breaker.record_failure()
+        breaker.record_success()  # Resets the count.
+        breaker.record_failure()
+        breaker.record_failure()
+        assert breaker.state == CircuitBreaker.CLOSED
+        breaker.record_failure()
+        assert breaker.state == CircuitBreaker.OPEN
+        assert breaker.stats()["times_opened"] == 1
+
+    def test_open_refuses_calls_until_recovery_time(self, clock):
+        breaker = self.open_breaker()
+        clock.advance(10)
+        with pytest.raises(CircuitOpenError) as refused:
+            breaker.before_call()
+        assert refused.value.retry_after == pytest.approx(20)
+
+    def test_half_open_lets_one_probe_through_and_success_closes(self, clock):
+        breaker = self.open_breaker()
+        clock.advance(30)
+        breaker.before_call()
+        assert breaker.state == CircuitBreaker.HALF_OPEN
+        with pytest.raises(CircuitOpenError):
+            breaker.before_call()  # Only one probe at a time.
+        breaker.record_success()
+        assert breaker.state == CircuitBreaker.CLOSED
+        breaker.before_call()
+
+    def test_failed_probe_opens_again(self, clock):
+        breaker = self.open_breaker()
+        clock.advance(30)
+        breaker.before_call()
+        breaker.record_failure()
+        assert breaker.state == CircuitBreaker.OPEN
+        assert breaker.stats()["times_opened"] == 2
+        with pytest.raises(CircuitOpenError):
+            breaker.before_call()
+        clock.advance(30)
+        breaker.before_call()
+        assert breaker.state == CircuitBreaker.HALF_OPEN
+
+    def test_release_frees_the_probe_without_an_outcome(self, clock):
+        breaker = self.open_breaker()
+        clock.advance(30)
+        breaker.before_call()
+        breaker.release()
+        assert breaker.state == CircuitBreaker.HALF_OPEN
+        breaker.before_call()  # The next call may probe.
+
+
+def test_transient_failures_are_retried():
+    caller = ResilientCaller("test", retry=no_backoff(3))
+    attempt = flaky(2)
+    assert caller.call(attempt) == "ok"
+    assert attempt.calls == 3
+    assert caller.breaker.state == CircuitBreaker.CLOSED
+
+
+def test_gives_up_after_max_attempts():
+    caller = ResilientCaller("test", retry=no_backoff(2), breaker=CircuitBreaker("test", failure_threshold=10))
+    attempt = flaky(5)
+    with pytest.raises(UpstreamUnavailableError):
+        caller.call(attempt)
+    assert attempt.calls == 2
+    assert caller.breaker.stats()["consecutive_failures"] == 2
+
+
+def test_other_errors_are_raised_at_once_and_do_not_trip_the_breaker():
+    caller = ResilientCaller("test", retry=no_backoff(3), breaker=CircuitBreaker("test", failure_threshold=1))
+    attempt = flaky(1, error=BadRequest)
+    with pytest.raises(BadRequest):
+        caller.call(attempt)
+    assert attempt.calls == 1
+    assert caller.breaker.state == CircuitBreaker.CLOSED
+
+
+def test_open_breaker_refuses_without_calling_upstream():
+    caller = ResilientCaller("test", retry=no_backoff(1), breaker=CircuitBreaker("test", failure_threshold=1))
+    with pytest.raises(UpstreamUnavailableError):
+        caller.call(flaky(1))
+    attempt = flaky(0)
+    with pytest.raises(CircuitOpenError):
+        caller.call(attempt)
+    assert attempt.calls == 0
+
+
+def test_local_refusals_release_the_breaker():
+    breaker = CircuitBreaker("test", failure_threshold=1, recovery_time=0)
+    breaker.record_failure()
+    caller = ResilientCaller("test", retry=no_backoff(3), breaker=breaker)
+    with pytest.raises(UpstreamUnavailableError):
+        caller.call(flaky(1, error=UpstreamUnavailableError))  # E.g. refused by the rate limiter.
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert caller.call(flaky(0)) == "ok"  # The probe was released, so this call may probe.
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_deadline_stops_waiting_for_a_hung_attempt():
+    release = threading.Event()
+    caller = ResilientCaller("test", deadline=0.05, retry=no_backoff(3))
+    try:
+        with pytest.raises(DeadlineExceededError):
+            caller.call(lambda timeout: release.wait(5))
+    finally:
+        release.set()
+
+
+def warm_up(caller, seconds=0.01):
+    for _ in range(caller.latency.min_samples):
+        caller.latency.record(seconds)
+
+
+def test_slow_attempt_is_hedged_and_the_hedge_wins():
+    release = threading.Event()
+    calls = []
+
+    def attempt(timeout):
+        calls.append(timeout)
+        if len(calls) == 1:
+            release.wait(5)
+            return "primary"
+        return "hedge"
+
+    caller = ResilientCaller("test", deadline=5, hedge_percentile=0.95, hedge_min_delay=0.02)
+    warm_up(caller)
+    try:
+        assert caller.call(attempt) == "hedge"
+    finally:
+        release.set()
+    assert len(calls) == 2
+
+
+def test_no_hedging_until_latencies_are_known():
+    caller = ResilientCaller("test", hedge_percentile=0.95, hedge_min_delay=0.01)
+    assert caller.stats()["hedge_after_seconds"] is None
+    warm_up(caller, 0.5)
+    assert caller.stats()["hedge_after_seconds"] == 0.5
+
+
+def test_async_calls_retry_and_hedge():
+    async def run():
+        caller = ResilientCaller("test", deadline=5, retry=no_backoff(3))
+        failing = flaky(2)
+
+        async def retried(timeout):
+            return failing(timeout)
+
+        assert await caller.call_async(retried) == "ok"
+        assert failing.calls == 3
+
+        hedged = ResilientCaller("test", deadline=5, hedge_percentile=0.95, hedge_min_delay=0.02)
+        warm_up(hedged)
+        calls = []
+
+        async def slow_first(timeout):
+            calls.append(timeout)
+            if len(calls) == 1:
+                await asyncio.sleep(5)
+                return "primary"
+            return "hedge"
+
+        assert await hedged.call_async(slow_first) == "hedge"
+        assert len(calls) == 2
+
+    asyncio.run(run())
+
+
+def test_async_deadline():
+    async def run():
+        caller = ResilientCaller("test", deadline=0.05, retry=no_backoff(3))
+
+        async def hung(timeout):
+            await asyncio.sleep(5)
+
+        with pytest.raises(DeadlineExceededError):
+            await caller.call_async(hung)
+
+    asyncio.run(run())
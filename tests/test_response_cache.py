@@ -0,0 +1,87 @@
+# tests/test_response_cache.py
+import sqlite3
+
+import pytest
+
+from services import response_cache
+from services.response_cache import LRUCache, ResponseCache, SQLiteCache, make_cache_key
+
+
+@pytest.fixture(autouse=True)
+def fake_time(monkeypatch, clock):
+    monkeypatch.setattr(response_cache, "time", clock)
+
+
+def two_tier(tmp_path, ttl=60):
+    return ResponseCache(LRUCache(max_entries=10, ttl=ttl), SQLiteCache(str(tmp_path / "cache.db"), ttl=ttl))
+
+
+def test_cache_key_ignores_whitespace_but_not_model():
+    assert make_cache_key("a  b\n c", "m") == make_cache_key(" a b c ", "m")
+    assert make_cache_key("a b c", "m") != make_cache_key("a b c", "other")
+
+
+def test_lru_expires_and_evicts_least_recently_used(clock):
+    cache = LRUCache(max_entries=2, ttl=10)
+    cache.set("a", "1")
+    cache.set("b", "2")
+    assert cache.get("a") == "1"  # "b" is now least recently used.
+    cache.set("c", "3")
+    assert cache.get("b") is None
+    clock.advance(11)
+    assert cache.get("a") is None
+    assert cache.get_stale("a", max_stale=5) == "1"
+    assert cache.get_stale("a", max_stale=1) is None
+
+
+def test_entries_expire_in_both_tiers(tmp_path, clock):
+    cache = two_tier(tmp_path)
+    cache.set("k", "v")
+    assert cache.local.get("k") == "v"
+    assert cache.shared.get("k") == "v"
+    clock.advance(61)
+    assert cache.get("k") is None
+    assert cache.shared.get("k") is None
+
+
+def test_shared_hit_is_promoted_with_the_time_it_has_left(tmp_path, clock):
+    cache = two_tier(tmp_path)
+    cache.shared.set("k", "v", ttl=60)
+    clock.advance(50)
+    assert cache.get("k") == "v"  # Promoted into the local tier.
+    _, expires_at = cache.local.get_entry("k")
+    assert expires_at == pytest.approx(clock.now + 10)
+    clock.advance(11)
+    assert cache.get("k") is None
+
+
+def test_other_workers_see_writes_through_the_shared_tier(tmp_path):
+    writer = two_tier(tmp_path)
+    reader = two_tier(tmp_path)
+    writer.set("k", "v")
+    assert reader.get("k") == "v"
+    assert reader.stats()["hits"] == 1
+
+
+def test_get_entry_reports_the_later_expiry(tmp_path, clock):
+    cache = two_tier(tmp_path)
+    cache.local.set("k", "local", ttl=10)
+    cache.shared.set("k", "shared", ttl=30)
+    assert cache.get_entry("k") == ("shared", clock.now + 30)
+
+
+def test_shared_tier_errors_fall_back_to_local(tmp_path, monkeypatch):
+    cache = two_tier(tmp_path)
+
+    def broken(*args, **kwargs):
+        raise sqlite3.OperationalError("database is locked")
+
+    for name in ("get_entry", "set", "get_stale", "delete"):
+        monkeypatch.setattr(cache.shared, name, broken)
+    cache.set("k", "v")
+    assert cache.get("k") == "v"
+    assert cache.get("missing") is None
+    assert cache.get_stale("missing", 60) is None
+    cache.delete("k")
+    assert cache.get("k") is None
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 2
@@ -0,0 +1,119 @@
+# tests/test_single_flight.py
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from services.single_flight import SingleFlight
+
+
+def test_concurrent_calls_with_one_key_run_once():
+    flight = SingleFlight()
+    calls = []
+    release = threading.Event()
+
+    def fetch():
+        calls.append(1)
+        release.wait(5)
+        return "answer"
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        futures = [pool.submit(flight.do, "key", fetch) for _ in range(8)]
+        while flight.stats()["merged"] < 7:
+            time.sleep(0.001)
+        release.set()
+        results = [future.result(5) for future in futures]
+
+    assert results == ["answer"] * 8
+    assert len(calls) == 1
+    assert flight.stats() == {"executed": 1, "merged": 7, "in_flight": 0}
+
+
+def test_different_keys_are_not_merged():
+    flight = SingleFlight()
+    assert flight.do("a", lambda: 1) == 1
+    assert flight.do("b", lambda: 2) == 2
+    assert flight.stats()["merged"] == 0
+
+
+def test_key_is_released_once_the_call_finishes():
+    flight = SingleFlight()
+    calls = []
+    flight.do("key", calls.append, 1)
+    flight.do("key", calls.append, 2)
+    assert calls == [1, 2]
+    assert flight.in_flight() == 0
+
+
+def test_error_is_raised_in_every_waiter():
+    flight = SingleFlight()
+    release = threading.Event()
+
+    def fail():
+        release.wait(5)
+        raise ValueError("upstream failed")
+
+    with ThreadPoolExecutor(max_workers=3) as pool:
+        futures = [pool.submit(flight.do, "key", fail) for _ in range(3)]
+        while flight.stats()["merged"] < 2:
+            time.sleep(0.001)
+        release.set()
+        for future in futures:
+            with pytest.raises(ValueError, match="upstream failed"):
+                future.result(5)
+    assert flight.in_flight() == 0
+
+
+def test_cancelled_waiter_does_not_affect_the_others():
+    asyncio.run(_cancel_one_waiter())
+
+
+async def _cancel_one_waiter():
+    flight = SingleFlight()
+    release = asyncio.Event()
+
+    async def fetch():
+        await release.wait()
+        return "answer"
+
+    leader = asyncio.ensure_future(flight.do_async("key", fetch))
+    await asyncio.sleep(0)
+    cancelled = asyncio.ensure_future(flight.do_async("key", fetch))
+    waiter = asyncio.ensure_future(flight.do_async("key", fetch))
+    await asyncio.sleep(0)
+    cancelled.cancel()
+    await asyncio.sleep(0)
+    release.set()
+
+    assert await leader == "answer"
+    assert await waiter == "answer"
+    with pytest.raises(asyncio.CancelledError):
+        await cancelled
+    assert flight.stats() == {"executed": 1, "merged": 2, "in_flight": 0}
+
+
+def test_async_and_sync_callers_share_a_call():
+    asyncio.run(_mix_sync_and_async_callers())
+
+
+async def _mix_sync_and_async_callers():
+    flight = SingleFlight()
+    started = threading.Event()
+    release = threading.Event()
+
+    def fetch():
+        started.set()
+        release.wait(5)
+        return "answer"
+
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        sync_call = pool.submit(flight.do, "key", fetch)
+        started.wait(5)
+        waiter = asyncio.ensure_future(flight.do_async("key", fetch))
+        await asyncio.sleep(0)
+        release.set()
+        assert await waiter == "answer"
+        assert sync_call.result(5) == "answer"
+    assert flight.stats()["executed"] == 1
@@ -0,0 +1,93 @@
+# tests/test_structured_output.py
+import json
+
+import pytest
+
+from services import gemini_service
+from services.structured_output import (
+    CAREER_GUIDANCE_SCHEMA, JOBS_SCHEMA, EmptyOutputError, StructuredOutputError, coerce, decode_json,
+    decode_json_response, parse_structured,
+)
+
+JOB = {"title": "Nurse", "description": "Cares for patients.", "skills": ["Triage"], "education": "BSN",
+       "outlook": "Good", "salary": "$70k"}
+
+
+@pytest.mark.parametrize("text", [
+    json.dumps({"jobs": [JOB]}),
+    "```json\n" + json.dumps({"jobs": [JOB]}) + "\n```",
+    "Sure! Here it is:\n" + json.dumps({"jobs": [JOB]}) + "\nGood luck.",
+    json.dumps({"jobs": [JOB]}).replace("]", ",]").replace("}", ",}"),
+])
+def test_repairs_common_formatting_problems(text):
+    assert decode_json_response(text) == ({"jobs": [JOB]}, False)
+
+
+def test_truncated_output_is_closed_and_flagged():
+    text = json.dumps({"jobs": [JOB, JOB]})[:-40]
+    value, truncated = decode_json_response(text)
+    assert truncated
+    assert value["jobs"][0] == JOB
+
+
+def test_undecodable_output_raises():
+    with pytest.raises(StructuredOutputError):
+        decode_json("{'single': 'quotes'}")
+
+
+def test_coercion_fills_defaults_and_converts_near_misses():
+    result = coerce({"jobs": {"title": "Nurse", "skills": "Triage", "salary": 70000, "extra": 1}}, JOBS_SCHEMA)
+    assert result == {"jobs": [{"title": "Nurse", "description": "", "skills": ["Triage"], "education": "",
+                                "outlook": "", "salary": "70000"}]}
+
+
+def test_bare_list_is_accepted_for_a_single_array_schema():
+    assert parse_structured(json.dumps([JOB]), JOBS_SCHEMA) == {"jobs": [JOB]}
+
+
+@pytest.mark.parametrize("value", [{}, {"error": "quota"}, {"jobs": []}, {"jobs": [{"description": "no title"}]}])
+def test_empty_job_lists_are_rejected(value):
+    with pytest.raises(EmptyOutputError):
+        coerce(value, JOBS_SCHEMA)
+
+
+def test_items_without_a_title_are_dropped():
+    assert coerce({"jobs": [JOB, {"salary": "1"}]}, JOBS_SCHEMA) == {"jobs": [JOB]}
+
+
+def test_guidance_needs_key_skills():
+    with pytest.raises(EmptyOutputError):
+        coerce({"careerPaths": [], "certifications": []}, CAREER_GUIDANCE_SCHEMA)
+    assert coerce({"keySkills": ["Care"]}, CAREER_GUIDANCE_SCHEMA)["keySkills"] == ["Care"]
+
+
+@pytest.fixture
+def model_replies(monkeypatch):
+    """Replaces the Gemini call with a list of canned replies, consumed in order."""
+    replies = []
+    monkeypatch.setattr(gemini_service, "_call_model", lambda prompt, config, priority: replies.pop(0))
+    gemini_service.configure_response_cache(10, ttl=60)
+    yield replies
+    gemini_service.configure_response_cache(0, ttl=60)
+
+
+def test_empty_reply_is_requeried_and_only_the_valid_one_cached(model_replies):
+    model_replies.extend(["{}", json.dumps({"jobs": [JOB]})])
+    assert gemini_service.get_structured_response("prompt a", JOBS_SCHEMA) == {"jobs": [JOB]}
+    assert not model_replies
+    assert gemini_service.get_structured_response("prompt a", JOBS_SCHEMA) == {"jobs": [JOB]}  # From the cache.
+
+
+def test_reply_still_empty_after_requeries_raises_and_is_not_cached(model_replies):
+    model_replies.extend(['{"error": "x"}', '{"jobs": []}'])
+    with pytest.raises(EmptyOutputError):
+        gemini_service.get_structured_response("prompt b", JOBS_SCHEMA)
+    key = gemini_service.response_cache_key("prompt b", structured=True)
+    assert gemini_service._response_cache.get(key) is None
+
+
+def test_truncated_reply_is_returned_but_not_cached(model_replies):
+    model_replies.append(json.dumps({"jobs": [JOB, JOB]})[:-40])
+    assert gemini_service.get_structured_response("prompt c", JOBS_SCHEMA)["jobs"][0] == JOB
+    key = gemini_service.response_cache_key("prompt c", structured=True)
+    assert gemini_service._response_cache.get(key) is None
@@ -1,73 +1,172 @@
 # utils/cleanup_utils.py
+import atexit
 import os
-import shutil
-from datetime import datetime
-from threading import Timer
+import random
+import threading
+import time
+
+from services.cv_eviction import cleanup_policies, evict
+from services.cv_index import get_cv_index
+from services.cv_jobs import get_cv_job_queue
+from services.cv_storage import get_cv_store
+from utils import metrics
+from utils.leader_lock import LeaderLock
+
+_CLEANUP_RUNS = metrics.counter("cv_cleanup_runs_total", "CV cleanup runs by outcome.", ("outcome",))
+_CLEANUP_DELETED = metrics.counter("cv_cleanup_deleted_files_total", "CV files deleted by the periodic cleanup.")
+_CLEANUP_SECONDS = metrics.histogram("cv_cleanup_duration_seconds", "Duration of CV cleanup runs.")
 
 def cleanup_cv_files(app):
     """
     Cleans up old or excessive CV files from the temporary storage directory.
 
     This function is designed to run periodically as a background task.
-    It removes files older than a configured age and ensures the total
-    number of stored CVs does not exceed a defined maximum.
+    It removes files older than a configured age and ensures the number and
+    total size of stored CVs do not exceed their quotas. Candidates come
+    from the CV index, so the cost depends on the number of files removed,
+    not on the number of files stored.
 
     Args:
         app: The Flask application instance, used to access app.config and app.logger.
     """
     with app.app_context(): # Essential for accessing app.config within a background thread
         try:
-            now = datetime.now()
-            cv_files = []
-
-            # Collect all PDF files in the CV_FOLDER along with their creation times.
-            for filename in os.listdir(app.config['CV_FOLDER']):
-                if filename.endswith('.pdf'):
-                    filepath = os.path.join(app.config['CV_FOLDER'], filename)
-                    # Use os.path.getctime for creation time (or getmtime for modification time)
-                    # Creation time is often more suitable for cleanup policies.
-                    created_time = datetime.fromtimestamp(os.path.getctime(filepath))
-                    age_hours = (now - created_time).total_seconds() / 3600
-                    cv_files.append((filepath, created_time, age_hours))
-
-            # Sort files by creation time (oldest first) to prioritize deletion of older files.
-            cv_files.sort(key=lambda x: x[1])
-
-            deleted_count = 0
-            # Iterate and delete files that are too old or if the storage limit is exceeded.
-            for filepath, _, age_hours in cv_files:
-                if (age_hours > app.config['MAX_CV_AGE_HOURS'] or
-                    len(cv_files) - deleted_count > app.config['MAX_CVS_STORED']):
-                    try:
-                        os.remove(filepath)
-                        deleted_count += 1
-                        app.logger.info(f"Deleted old/excess CV file: {filepath}")
-                    except OSError as e:
-                        # Log specific OS errors during deletion (e.g., file in use, permissions).
-                        app.logger.error(f"Error deleting file {filepath}: {str(e)}")
-                    except Exception as e:
-                        # Catch any other unexpected errors during file deletion.
-                        app.logger.error(f"An unexpected error occurred deleting {filepath}: {str(e)}")
+            # Age limit first, then the count and byte quotas (see services.cv_eviction).
+            deleted_count = evict(
+                get_cv_index(), get_cv_store(), cleanup_policies(app.config), app.logger
+            )
+
+            # Finished jobs are kept as long as their PDFs, so their downloadUrl stays meaningful.
+            job_queue = get_cv_job_queue()
+            if job_queue is not None:
+                job_queue.purge_finished(app.config['MAX_CV_AGE_HOURS'] * 3600)
 
             app.logger.info(f"CV cleanup complete. Deleted {deleted_count} files.")
+            return deleted_count
 
         except Exception as e:
             # Log any high-level errors that prevent the cleanup process from running.
             app.logger.error(f"Error during CV cleanup process: {str(e)}", exc_info=True)
+            raise
+
+class CleanupScheduler:
+    """
+    Runs cleanup_cv_files periodically in exactly one process per host.
+
+    Every gunicorn worker creates a scheduler, but only the one holding an
+    exclusive lock on a shared lock file (the leader) runs cleanup. The lock is
+    released by the OS when the leader exits, and the other workers keep
+    trying to take it over on each tick. Work happens on a single daemon thread,
+    at intervals jittered so that workers do not wake in lockstep.
+    """
+
+    def __init__(self, app, interval, lock_path, jitter=0.1):
+        """
+        Args:
+            app: The Flask application instance.
+            interval (float): Seconds between cleanup runs.
+            lock_path (str): File used for leader election across processes.
+            jitter (float): Fraction of the interval by which each wait is randomly varied.
+        """
+        self.app = app
+        self.interval = interval
+        self.lock_path = lock_path
+        self.jitter = jitter
+        self._stop = threading.Event()
+        self._thread = None
+        self._leader = LeaderLock(lock_path)
+        self.runs = 0
+        self.total_deleted = 0
+        self.last_run_at = None
+        self.last_duration = None
+        self.last_deleted = None
+        self.last_error = None
+
+    def start(self):
+        """Starts the scheduler thread. Does nothing if it is already running."""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="cv-cleanup-scheduler", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=5):
+        """Stops the scheduler, waiting up to timeout seconds for a running cleanup to finish."""
+        self._stop.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout)
+        self._release_leadership()
 
+    def _next_delay(self):
+        return self.interval * random.uniform(1 - self.jitter, 1 + self.jitter)
+
+    def _run(self):
+        while not self._stop.wait(self._next_delay()):
+            if self._try_become_leader():
+                self.run_once()
+
+    @property
+    def is_leader(self):
+        return self._leader.held
+
+    def _try_become_leader(self):
+        if self._leader.held:
+            return True
+        if not self._leader.try_acquire():
+            return False
+        self.app.logger.info(f"Process {os.getpid()} is now the CV cleanup leader.")
+        return True
+
+    def _release_leadership(self):
+        self._leader.release()
+
+    def run_once(self):
+        """Runs one cleanup pass and records its statistics."""
+        started = time.monotonic()
+        self.last_run_at = time.time()
+        try:
+            self.last_deleted = cleanup_cv_files(self.app)
+            self.total_deleted += self.last_deleted
+            self.last_error = None
+            _CLEANUP_RUNS.inc("ok")
+            _CLEANUP_DELETED.inc(amount=self.last_deleted)
+        except Exception as e:
+            self.last_deleted = 0
+            self.last_error = str(e)
+            _CLEANUP_RUNS.inc("error")
         finally:
-            # Schedule the next cleanup run. This ensures the cleanup runs continuously.
-            # The timer is re-scheduled *after* the current run completes (or fails).
-            Timer(app.config['CLEANUP_INTERVAL'], cleanup_cv_files, args=[app]).start()
+            self.runs += 1
+            self.last_duration = time.monotonic() - started
+            _CLEANUP_SECONDS.observe(self.last_duration)
+
+    def stats(self):
+        """Returns leadership and last-run statistics."""
+        return {
+            "is_leader": self.is_leader,
+            "runs": self.runs,
+            "total_deleted": self.total_deleted,
+            "last_run_at": self.last_run_at,
+            "last_duration_seconds": self.last_duration,
+            "last_deleted": self.last_deleted,
+            "last_error": self.last_error,
+        }
 
 def start_cleanup_scheduler(app):
     """
     Initializes and starts the periodic CV file cleanup scheduler.
 
-    This function should be called once during application startup.
+    This function should be called once during application startup. The
+    scheduler is stored in app.extensions['cleanup_scheduler'] and stopped
+    when the process exits.
     """
-    # Start the first cleanup task immediately or after a short delay.
-    # We pass the app context to the cleanup function to ensure it can access app.config.
-    Timer(app.config['CLEANUP_INTERVAL'], cleanup_cv_files, args=[app]).start()
+    scheduler = CleanupScheduler(
+        app,
+        interval=app.config['CLEANUP_INTERVAL'],
+        lock_path=app.config['CLEANUP_LOCK_PATH'],
+        jitter=app.config['CLEANUP_JITTER'],
+    )
+    app.extensions['cleanup_scheduler'] = scheduler
+    scheduler.start()
+    atexit.register(scheduler.stop)
     app.logger.info(f"CV cleanup scheduler started. Runs every {app.config['CLEANUP_INTERVAL']} seconds.")
-
+    return scheduler
@@ -0,0 +1,180 @@
+# utils/cv_job_utils.py
+import atexit
+import threading
+import time
+
+from services.cv_jobs import configure_cv_job_queue, store_rendered_cv
+from services.cv_service import RenderQueueFullError
+from utils import metrics
+
+_JOBS = metrics.counter("cv_jobs_total", "Asynchronous CV render attempts by outcome.", ("outcome",))
+_JOB_SECONDS = metrics.histogram("cv_job_duration_seconds", "Time from claiming a CV job to finishing it.")
+
+# Seconds a job waits before it is retried after finding the render queue full.
+_QUEUE_FULL_RETRY_DELAY = 1.0
+
+class CVJobWorkers:
+    """
+    Threads that drain the CV job queue in this process.
+
+    Every gunicorn worker runs its own threads; the queue's leases make sure
+    each job is claimed by exactly one of them. Renders still go through the
+    render process pool, so its limits apply to queued jobs too. Idle threads
+    poll the queue every poll_interval seconds, and wake immediately when a
+    job is enqueued in the same process. A heartbeat thread renews the leases
+    of running jobs every third of the lease, so slow renders are not
+    reclaimed while their worker is alive.
+    """
+
+    def __init__(self, app, queue, threads=2, poll_interval=0.5):
+        """
+        Args:
+            app: The Flask application instance.
+            queue (CVJobQueue): The queue to drain.
+            threads (int): Number of worker threads in this process.
+            poll_interval (float): Seconds between queue checks while idle.
+        """
+        self.app = app
+        self.queue = queue
+        self.threads = threads
+        self.poll_interval = poll_interval
+        self._stop = threading.Event()
+        self._threads = []
+        self._leases = {}  # job id -> lease token, for jobs running in this process
+        self._leases_lock = threading.Lock()
+        self.completed = 0
+        self.failed = 0
+        self.lost = 0
+
+    def start(self):
+        """Starts the worker threads. Does nothing if they are already running."""
+        if any(thread.is_alive() for thread in self._threads):
+            return
+        self._stop.clear()
+        self._threads = [
+            threading.Thread(target=self._run, name=f"cv-job-worker-{n}", daemon=True) for n in range(self.threads)
+        ]
+        self._threads.append(threading.Thread(target=self._heartbeat, name="cv-job-heartbeat", daemon=True))
+        for thread in self._threads:
+            thread.start()
+
+    def stop(self, timeout=5):
+        """Stops the workers, waiting up to timeout seconds for running jobs to finish."""
+        self._stop.set()
+        self.queue.wakeup.set()
+        for thread in self._threads:
+            if thread is not threading.current_thread():
+                thread.join(timeout)
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                worked = self.run_once()
+            except Exception as e:
+                # Queue database errors; back off and keep the thread alive.
+                self.app.logger.error(f"Error in CV job worker: {e}", exc_info=True)
+                worked = False
+            if not worked:
+                self.queue.wakeup.wait(self.poll_interval)
+                self.queue.wakeup.clear()
+
+    def _heartbeat(self):
+        interval = max(self.queue.lease_seconds / 3, 0.1)
+        while not self._stop.wait(interval):
+            with self._leases_lock:
+                leases = list(self._leases.items())
+            for job_id, lease_token in leases:
+                try:
+                    if not self.queue.renew(job_id, lease_token):
+                        self.app.logger.warning(f"Lost the lease on CV job {job_id}; it was reclaimed.")
+                except Exception as e:
+                    self.app.logger.error(f"Error renewing the lease on CV job {job_id}: {e}")
+
+    def run_once(self):
+        """Claims and runs one job. Returns False if no job was due."""
+        claimed = self.queue.claim()
+        if claimed is None:
+            return False
+        job_id, lease_token, data, content_hash = claimed
+        with self._leases_lock:
+            self._leases[job_id] = lease_token
+        try:
+            return self._run_job(job_id, lease_token, data, content_hash)
+        finally:
+            with self._leases_lock:
+                self._leases.pop(job_id, None)
+
+    def _run_job(self, job_id, lease_token, data, content_hash):
+        started = time.monotonic()
+        with self.app.app_context():
+            try:
+                filename, _ = store_rendered_cv(
+                    data, self.app.config, self.app.logger, content_hash,
+                    on_stage=lambda stage: self.queue.set_stage(job_id, lease_token, stage),
+                )
+            except RenderQueueFullError:
+                # Not the job's fault; put it back without using up an attempt.
+                if self.queue.release(job_id, lease_token, _QUEUE_FULL_RETRY_DELAY):
+                    _JOBS.inc("deferred")
+                else:
+                    self._lease_lost(job_id)
+                return True
+            except Exception as e:
+                self.app.logger.error(f"Error rendering CV job {job_id}: {e}", exc_info=True)
+                retrying = self.queue.fail(job_id, lease_token, str(e))
+                if retrying is None:
+                    self._lease_lost(job_id)
+                    return True
+                _JOBS.inc("retry" if retrying else "failed")
+                if not retrying:
+                    self.failed += 1
+                return True
+        if not self.queue.complete(job_id, lease_token, filename):
+            # The PDF is stored; whoever holds the job now will find and reuse it.
+            self._lease_lost(job_id)
+            return True
+        self.completed += 1
+        _JOBS.inc("done")
+        _JOB_SECONDS.observe(time.monotonic() - started)
+        return True
+
+    def _lease_lost(self, job_id):
+        self.lost += 1
+        _JOBS.inc("lease_lost")
+        self.app.logger.warning(f"CV job {job_id} was reclaimed by another worker; dropping this attempt's result.")
+
+    def stats(self):
+        """Returns queue depth by state and this process's completed, failed and lease-lost counts."""
+        return {
+            "threads": self.threads,
+            "jobs": self.queue.counts(),
+            "completed": self.completed,
+            "failed": self.failed,
+            "lease_lost": self.lost,
+        }
+
+def start_cv_job_workers(app):
+    """
+    Opens the CV job queue and starts this process's worker threads.
+
+    The workers are stored in app.extensions['cv_jobs'] and stopped when the
+    process exits.
+
+    Returns:
+        CVJobWorkers or None: None when CV_JOB_WORKERS is 0 (asynchronous rendering disabled).
+    """
+    if not app.config['CV_JOB_WORKERS']:
+        app.extensions['cv_jobs'] = None
+        return None
+    queue = configure_cv_job_queue(
+        app.config['CV_JOBS_DB_PATH'],
+        max_attempts=app.config['CV_JOB_MAX_ATTEMPTS'],
+        retry_delay=app.config['CV_JOB_RETRY_DELAY'],
+        lease_seconds=app.config['CV_JOB_LEASE_SECONDS'],
+    )
+    workers = CVJobWorkers(app, queue, app.config['CV_JOB_WORKERS'], app.config['CV_JOB_POLL_INTERVAL'])
+    app.extensions['cv_jobs'] = workers
+    workers.start()
+    atexit.register(workers.stop)
+    app.logger.info(f"CV job workers started ({app.config['CV_JOB_WORKERS']} threads).")
+    return workers
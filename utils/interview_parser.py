@@ -0,0 +1,197 @@
+# utils/interview_parser.py
+import re
+
+# Matches numbered questions, e.g. "1. Question" or "2) Question".
+QUESTION_PATTERN = re.compile(r"^\s*(\d+)[\.\)]?\s*(.+)")
+# Matches the first tips line after a question, e.g. "- Tips: Tip 1, Tip 2".
+TIPS_PATTERN = re.compile(r"^\s*[-•*]?\s*(?:Tips|tips|TIPS)?:?\s*(.+)")
+# Paragraph fallback: a paragraph whose first line looks like a question.
+FALLBACK_QUESTION_PATTERN = re.compile(r"^\d+[\.\)]|question|interview")
+FALLBACK_NUMBER_PREFIX = re.compile(r"^\d+[\.\)]?\s*")
+FALLBACK_BULLET_PREFIX = re.compile(r"^[-•*]?\s*")
+
+# Delimiters tried, in order, to split an inline list of tips.
+TIP_DELIMITERS = (", ", "; ", " • ")
+
+# Parser states for the numbered-question format.
+_BEFORE_FIRST_QUESTION = 0  # No question seen yet; lines are ignored.
+_AWAITING_TIPS = 1          # A question was just read; the next line holds its tips.
+_IN_TIPS = 2                # Tips were read; further bullet lines are extra tips.
+
+
+class InterviewQuestionParser:
+    """
+    Incremental parser for Gemini's interview-question output.
+
+    Text is fed chunk by chunk, in any split, and every line is examined once.
+    Two formats are recognised in the same pass:
+
+    - Numbered questions followed by a "- Tips:" line and optional bullet lines.
+    - A paragraph fallback, used only when no numbered question is found: each
+      blank-line separated paragraph whose first line mentions a question
+      becomes a question, and its remaining lines become tips.
+
+    A numbered question is returned by feed() as soon as the next one starts;
+    the last one (or the fallback questions) is returned by close().
+    """
+
+    def __init__(self, max_questions=None, max_tips=None):
+        """
+        Args:
+            max_questions (int, optional): Stop collecting after this many questions.
+            max_tips (int, optional): Keep at most this many tips per question.
+        """
+        self.max_questions = max_questions
+        self.max_tips = max_tips
+        self._partial_line = ""
+        self._state = _BEFORE_FIRST_QUESTION
+        self._current = None
+        self._emitted = 0
+        self._closed = False
+        # Paragraph fallback state, kept until a numbered question shows up.
+        self._fallback_enabled = True
+        self._fallback_questions = []
+        self._paragraph_question = None
+        self._paragraph_tips = []
+        self._paragraph_started = False
+
+    @property
+    def done(self):
+        """True once max_questions have been produced; further input is ignored."""
+        return self.max_questions is not None and self._emitted >= self.max_questions
+
+    def feed(self, chunk):
+        """
+        Consumes a chunk of model output.
+
+        Returns:
+            list: Questions ({'question', 'tips'}) completed by this chunk.
+        """
+        if self._closed:
+            raise ValueError("Cannot feed a closed InterviewQuestionParser.")
+        completed = []
+        lines = (self._partial_line + chunk).split("\n")
+        # The last piece may be an incomplete line; keep it until more text arrives.
+        self._partial_line = lines.pop()
+        for line in lines:
+            if self.done:
+                break
+            self._feed_line(line, completed)
+        return completed
+
+    def close(self):
+        """
+        Signals the end of the output.
+
+        Returns:
+            list: The remaining questions: the last numbered question, or the
+            paragraph fallback questions if no numbered question was found.
+        """
+        if self._closed:
+            return []
+        completed = []
+        if not self.done:
+            self._feed_line(self._partial_line, completed)
+        self._partial_line = ""
+        self._closed = True
+
+        if self._current is not None:
+            self._emit(self._current, completed)
+            self._current = None
+        elif self._fallback_enabled:
+            self._end_paragraph()
+            if self._fallback_questions:
+                print("Warning: No numbered questions found. Using paragraph fallback for interview questions.")
+            for question in self._fallback_questions:
+                self._emit(question, completed)
+        return completed
+
+    def _emit(self, question, completed):
+        if self.done:
+            return
+        completed.append(question)
+        self._emitted += 1
+
+    def _add_tips(self, tips):
+        room = None if self.max_tips is None else self.max_tips - len(self._current["tips"])
+        if room is None:
+            self._current["tips"].extend(tips)
+        elif room > 0:
+            self._current["tips"].extend(tips[:room])
+
+    def _feed_line(self, raw_line, completed):
+        line = raw_line.strip()
+        if self._fallback_enabled:
+            self._feed_fallback_line(raw_line, line)
+        if not line:
+            return
+
+        question_match = QUESTION_PATTERN.match(line)
+        if question_match:
+            if self._current is not None:
+                self._emit(self._current, completed)
+            elif self._fallback_enabled:
+                # Numbered output found; the paragraph fallback is no longer needed.
+                self._fallback_enabled = False
+                self._fallback_questions = []
+                self._paragraph_tips = []
+            self._current = {"question": question_match.group(2).strip(), "tips": []}
+            self._state = _AWAITING_TIPS
+            return
+
+        if self._state == _AWAITING_TIPS:
+            tips_text = TIPS_PATTERN.match(line).group(1).strip()
+            parsed_tips = []
+            for delimiter in TIP_DELIMITERS:
+                if delimiter in tips_text:
+                    parsed_tips = [tip.strip() for tip in tips_text.split(delimiter) if tip.strip()]
+                    if parsed_tips:
+                        break
+            if not parsed_tips and tips_text:
+                parsed_tips = [tips_text] # Fallback to single tip if no delimiter found
+            self._add_tips(parsed_tips)
+            self._state = _IN_TIPS
+        elif self._state == _IN_TIPS and line[0] in "-•":
+            tip = line.lstrip("-•").strip()
+            if tip:
+                self._add_tips([tip])
+
+    def _feed_fallback_line(self, raw_line, line):
+        # Paragraphs are separated by empty lines.
+        if raw_line == "":
+            self._end_paragraph()
+            return
+        if not self._paragraph_started:
+            if not line:
+                return
+            self._paragraph_started = True
+            if FALLBACK_QUESTION_PATTERN.search(line.lower()):
+                self._paragraph_question = FALLBACK_NUMBER_PREFIX.sub("", line).strip()
+            return
+        if self._paragraph_question is None or not line:
+            return
+        if not line.lower().startswith(("question", "interview")):
+            tip = FALLBACK_BULLET_PREFIX.sub("", line).strip()
+            if tip and (self.max_tips is None or len(self._paragraph_tips) < self.max_tips):
+                self._paragraph_tips.append(tip)
+
+    def _end_paragraph(self):
+        if self._paragraph_question and self._paragraph_tips:
+            if self.max_questions is None or len(self._fallback_questions) < self.max_questions:
+                self._fallback_questions.append({"question": self._paragraph_question, "tips": self._paragraph_tips})
+        self._paragraph_question = None
+        self._paragraph_tips = []
+        self._paragraph_started = False
+
+
+def parse_interview_questions(text, max_questions=None, max_tips=None):
+    """
+    Parses a complete model response in one call.
+
+    Returns:
+        list: Dicts with 'question' and 'tips' keys, in the order they appear.
+    """
+    parser = InterviewQuestionParser(max_questions=max_questions, max_tips=max_tips)
+    questions = parser.feed(text)
+    questions.extend(parser.close())
+    return questions
@@ -0,0 +1,52 @@
+# utils/leader_lock.py
+import os
+
+try:
+    import fcntl
+except ImportError:  # Not available on Windows.
+    fcntl = None
+
+
+class LeaderLock:
+    """
+    Non-blocking exclusive lock on a shared file, used to elect one process per host.
+
+    Every gunicorn worker can try to take the lock; only one succeeds. The OS
+    releases the lock when the holder exits, so another worker takes over on
+    its next attempt.
+    """
+
+    def __init__(self, lock_path):
+        self.lock_path = lock_path
+        self._lock_file = None
+        self.held = False
+
+    def try_acquire(self):
+        """Takes the lock if it is free. Returns True if this process holds it."""
+        if self.held:
+            return True
+        if fcntl is None:
+            # No cross-process locking available (e.g. Windows development); every process leads.
+            self.held = True
+            return True
+        directory = os.path.dirname(self.lock_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        lock_file = open(self.lock_path, 'a')
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return False
+        self._lock_file = lock_file
+        self.held = True
+        return True
+
+    def release(self):
+        if self._lock_file is not None:
+            try:
+                fcntl.flock(self._lock_file, fcntl.LOCK_UN)
+            finally:
+                self._lock_file.close()
+                self._lock_file = None
+        self.held = False
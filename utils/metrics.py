@@ -0,0 +1,382 @@
+# utils/metrics.py
+import atexit
+import json
+import math
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Not available on Windows.
+    fcntl = None
+
+# Latency buckets in seconds, from fast cache hits to slow LLM generations.
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+# Size buckets in bytes for generated PDFs.
+BYTE_BUCKETS = (2_000, 5_000, 10_000, 25_000, 50_000, 100_000, 250_000, 500_000, 1_000_000)
+
+# Every metric defined in this process, by name.
+_registry = {}
+_registry_lock = threading.Lock()
+
+# Directory where each process writes its snapshot, set by configure_metrics().
+_metrics_dir = None
+_flush_thread = None
+_flush_pid = None
+
+# Snapshot holding the summed totals of processes that have exited.
+_RETIRED_FILE = "metrics_retired.json"
+
+
+class _Metric:
+    """
+    Base class for counters and histograms.
+
+    Values are kept in one dict per metric, behind a lock. Flask runs every
+    async view on a new thread, so per-thread storage would grow with each
+    request; an uncontended lock costs far less than the work being measured.
+    """
+
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}  # label values -> value
+        self._lock = threading.Lock()
+
+    def collect(self):
+        """Returns {label_values: value} for this process."""
+        totals = {}
+        with self._lock:
+            self._merge(totals, self._values)
+        return totals
+
+    def _merge(self, into, values):
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    """A monotonically increasing count, optionally split by labels. Names should end in _total."""
+
+    kind = "counter"
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def _merge(self, into, values):
+        for labels, value in values.items():
+            into[labels] = into.get(labels, 0) + value
+
+
+class Histogram(_Metric):
+    """
+    Distribution of observed values (latencies, sizes) in fixed buckets.
+
+    Stored per label set as [count per bucket..., count above the last bucket, sum].
+    """
+
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, *labels):
+        bucket = bisect_left(self.buckets, value)
+        with self._lock:
+            slots = self._values.get(labels)
+            if slots is None:
+                slots = self._values[labels] = [0] * (len(self.buckets) + 2)
+            slots[bucket] += 1
+            slots[-1] += value
+
+    def time(self, *labels):
+        """Context manager observing the duration of its block, in seconds."""
+        return _Timer(self, labels)
+
+    def _merge(self, into, values):
+        for labels, slots in values.items():
+            current = into.get(labels)
+            if current is None:
+                into[labels] = list(slots)
+            else:
+                for i, value in enumerate(slots):
+                    current[i] += value
+
+
+class _Timer:
+    def __init__(self, histogram, labels):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.histogram.observe(time.perf_counter() - self.started, *self.labels)
+        return False
+
+
+def _register(cls, name, *args, **kwargs):
+    with _registry_lock:
+        metric = _registry.get(name)
+        if metric is None:
+            metric = _registry[name] = cls(name, *args, **kwargs)
+        elif not isinstance(metric, cls):
+            raise ValueError(f"Metric {name} is already registered as a {metric.kind}")
+        return metric
+
+def counter(name, documentation, labelnames=()):
+    """Returns the counter registered under name, creating it on first use."""
+    return _register(Counter, name, documentation, labelnames)
+
+def histogram(name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+    """Returns the histogram registered under name, creating it on first use."""
+    return _register(Histogram, name, documentation, labelnames, buckets=buckets)
+
+
+def _snapshot():
+    """Returns this process's metrics in the JSON-serializable snapshot format."""
+    snapshot = {}
+    for metric in list(_registry.values()):
+        entry = {
+            "kind": metric.kind,
+            "help": metric.documentation,
+            "labelnames": list(metric.labelnames),
+            "values": [[list(labels), value] for labels, value in metric.collect().items()],
+        }
+        if metric.kind == "histogram":
+            entry["buckets"] = list(metric.buckets)
+        snapshot[metric.name] = entry
+    return snapshot
+
+def _snapshot_path(pid):
+    return os.path.join(_metrics_dir, f"metrics_{pid}.json")
+
+def _snapshot_pid(filename):
+    """Returns the process ID a snapshot file belongs to, or None for other files."""
+    if not (filename.startswith("metrics_") and filename.endswith(".json")):
+        return None
+    pid = filename[len("metrics_"):-len(".json")]
+    return int(pid) if pid.isdigit() else None
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        return True  # Exists but belongs to another user, or liveness cannot be checked here.
+    return True
+
+@contextmanager
+def _retire_lock():
+    """Serializes retirements across processes, so a snapshot is never folded in twice."""
+    if fcntl is None:
+        yield
+        return
+    with open(os.path.join(_metrics_dir, "metrics.lock"), "a") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+def _read_snapshot(path):
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+def _write_snapshot(path, snapshot):
+    temp_path = f"{path}.tmp"
+    with open(temp_path, "w", encoding="utf-8") as f:
+        json.dump(snapshot, f)
+    os.replace(temp_path, path)
+
+def _retire_snapshot(pid, check_alive=True):
+    """
+    Folds the snapshot left by process pid into the retired snapshot and deletes it.
+
+    Process IDs are reused: a new process with the same ID would overwrite the
+    file, and the exited process's counts would disappear from /metrics.
+
+    Args:
+        pid (int): Process whose snapshot to retire.
+        check_alive (bool): Leave the snapshot alone if a process with this ID is running.
+    """
+    path = _snapshot_path(pid)
+    with _retire_lock():
+        if not os.path.exists(path) or (check_alive and _pid_alive(pid)):
+            return
+        try:
+            snapshot = _read_snapshot(path)
+        except ValueError:
+            snapshot = {}  # Unreadable; drop it rather than block retirement.
+        retired_path = os.path.join(_metrics_dir, _RETIRED_FILE)
+        try:
+            retired = _read_snapshot(retired_path)
+        except FileNotFoundError:
+            retired = {}
+        _merge_snapshot(retired, snapshot)
+        _write_snapshot(retired_path, retired)
+        os.remove(path)
+
+def flush_metrics():
+    """Writes this process's snapshot to the metrics directory, if one is configured."""
+    if not _metrics_dir:
+        return
+    _write_snapshot(_snapshot_path(os.getpid()), _snapshot())
+
+def _flush_periodically(interval):
+    while True:
+        time.sleep(interval)
+        try:
+            flush_metrics()
+        except OSError as e:
+            print(f"Warning: could not write metrics snapshot: {e}")
+
+def configure_metrics(directory, flush_interval=10):
+    """
+    Enables aggregation of metrics across processes.
+
+    Each process (gunicorn workers and CV render processes alike) writes its
+    totals to directory every flush_interval seconds and at exit; /metrics
+    sums the snapshots of every process that has written one. Snapshots of
+    exited processes are folded into one retired snapshot, so counters never
+    go backwards, even when a new process gets the same process ID; the
+    directory should be cleared when the server is (re)deployed.
+
+    Args:
+        directory (str): Shared metrics directory. Empty or None keeps metrics per process.
+        flush_interval (float): Seconds between snapshot writes.
+    """
+    global _metrics_dir, _flush_thread, _flush_pid
+    _metrics_dir = directory or None
+    if not _metrics_dir:
+        return
+    os.makedirs(_metrics_dir, exist_ok=True)
+    if _flush_thread is None or _flush_pid != os.getpid():
+        # A snapshot under our process ID was left by an exited process; keep its counts.
+        _retire_snapshot(os.getpid(), check_alive=False)
+        _flush_thread = threading.Thread(
+            target=_flush_periodically, args=(flush_interval,), name="metrics-flush", daemon=True
+        )
+        _flush_thread.start()
+        _flush_pid = os.getpid()
+        atexit.register(flush_metrics)
+
+def get_metrics_dir():
+    """Returns the configured metrics directory, or None."""
+    return _metrics_dir
+
+
+def _collect_all():
+    """Merges this process's live metrics with the snapshots of all other processes."""
+    merged = _snapshot()
+    if not _metrics_dir:
+        return merged
+    own_pid = os.getpid()
+    for filename in os.listdir(_metrics_dir):
+        pid = _snapshot_pid(filename)
+        if pid is not None and pid != own_pid and not _pid_alive(pid):
+            try:
+                _retire_snapshot(pid)
+            except OSError as e:
+                print(f"Warning: could not retire metrics snapshot {filename}: {e}")
+    own_file = os.path.basename(_snapshot_path(own_pid))
+    for filename in os.listdir(_metrics_dir):
+        if not filename.endswith(".json") or filename == own_file:
+            continue
+        try:
+            snapshot = _read_snapshot(os.path.join(_metrics_dir, filename))
+        except (OSError, ValueError):
+            continue  # Being replaced or truncated; it will be read on the next scrape.
+        _merge_snapshot(merged, snapshot)
+    return merged
+
+def _merge_snapshot(merged, snapshot):
+    """Adds the values of snapshot into merged, in place."""
+    for name, entry in snapshot.items():
+        target = merged.setdefault(name, dict(entry, values=[]))
+        if target["kind"] != entry["kind"] or target.get("buckets") != entry.get("buckets"):
+            continue  # Written by a process running different code; skip rather than mix.
+        values = {tuple(labels): value for labels, value in target["values"]}
+        for labels, value in entry["values"]:
+            labels = tuple(labels)
+            if labels not in values:
+                values[labels] = value
+            elif entry["kind"] == "counter":
+                values[labels] += value
+            else:
+                values[labels] = [a + b for a, b in zip(values[labels], value)]
+        target["values"] = [[list(labels), value] for labels, value in values.items()]
+
+def _escape_label_value(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _format_labels(names, values, extra=None):
+    pairs = list(zip(names, values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape_label_value(value)}"' for name, value in pairs) + "}"
+
+def _format_number(value):
+    if isinstance(value, float) and math.isinf(value):
+        return "+Inf"
+    return repr(value) if isinstance(value, float) else str(value)
+
+def render_metrics():
+    """Returns all metrics, aggregated across processes, in the Prometheus text format."""
+    lines = []
+    for name, entry in sorted(_collect_all().items()):
+        lines.append(f"# HELP {name} {entry['help']}")
+        lines.append(f"# TYPE {name} {entry['kind']}")
+        labelnames = entry["labelnames"]
+        for labels, value in sorted(entry["values"], key=lambda item: item[0]):
+            if entry["kind"] == "counter":
+                lines.append(f"{name}{_format_labels(labelnames, labels)} {_format_number(value)}")
+                continue
+            cumulative = 0
+            for bound, count in zip(list(entry["buckets"]) + [float("inf")], value[:-1]):
+                cumulative += count
+                le = ("le", _format_number(float(bound)))
+                lines.append(f"{name}_bucket{_format_labels(labelnames, labels, le)} {cumulative}")
+            lines.append(f"{name}_sum{_format_labels(labelnames, labels)} {_format_number(value[-1])}")
+            lines.append(f"{name}_count{_format_labels(labelnames, labels)} {cumulative}")
+    return "\n".join(lines) + "\n"
+
+
+def instrument_app(app):
+    """
+    Records the latency of every request in http_request_duration_seconds.
+
+    Labelled by method, route rule (not the raw path, to bound cardinality)
+    and status code. For streamed responses this measures the time until the
+    response starts, not until the body is sent.
+    """
+    from flask import g, request
+
+    request_latency = histogram(
+        "http_request_duration_seconds", "Time spent handling HTTP requests.", ("method", "route", "status")
+    )
+
+    @app.before_request
+    def _start_timer():
+        g._metrics_started = time.perf_counter()
+
+    @app.after_request
+    def _record_latency(response):
+        started = g.pop("_metrics_started", None)
+        if started is not None:
+            route = request.url_rule.rule if request.url_rule is not None else "unmatched"
+            request_latency.observe(time.perf_counter() - started, request.method, route, str(response.status_code))
+        return response
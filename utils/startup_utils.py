@@ -0,0 +1,71 @@
+# utils/startup_utils.py
+import os
+import time
+from contextlib import contextmanager
+
+class StartupProfile:
+    """
+    Durations of the startup phases, reported in /health.
+
+    Phases recorded before a fork (importing the app, create_app()) are
+    inherited by the workers, which then add their own (init_process()).
+    Each phase is stored with the pid of the process that ran it.
+    """
+
+    def __init__(self, import_started, import_budget):
+        """
+        Args:
+            import_started (float): time.perf_counter() at the start of the app import.
+            import_budget (float): Seconds the app import is expected to take at most. 0 disables the check.
+        """
+        self.import_started = import_started
+        self.import_budget = import_budget
+        self.import_seconds = None
+        self.phases = {}
+
+    def record(self, name, seconds):
+        self.phases[name] = {"seconds": round(seconds, 3), "pid": os.getpid()}
+
+    @contextmanager
+    def phase(self, name):
+        """Times the block as the named phase."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - started)
+
+    def finish_import(self, logger):
+        """
+        Records the total import time and checks it against the budget.
+
+        Returns:
+            bool: True if the import stayed within the budget (or there is none).
+        """
+        self.import_seconds = time.perf_counter() - self.import_started
+        self.record('import', self.import_seconds)
+        if self.import_budget and self.import_seconds > self.import_budget:
+            slowest = max(
+                (name for name in self.phases if name != 'import'),
+                key=lambda name: self.phases[name]["seconds"],
+                default=None,
+            )
+            logger.warning(
+                f"App import took {self.import_seconds:.2f}s, over the {self.import_budget:.2f}s budget"
+                f" (slowest phase: {slowest}). Run benchmarks/startup_bench.py for a per-module breakdown."
+            )
+            return False
+        return True
+
+    def stats(self):
+        """Returns the phases, the import time and whether it was within budget."""
+        return {
+            "pid": os.getpid(),
+            "import_seconds": round(self.import_seconds, 3) if self.import_seconds is not None else None,
+            "import_budget_seconds": self.import_budget or None,
+            "within_budget": (
+                None if self.import_seconds is None or not self.import_budget
+                else self.import_seconds <= self.import_budget
+            ),
+            "phases": dict(self.phases),
+        }
@@ -0,0 +1,68 @@
+# utils/streaming.py
+import json
+from flask import Response
+
+# Supported streaming formats and their response mimetypes.
+STREAM_MIMETYPES = {
+    'sse': 'text/event-stream',
+    'ndjson': 'application/x-ndjson',
+}
+
+def requested_stream_format(request):
+    """
+    Determines whether the client asked for a streamed response, and in which format.
+
+    Streaming is requested with the 'stream' query parameter ('1'/'true'/'sse' for
+    Server-Sent Events, 'ndjson' for newline-delimited JSON) or by sending an
+    'Accept: text/event-stream' / 'application/x-ndjson' header.
+
+    Returns:
+        str or None: 'sse', 'ndjson', or None for a regular JSON response.
+    """
+    stream = request.args.get('stream', '').strip().lower()
+    if stream in ('1', 'true', 'yes', 'sse'):
+        return 'sse'
+    if stream == 'ndjson':
+        return 'ndjson'
+    accept = request.headers.get('Accept', '')
+    if 'text/event-stream' in accept:
+        return 'sse'
+    if 'application/x-ndjson' in accept:
+        return 'ndjson'
+    return None
+
+def format_event(event, data, stream_format):
+    """Serializes a single event as an SSE frame or an NDJSON line."""
+    if stream_format == 'sse':
+        return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+    return json.dumps({"event": event, "data": data}) + "\n"
+
+def streaming_response(events, stream_format):
+    """
+    Wraps an iterable of (event, data) pairs in a streamed Flask response.
+
+    A final 'done' event reports how many events were sent. If the iterable
+    raises, an 'error' event is sent instead, since the status line has already
+    gone out by then.
+
+    Args:
+        events (iterable): Yields (event_name, json_serializable_data) tuples.
+        stream_format (str): 'sse' or 'ndjson'.
+    """
+    def generate():
+        count = 0
+        try:
+            for event, data in events:
+                count += 1
+                yield format_event(event, data, stream_format)
+        except Exception as e:
+            print(f"Error while streaming response: {e}")
+            yield format_event("error", {"error": "The response stream was interrupted. Please try again."}, stream_format)
+            return
+        yield format_event("done", {"count": count}, stream_format)
+
+    response = Response(generate(), mimetype=STREAM_MIMETYPES[stream_format])
+    # Disable caching and proxy buffering so each event reaches the client immediately.
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
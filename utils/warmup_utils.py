@@ -0,0 +1,149 @@
+# utils/warmup_utils.py
+import atexit
+import os
+import random
+import threading
+from datetime import date, timedelta
+
+from services.cache_warmup import CacheWarmer
+from services.gemini_service import get_response_cache
+from services.query_log import get_query_log
+from utils.leader_lock import LeaderLock
+
+# Days of query counts kept for picking the top-N queries.
+QUERY_LOG_RETENTION_DAYS = 7
+
+class WarmupScheduler:
+    """
+    Keeps the response cache warm for popular programs and roles.
+
+    Every worker loads the warmup snapshot once at startup and then, on each
+    tick, flushes its query counts. One worker per host (elected with a shared
+    lock file, like the cleanup scheduler) runs the warmer: immediately at
+    startup, then every interval. The other workers pick up the refreshed
+    snapshot whenever the leader rewrites it, so each in-process cache stays
+    warm even without the shared SQLite tier.
+    """
+
+    def __init__(self, app, warmer, interval, lock_path, jitter=0.1):
+        """
+        Args:
+            app: The Flask application instance.
+            warmer (CacheWarmer): Fills the cache for the warm set.
+            interval (float): Seconds between warmup runs.
+            lock_path (str): File used for leader election across processes.
+            jitter (float): Fraction of the interval by which each wait is randomly varied.
+        """
+        self.app = app
+        self.warmer = warmer
+        self.interval = interval
+        self.jitter = jitter
+        self._stop = threading.Event()
+        self._thread = None
+        self._leader = LeaderLock(lock_path)
+        self.last_error = None
+
+    def start(self):
+        """Loads the snapshot and starts the scheduler thread. Does nothing if it is already running."""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        loaded = self.warmer.load_snapshot()
+        if loaded:
+            self.app.logger.info(f"Loaded {loaded} warm cache entries from snapshot.")
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="cache-warmup-scheduler", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=5):
+        """Stops the scheduler and flushes pending query counts."""
+        self._stop.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout)
+        self._flush_query_log()
+        self._leader.release()
+
+    def _next_delay(self):
+        return self.interval * random.uniform(1 - self.jitter, 1 + self.jitter)
+
+    def _run(self):
+        # The first tick runs right away so the leader warms the cache at startup.
+        delay = 0
+        while not self._stop.wait(delay):
+            self.tick()
+            delay = self._next_delay()
+
+    def tick(self):
+        """Flushes query counts, then warms the cache (leader) or reloads the snapshot (others)."""
+        self._flush_query_log()
+        try:
+            if self._leader.held or self._become_leader():
+                self.warmer.run()
+                query_log = get_query_log()
+                if query_log is not None:
+                    query_log.purge_before(date.today() - timedelta(days=QUERY_LOG_RETENTION_DAYS))
+            else:
+                self.warmer.load_snapshot(only_if_changed=True)
+            self.last_error = None
+        except Exception as e:
+            self.last_error = str(e)
+            self.app.logger.error(f"Error during cache warmup: {e}", exc_info=True)
+
+    def _become_leader(self):
+        if not self._leader.try_acquire():
+            return False
+        self.app.logger.info(f"Process {os.getpid()} is now the cache warmup leader.")
+        return True
+
+    def _flush_query_log(self):
+        query_log = get_query_log()
+        if query_log is None:
+            return
+        try:
+            query_log.flush()
+        except Exception as e:
+            self.app.logger.error(f"Error flushing query log: {e}")
+
+    def stats(self):
+        """Returns leadership, warm set and last-run statistics."""
+        return {
+            "is_leader": self._leader.held,
+            "last_error": self.last_error,
+            **self.warmer.stats(),
+        }
+
+def start_cache_warmup(app):
+    """
+    Creates and starts the cache warmup scheduler, if the response cache is enabled.
+
+    The scheduler is stored in app.extensions['cache_warmup'] and stopped
+    when the process exits.
+
+    Returns:
+        WarmupScheduler or None: None when caching or warmup is disabled.
+    """
+    cache = get_response_cache()
+    if cache is None or not app.config['CACHE_WARMUP_ENABLED']:
+        app.extensions['cache_warmup'] = None
+        return None
+    warmer = CacheWarmer(
+        cache,
+        programs=app.config['CACHE_WARMUP_PROGRAMS'],
+        roles=app.config['CACHE_WARMUP_ROLES'],
+        top_n=app.config['CACHE_WARMUP_TOP_N'],
+        concurrency=app.config['CACHE_WARMUP_CONCURRENCY'],
+        refresh_ahead=app.config['CACHE_WARMUP_REFRESH_AHEAD'],
+        snapshot_path=app.config['CACHE_WARMUP_SNAPSHOT_PATH'],
+        query_log=get_query_log(),
+    )
+    scheduler = WarmupScheduler(
+        app,
+        warmer,
+        interval=app.config['CACHE_WARMUP_INTERVAL'],
+        lock_path=app.config['CACHE_WARMUP_LOCK_PATH'],
+        jitter=app.config['CLEANUP_JITTER'],
+    )
+    app.extensions['cache_warmup'] = scheduler
+    scheduler.start()
+    atexit.register(scheduler.stop)
+    app.logger.info(f"Cache warmup scheduler started. Runs every {app.config['CACHE_WARMUP_INTERVAL']} seconds.")
+    return scheduler
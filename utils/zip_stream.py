@@ -0,0 +1,58 @@
+# utils/zip_stream.py
+import io
+import time
+import zipfile
+
+
+class _ChunkSink(io.RawIOBase):
+    """
+    Write-only, non-seekable sink that collects whatever zipfile writes to it.
+
+    Because it cannot seek, zipfile writes local headers with trailing data
+    descriptors, so every entry can be flushed as soon as it is written.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self):
+        """Returns and forgets everything written since the last drain."""
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def stream_zip(entries):
+    """
+    Builds a ZIP archive incrementally from (name, bytes) pairs.
+
+    Only the entry currently being written is held in memory, so archives of
+    any size can be streamed straight to the client.
+
+    Args:
+        entries (iterable): Yields (archive_name, content_bytes) pairs.
+
+    Yields:
+        bytes: Consecutive pieces of the archive.
+    """
+    sink = _ChunkSink()
+    with zipfile.ZipFile(sink, mode="w", compression=zipfile.ZIP_DEFLATED, compresslevel=1) as archive:
+        for name, content in entries:
+            info = zipfile.ZipInfo(name, date_time=time.localtime()[:6])
+            info.compress_type = zipfile.ZIP_DEFLATED
+            archive.writestr(info, content)
+            chunk = sink.drain()
+            if chunk:
+                yield chunk
+    # Closing the archive writes the central directory.
+    chunk = sink.drain()
+    if chunk:
+        yield chunk